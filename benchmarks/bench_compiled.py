@@ -0,0 +1,61 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+
+Compare CompiledSearcher with the three xdb searcher modes.
+
+    python benchmarks/bench_compiled.py path/to/ip2region_v4.xdb [-n 200000]
+"""
+import argparse
+import ipaddress
+import random
+import time
+
+from ip2region import CompiledSearcher, Header, Searcher, VectorIndex, Version
+
+
+def random_ips(version: Version, n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    if version.is_ipv4():
+        return [str(ipaddress.IPv4Address(rnd.getrandbits(32))) for _ in range(n)]
+    return [str(ipaddress.IPv6Address(rnd.getrandbits(128))) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("db_path")
+    parser.add_argument("-n", type=int, default=200000, help="lookups per searcher")
+    args = parser.parse_args()
+
+    version = Version.from_header(Header.from_file(args.db_path))
+    with open(args.db_path, "rb") as f:
+        data = f.read()
+    ips = random_ips(version, args.n)
+
+    t = time.perf_counter()
+    compiled = CompiledSearcher.from_buffer(version, data)
+    print(
+        f"compile: {time.perf_counter() - t:.3f}s, {len(compiled)} segments, "
+        f"{compiled.memory_usage / 1024 / 1024:.1f} MiB"
+    )
+    searchers = {
+        "from_file": Searcher.from_file(version, args.db_path),
+        "from_index": Searcher.from_index(
+            version, args.db_path, VectorIndex.from_file(args.db_path)
+        ),
+        "from_buffer": Searcher.from_buffer(version, data),
+        "compiled": compiled,
+    }
+    expected = None
+    for name, searcher in searchers.items():
+        t = time.perf_counter()
+        results = [searcher.search_by_string(ip) for ip in ips]
+        cost = time.perf_counter() - t
+        if expected is None:
+            expected = results
+        elif results != expected:
+            raise AssertionError(f"{name} returned different results")
+        print(f"{name:>12}: {args.n / cost:>12.0f} lookups/s, {cost / args.n * 1e9:>8.0f} ns/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+
+Throughput and p50/p99 latency over backend x mode x cache policy x ip version x input x threads
+x distribution.
+
+    python benchmarks/bench_suite.py [--db-v4 a.xdb] [--db-v6 b.xdb] [-n 100000] [--json out.json]
+                                     [--policies none,cached,compiled] [--cache-capacity 65536]
+                                     [--baseline old.json --threshold 0.1] [--interpreter pypy3]
+
+Without --db-v4/--db-v6 synthetic databases are generated (benchmarks/fixture.py), so the suite
+runs offline. Every backend runs in its own interpreter (IP_USE_CFFI and IP_USE_PYTHON are read at
+import time), --interpreter picks that interpreter, e.g. pypy3 to compare cffi with the pure Python
+backend under the JIT. The parent never imports ip2region, the fixtures are written by the
+interpreter of the first backend, so e.g. --backends python runs without a built extension.
+Policies: none searches the searcher of the mode directly, cached puts a CachedSearcher of
+--cache-capacity entries in front of it, compiled searches its CompiledSearcher.
+With --baseline, rows whose lookups/s dropped by more than --threshold are reported and the
+exit status is 1.
+"""
+import argparse
+import ipaddress
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKENDS = ("cython", "cffi", "python")
+MODES = ("file", "index", "buffer")
+INPUTS = ("str", "packed")
+DISTS = ("uniform", "skewed")
+POLICIES = ("none", "cached", "compiled")
+KEY = ("backend", "mode", "policy", "ip_version", "input", "threads", "dist")
+
+
+def make_ips(ip_version: int, n: int, dist: str, seed: int) -> list:
+    rnd = random.Random(seed)
+    bits = 32 if ip_version == 4 else 128
+    cls = ipaddress.IPv4Address if ip_version == 4 else ipaddress.IPv6Address
+    if dist == "uniform":
+        return [str(cls(rnd.getrandbits(bits))) for _ in range(n)]
+    # zipf-like: a few hot addresses take most of the traffic, like real access logs
+    hot = [str(cls(rnd.getrandbits(bits))) for _ in range(10000)]
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(hot))]
+    return rnd.choices(hot, weights, k=n)
+
+
+def percentile(sorted_values: list, q: float) -> int:
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def backend_env(backend: str) -> dict:
+    env = dict(os.environ)
+    env.pop("IP_USE_CFFI", None)
+    env.pop("IP_USE_PYTHON", None)
+    if backend == "cffi":
+        env["IP_USE_CFFI"] = "1"
+    elif backend == "python":
+        env["IP_USE_PYTHON"] = "1"
+    return env
+
+
+def make_fixtures(args) -> dict:
+    # runs inside the interpreter of a backend, ip2region.maker imports the package and its backend
+    from fixture import make_fixture
+
+    return {f"v{ip_version}_segments": make_fixture(path, ip_version, args.segments, seed=args.seed)
+            for ip_version, path in ((4, args.db_v4), (6, args.db_v6))}
+
+
+def apply_policy(searcher, policy: str, capacity: int):
+    from ip2region import CachedSearcher
+
+    if policy == "cached":
+        return CachedSearcher(searcher, capacity)
+    if policy == "compiled":
+        return searcher.compile()
+    return searcher
+
+
+def run_worker(args) -> list:
+    # runs inside the interpreter of one backend, returns result rows
+    from ip2region import Searcher, parse_ip
+
+    if os.getenv("IP_USE_PYTHON") is not None:
+        backend = "python"
+    elif os.getenv("IP_USE_CFFI") is not None:
+        backend = "cffi"
+    else:
+        backend = "cython"
+    rows = []
+    for ip_version, db_path in ((4, args.db_v4), (6, args.db_v6)):
+        if not db_path:
+            continue
+        for dist in args.dists:
+            ips = make_ips(ip_version, args.n, dist, args.seed)
+            packed = [parse_ip(ip)[1][: 4 if ip_version == 4 else 16] for ip in ips]
+            for mode in args.modes:
+                for policy in args.policies:
+                    for threads in args.threads:
+                        # file and index searchers are not shared between threads, buffer and compiled
+                        # ones are; a cached thread gets the cache of its own searcher
+                        searchers = [Searcher.from_path(db_path, mode)]
+                        if mode != "buffer" and policy != "compiled":
+                            searchers += [Searcher.from_path(db_path, mode) for _ in range(threads - 1)]
+                        searchers = [apply_policy(searcher, policy, args.cache_capacity) for searcher in searchers]
+                        for input_kind in args.inputs:
+                            rows.append({
+                                "backend": backend, "mode": mode, "policy": policy, "ip_version": ip_version,
+                                "input": input_kind, "threads": threads, "dist": dist,
+                                "implementation": platform.python_implementation(),
+                                **measure(searchers, ips if input_kind == "str" else packed, input_kind == "str",
+                                          threads, args.latency_samples),
+                            })
+    return rows
+
+
+def measure(searchers: list, ips: list, by_string: bool, threads: int, latency_samples: int) -> dict:
+    n = len(ips)
+    shares = [ips[i::threads] for i in range(threads)]
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(k: int):
+        searcher = searchers[k % len(searchers)]
+        search = searcher.search_by_string if by_string else searcher.search
+        share = shares[k]
+        barrier.wait()
+        for ip in share:  # throughput pass, no per call timing
+            search(ip)
+        barrier.wait()
+        clock = time.perf_counter_ns
+        samples = latencies[k]
+        for ip in share[: max(1, latency_samples // threads)]:
+            t = clock()
+            search(ip)
+            samples.append(clock() - t)
+
+    pool = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    barrier.wait()
+    seconds = time.perf_counter() - start
+    for t in pool:
+        t.join()
+    merged = sorted(v for samples in latencies for v in samples)
+    return {
+        "lookups": n,
+        "seconds": round(seconds, 6),
+        "ops_per_sec": round(n / seconds, 1) if seconds > 0 else 0.0,
+        "p50_ns": percentile(merged, 0.50),
+        "p99_ns": percentile(merged, 0.99),
+    }
+
+
+def row_key(row: dict) -> tuple:
+    # reports from before the policy axis only hold uncached rows
+    return tuple(row.get(k, "none") for k in KEY)
+
+
+def compare(rows: list, baseline: dict, threshold: float) -> list:
+    old = {row_key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in rows:
+        before = old.get(row_key(row))
+        if before and before["ops_per_sec"] > 0:
+            change = row["ops_per_sec"] / before["ops_per_sec"] - 1
+            if change < -threshold:
+                regressions.append((row, before, change))
+    return regressions
+
+
+def split(value: str) -> list:
+    return [x for x in value.split(",") if x]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--db-v4", help="IPv4 xdb, generated when neither --db-v4 nor --db-v6 is given")
+    parser.add_argument("--db-v6", help="IPv6 xdb")
+    parser.add_argument("-n", type=int, default=100000, help="lookups per row")
+    parser.add_argument("--latency-samples", type=int, default=20000, help="timed lookups per row")
+    parser.add_argument("--backends", type=split, default=list(BACKENDS))
+    parser.add_argument("--modes", type=split, default=list(MODES))
+    parser.add_argument("--inputs", type=split, default=list(INPUTS))
+    parser.add_argument("--dists", type=split, default=list(DISTS))
+    parser.add_argument("--policies", type=split, default=list(POLICIES), help="none, cached, compiled")
+    parser.add_argument("--cache-capacity", type=int, default=65536, help="entries of the cached policy")
+    parser.add_argument("--threads", type=lambda s: [int(x) for x in split(s)], default=[1, os.cpu_count() or 4])
+    parser.add_argument("--segments", type=int, default=200000, help="segments of generated fixtures")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--interpreter", default=sys.executable, help="python running the backends, e.g. pypy3")
+    parser.add_argument("--json", help="write the report here instead of stdout")
+    parser.add_argument("--baseline", help="report of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed lookups/s drop, default 10%%")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--make-fixtures", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.make_fixtures:
+        json.dump(make_fixtures(args), sys.stdout)
+        return 0
+    if args.worker:
+        import ip2region
+
+        json.dump({"ip2region": ip2region.__version__, "rows": run_worker(args)}, sys.stdout)
+        return 0
+
+    script = [args.interpreter, os.path.abspath(__file__)]
+    tmp = None
+    fixture = None
+    if not args.db_v4 and not args.db_v6:
+        tmp = tempfile.TemporaryDirectory()
+        args.db_v4 = os.path.join(tmp.name, "bench_v4.xdb")
+        args.db_v6 = os.path.join(tmp.name, "bench_v6.xdb")
+        proc = subprocess.run(script + ["--make-fixtures", "--db-v4", args.db_v4, "--db-v6", args.db_v6,
+                                        "--segments", str(args.segments), "--seed", str(args.seed)],
+                              env=backend_env(args.backends[0]), stdout=subprocess.PIPE, check=True)
+        fixture = {"segments": args.segments, "seed": args.seed, **json.loads(proc.stdout)}
+
+    worker_argv = script + ["--worker",
+                            "-n", str(args.n), "--latency-samples", str(args.latency_samples),
+                            "--modes", ",".join(args.modes), "--inputs", ",".join(args.inputs),
+                            "--dists", ",".join(args.dists), "--threads", ",".join(map(str, args.threads)),
+                            "--policies", ",".join(args.policies), "--cache-capacity", str(args.cache_capacity),
+                            "--seed", str(args.seed)]
+    if args.db_v4:
+        worker_argv += ["--db-v4", args.db_v4]
+    if args.db_v6:
+        worker_argv += ["--db-v6", args.db_v6]
+    rows = []
+    version = None
+    try:
+        for backend in args.backends:
+            proc = subprocess.run(worker_argv, env=backend_env(backend), stdout=subprocess.PIPE, check=True)
+            result = json.loads(proc.stdout)
+            version = result["ip2region"]
+            rows += result["rows"]
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    report = {
+        "meta": {
+            "ip2region": version,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "interpreter": args.interpreter,
+            "cpu_count": os.cpu_count(),
+            "n": args.n,
+            "seed": args.seed,
+            "fixture": fixture,
+            "created_at": int(time.time()),
+        },
+        "results": rows,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    for row in rows:
+        print(
+            "{backend:>6} {mode:>6} {policy:>8} v{ip_version} {input:>6} {threads:>3}t {dist:>7}: "
+            "{ops_per_sec:>12.0f} lookups/s  p50 {p50_ns:>7} ns  p99 {p99_ns:>7} ns".format(**row),
+            file=sys.stderr,
+        )
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(rows, json.load(f), args.threshold)
+        for row, before, change in regressions:
+            print(f"regression {change:+.1%}: " + " ".join(f"{k}={row[k]}" for k in KEY)
+                  + f" {before['ops_per_sec']:.0f} -> {row['ops_per_sec']:.0f} lookups/s", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+
+Generate a synthetic xdb for the benchmarks, so they run offline.
+
+    python benchmarks/fixture.py out.xdb [--ip-version 4] [--segments 100000] [--regions 5000]
+"""
+import argparse
+import random
+
+from ip2region.maker import make_xdb
+
+
+def synthetic_ranges(ip_version: int = 4, segments: int = 100000, regions: int = 5000, seed: int = 42):
+    """Random gapless ranges over the whole address space with a pool of fake regions."""
+    rnd = random.Random(seed)
+    bits = 32 if ip_version == 4 else 128
+    pool = [f"国家{i % 200}|省份{i % 1000}|城市{i}|运营商{i % 7}" for i in range(regions)]
+    cuts = sorted(set(rnd.getrandbits(bits) for _ in range(segments - 1)) - {0})
+    start = 0
+    for cut in cuts + [1 << bits]:
+        yield start, cut - 1, rnd.choice(pool)
+        start = cut
+
+
+def make_fixture(path, ip_version: int = 4, segments: int = 100000, regions: int = 5000, seed: int = 42) -> int:
+    """Write a synthetic xdb, returns the number of segments."""
+    return make_xdb(path, synthetic_ranges(ip_version, segments, regions, seed), ip_version)["segments"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("path")
+    parser.add_argument("--ip-version", type=int, choices=(4, 6), default=4)
+    parser.add_argument("--segments", type=int, default=100000)
+    parser.add_argument("--regions", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    count = make_fixture(args.path, args.ip_version, args.segments, args.regions, args.seed)
+    print(f"wrote {args.path}: {count} segments")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,3 +5,9 @@ Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
 __version__ = "0.1.1"
 
 from ip2region.backends import *
+from ip2region.aio import AsyncSearcher
+from ip2region.maker import XdbMaker, make_xdb, overlay
+from ip2region.metrics import latency_quantile, merge_stats, prometheus_text
+from ip2region.pool import SearcherPool
+from ip2region.reload import ReloadableSearcher
+from ip2region.stream import search_file, search_lines
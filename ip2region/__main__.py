@@ -0,0 +1,8 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import sys
+
+from ip2region.cli import main
+
+sys.exit(main())
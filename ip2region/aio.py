@@ -0,0 +1,107 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import asyncio
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncSearcher:
+    """
+    asyncio front end for a Searcher.
+    Lookups awaited within the same event loop tick are coalesced into one batch call,
+    which runs inline for in-memory searchers and in a bounded executor otherwise,
+    so a cold page cache never stalls the event loop.
+    Searchers that are not thread safe are only ever used by one executor thread at a time.
+    Each event loop gets its own batches, so one instance may serve loops in several threads.
+    """
+
+    def __init__(self, searcher, executor=None, max_workers: int = None, max_batch: int = 4096, offload: bool = None):
+        self.searcher = searcher
+        self.max_batch = max_batch
+        self.offload = not searcher.in_memory if offload is None else offload
+        self._own_executor = executor is None and self.offload
+        if self._own_executor:
+            if max_workers is None:
+                max_workers = 4 if searcher.thread_safe else 1
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ip2region")
+        self.executor = executor
+        self._lock = None if searcher.thread_safe else threading.Lock()
+        self._pending = {}  # (loop, by_string) -> [(ip, future)]
+        self._tasks = set()
+
+    def _call(self, by_string: bool, ips: list, errors):
+        method = self.searcher.search_by_string_many if by_string else self.searcher.search_many
+        if self._lock is None:
+            return method(ips, errors=errors)
+        with self._lock:
+            return method(ips, errors=errors)
+
+    async def _run(self, by_string: bool, ips: list, errors):
+        if not self.offload:
+            return self._call(by_string, ips, errors)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, by_string, ips, errors)
+
+    def _enqueue(self, by_string: bool, ip):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (loop, by_string)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = []
+            loop.call_soon(self._flush, key)
+        pending.append((ip, future))
+        return future
+
+    def _flush(self, key: tuple) -> None:
+        # runs on the loop of key, only that loop's thread touches its batch
+        by_string = key[1]
+        pending = self._pending.pop(key)
+        for i in range(0, len(pending), self.max_batch):
+            task = asyncio.ensure_future(self._resolve(by_string, pending[i : i + self.max_batch]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, by_string: bool, batch: list) -> None:
+        ips = [ip for ip, _ in batch]
+        errors = array("i", [0]) * len(ips)
+        try:
+            results = await self._run(by_string, ips, errors)
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for (ip, future), result, err in zip(batch, results, errors):
+            if future.done():
+                continue
+            if result is None:
+                future.set_exception(RuntimeError(f"failed search {ip} with errno={err}"))
+            else:
+                future.set_result(result)
+
+    def search_by_string(self, ip) -> "asyncio.Future":
+        return self._enqueue(True, ip)
+
+    def search(self, ip) -> "asyncio.Future":
+        return self._enqueue(False, ip)
+
+    async def search_by_string_many(self, ips) -> list:
+        return await self._run(True, list(ips), None)
+
+    async def search_many(self, ips) -> list:
+        return await self._run(False, list(ips), None)
+
+    def close(self) -> None:
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -14,7 +14,14 @@ def _should_use_cffi() -> bool:
         return True
 
 
-if not _should_use_cffi():
+def _should_use_python() -> bool:
+    # pure Python backend, no C on the lookup path, meant for PyPy's JIT
+    return os.getenv("IP_USE_PYTHON") is not None
+
+
+if _should_use_python():
+    from ip2region.backends.python import *
+elif not _should_use_cffi():
     from ip2region.backends.cython import *
 else:
     from ip2region.backends.cffi import *
@@ -3,6 +3,17 @@ Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
 """
 
 # todo port cython to cffi
+import mmap
+import os
+import struct
+import threading
+import time
+import warnings
+import weakref
+from array import array
+from bisect import bisect_right
+from ipaddress import IPv4Address, IPv6Address
+from itertools import islice
 from pathlib import Path
 
 from ip2region.backends.cffi._xdb import ffi, lib
@@ -24,6 +35,24 @@ xdb_vector_index_length = 524288
 xdb_region_buffer_wrapper = 1
 xdb_region_buffer_auto = 2
 
+_vector_struct = struct.Struct("<II")  # start ptr, end ptr
+_segment_tail_struct = struct.Struct("<HI")  # data len, data ptr
+
+_LATENCY_BUCKETS = 40  # bucket k counts lookups faster than 2**k ns, the last one everything slower
+_LOOKUP_IO_BUCKETS = 9  # index reads per lookup, the last one 8 or more
+_now_ns = getattr(time, "perf_counter_ns", lambda: int(time.perf_counter() * 1e9))
+_COALESCE_PAGE = 4096  # a coalesced read may cost up to this many bytes per address it serves
+
+_DIRECT_BLOCKS = 1 << 24
+_DIRECT_EMPTY = 0xFFFFFFFF
+_DIRECT_SPLIT = 0x80000000
+
+
+def _check_size(size: int) -> None:
+    # size used to bound the region buffer, regions now come whole from the region cache
+    if size != 1000:
+        warnings.warn("size is ignored and will be removed, regions are no longer cut to size", DeprecationWarning, stacklevel=3)
+
 
 def ensure_bytes(inp: object) -> bytes:
     if isinstance(inp, str):
@@ -36,6 +65,31 @@ def ensure_bytes(inp: object) -> bytes:
         return bytes(inp)
 
 
+def _pack_ip_int(ip, nbytes: int) -> bytes:
+    # big-endian address of an int or an IPv4Address/IPv6Address, nbytes is 4 or 16, 0 picks by the
+    # address family (ints up to 2**32-1 are IPv4). b"" for an address object of the other family,
+    # ints that do not fit nbytes raise OverflowError
+    if isinstance(ip, bool):
+        raise TypeError("expect an int, IPv4Address or IPv6Address, got bool")
+    if not isinstance(ip, int):
+        if isinstance(ip, IPv4Address):
+            family = 4
+        elif isinstance(ip, IPv6Address):
+            family = 16
+        else:
+            raise TypeError(f"expect an int, IPv4Address or IPv6Address, got {type(ip).__name__}")
+        if nbytes == 0:
+            nbytes = family
+        elif nbytes != family:
+            return b""
+        ip = int(ip)
+    if nbytes == 0:
+        nbytes = 4 if 0 <= ip <= 0xFFFFFFFF else 16
+    if ip < 0 or ip >> (nbytes * 8):
+        raise OverflowError(f"{ip} does not fit a {nbytes * 8} bit address")
+    return ip.to_bytes(nbytes, "big")
+
+
 class Header:
     # cdef:
     #     lib.xdb_header_t * header
@@ -49,6 +103,7 @@ class Header:
         self.header = lib.xdb_load_header_from_file(ffi.cast("const char*", ffi.from_buffer(db_path_b)))
         if self.header == ffi.NULL:
             raise RuntimeError(f"failed to load header from {db_path}")
+        self.db_path = db_path
         return self
 
     @property
@@ -130,6 +185,10 @@ class Header:
     # def __releasebuffer__(self, Py_buffer *buffer):
     #     ...
 
+    def __reduce__(self):
+        # reloaded from the file, not copied
+        return _unpickle, ("Header", (self.db_path,))
+
     def __del__(self):
         if self.header != ffi.NULL:
             lib.xdb_free_header(self.header)
@@ -150,6 +209,7 @@ class VectorIndex:
         )
         if self.index == ffi.NULL:
             raise RuntimeError(f"failed to load vector index from {db_path}")
+        self.db_path = db_path
         return self
 
     def getbuffer(self):
@@ -172,6 +232,10 @@ class VectorIndex:
     #     buffer.strides = self.strides
     #     buffer.suboffsets = NULL  # for pointer arrays only
 
+    def __reduce__(self):
+        # reloaded from the file, not copied
+        return _unpickle, ("VectorIndex", (self.db_path,))
+
     def __del__(self):
         if self.index != ffi.NULL:
             lib.xdb_free_vector_index(self.index)
@@ -192,11 +256,24 @@ class Content:
         )
         if self.content == ffi.NULL:
             raise RuntimeError(f"failed to load xdb content from {db_path}")
+        self.db_path = db_path
         return self
 
     def getbuffer(self):
         return ffi.buffer(self.content.buffer, self.content.length)
 
+    def to_shared_memory(self, name=None):
+        """
+        Copy the content into a new shared memory segment and return its SharedMemory.
+        The caller owns the segment: keep it open while other processes attach with
+        Searcher.from_shared_memory(version, shm.name), then close() and unlink() it.
+        """
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=self.content.length)
+        shm.buf[: self.content.length] = self.getbuffer()
+        return shm
+
     # def __getbuffer__(self, Py_buffer *buffer, int flags):
     #     cdef Py_ssize_t itemsize = sizeof(char)
     #     self.strides[0] = itemsize
@@ -214,11 +291,66 @@ class Content:
     #     buffer.strides = self.strides
     #     buffer.suboffsets = NULL  # for pointer arrays only
 
+    def __reduce__(self):
+        # reloaded from the file, not copied
+        return _unpickle, ("Content", (self.db_path,))
+
     def __del__(self):
         if self.content != ffi.NULL:
             lib.xdb_free_content(self.content)
 
 
+_MADVISE = {
+    "normal": "MADV_NORMAL",
+    "random": "MADV_RANDOM",
+    "sequential": "MADV_SEQUENTIAL",
+    "willneed": "MADV_WILLNEED",
+    "hugepage": "MADV_HUGEPAGE",
+}
+
+
+def _attach_shared_memory(name: str):
+    # attach without registering the segment with the resource tracker, so a detaching or exiting
+    # process never unlinks it, its creator owns the lifetime
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # 3.13+
+    except TypeError:
+        pass
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def map_file(db_path: object, advice=None) -> mmap.mmap:
+    """
+    Map an xdb file read-only, the pages are shared with every other process mapping the same file.
+    advice: madvise hints, names from ``normal, random, sequential, willneed, hugepage`` or mmap.MADV_* ints,
+    hints the platform does not support are skipped.
+    """
+    with open(ensure_bytes(db_path), "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if advice is None:
+        return mapping
+    if isinstance(advice, (str, int)):
+        advice = (advice,)
+    for item in advice:
+        if isinstance(item, str):
+            if item not in _MADVISE:
+                mapping.close()
+                raise ValueError(
+                    f"unknown madvise hint {item!r}, expect one of {', '.join(_MADVISE)}"
+                )
+            item = getattr(mmap, _MADVISE[item], None)
+        if item is not None and hasattr(mapping, "madvise"):
+            mapping.madvise(item)
+    return mapping
+
+
 def verify(db_path: object) -> int:
     db_path_b = ensure_bytes(db_path)
     db_path_ptr = ffi.cast("const char*", ffi.from_buffer(db_path_b))
@@ -287,6 +419,9 @@ class Version:
         ret = lib.xdb_version_is_v6(self.version)
         return ret
 
+    def __reduce__(self):
+        return _unpickle, ("Version", (6 if self.is_ipv6() else 4,))
+
 
 def init_winsock() -> int:
     ret = lib.xdb_init_winsock()
@@ -328,6 +463,38 @@ def parse_ip_into(ip_string: str, buffer: bytearray) -> Version:
     return Version.from_ptr(version)
 
 
+def parse_ip_many(ips, out=None) -> tuple:
+    """
+    Parse a batch of ip strings (str or bytes) into the rows of an (N, 16) uint8 buffer.
+    out defaults to a new (N, 16) memoryview. Returns (out, versions), versions is an int8 array
+    holding 4 or 6 per row and 0 for strings that failed to parse. IPv4 rows keep the address
+    in their first 4 bytes, unused bytes are zeroed.
+    Both feed straight into ``search_array(out, versions=versions)``.
+    """
+    keep = [ensure_bytes(ip) for ip in ips]
+    n = len(keep)
+    versions = array("b", bytes(n))
+    if n == 0:
+        # memoryview can not take a (0, 16) shape
+        return (out if out is not None else memoryview(bytearray())), versions
+    if out is None:
+        out = memoryview(bytearray(n * 16)).cast("B", (n, 16))
+    view = memoryview(out)
+    if view.ndim != 2 or view.shape[0] < n or view.shape[1] < 16:
+        raise ValueError(f"out buffer too small, need ({n}, 16), got {view.shape}")
+    width = view.shape[1]
+    rows = ffi.cast("unsigned char *", ffi.from_buffer(view.cast("B")))
+    for i, ip in enumerate(keep):
+        row = rows + i * width
+        version = lib.xdb_parse_ip(ffi.cast("const char*", ffi.from_buffer(ip)), row, 16)
+        if version == ffi.NULL:
+            ffi.memmove(row, bytes(width), width)
+        else:
+            ffi.memmove(row + version.bytes, bytes(width - version.bytes), width - version.bytes)
+            versions[i] = version.id
+    return out, versions
+
+
 def ip_to_string(buffer: bytes) -> str:
     ret = ffi.new("char[100]")
     lib.xdb_ip_to_string(
@@ -370,17 +537,111 @@ class RegionBuffer:
             self.region_buffer = None
 
 
+REGION_FIELDS = ("country", "province", "city", "isp")
+_REGION_COLUMNS = {name: i for i, name in enumerate(REGION_FIELDS)}
+
+
+def _region_columns(fields) -> tuple:
+    # column indexes for a field name or a sequence of names
+    columns = []
+    for name in (fields,) if isinstance(fields, str) else fields:
+        column = _REGION_COLUMNS.get(name)
+        if column is None:
+            raise ValueError(f"unknown region field {name!r}, expect one of {REGION_FIELDS}")
+        columns.append(column)
+    return tuple(columns)
+
+
+def _split_region(raw: bytes) -> list:
+    # the 4 raw columns of a "country|province|city|isp" record, missing columns are empty
+    parts = raw.split(b"|", 4)[:4]
+    parts.extend([b""] * (4 - len(parts)))
+    return parts
+
+
+class Region:
+    """
+    Decoded region record, the fields keep the xdb text as is ("0" is the xdb's "unknown").
+    """
+
+    __slots__ = ("country", "province", "city", "isp")
+
+    def __init__(self, country: str = "", province: str = "", city: str = "", isp: str = ""):
+        self.country = country
+        self.province = province
+        self.city = city
+        self.isp = isp
+
+    @staticmethod
+    def from_raw(raw: bytes) -> "Region":
+        return Region(*(part.decode("utf-8") for part in _split_region(raw)))
+
+    def column(self, index: int) -> str:
+        return getattr(self, REGION_FIELDS[index])
+
+    def __iter__(self):
+        return iter((self.country, self.province, self.city, self.isp))
+
+    def __eq__(self, other):
+        if not isinstance(other, Region):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash((self.country, self.province, self.city, self.isp))
+
+    def __str__(self):
+        return f"{self.country}|{self.province}|{self.city}|{self.isp}"
+
+    def __repr__(self):
+        return f"Region(country={self.country!r}, province={self.province!r}, city={self.city!r}, isp={self.isp!r})"
+
+    def __reduce__(self):
+        return Region, (self.country, self.province, self.city, self.isp)
+
+
 class Searcher:
     # cdef:
     #     lib.xdb_searcher_t searcher
     #     lib.xdb_content_t buf  # pointer to pybuffer
     #     const uint8_t[::1] pybuffer
     #     VectorIndex index
+    #     dict regions  # data_ptr -> region string
+    #     dict region_objects  # data_ptr -> Region
+    #     list columns  # per column dict of data_ptr -> str, filled by projected lookups
+    #     bint regions_complete
+    #     unsigned long long cache_hits
+    #     unsigned long long cache_misses
+    #     SearchStats *counters
+    #     bint stats_on
+    db_path = None
+    use_pread = False  # file reads go through pread on fd instead of the shared FILE*
+    _fd = -1  # -1 reads through the FILE*
+    _shm = None  # attached SharedMemory, detached when the searcher goes away
+    regions = None
+    region_objects = None
+    columns = None
+    regions_complete = False
+    cache_hits = 0
+    cache_misses = 0
+    _counters = None  # [lookups, errors, io, steps, latency_ns, latency histogram, lookup_io histogram]
+    _stats_lock = None
+    stats_on = False
+    _view = None  # memoryview of pybuffer, made by the first search_view
+    index = None
+    _content = None  # Content behind pybuffer
+    _advice = None  # madvise hints of from_mmap
 
     @staticmethod
-    def from_file(version: Version, db_path: object):
+    def from_file(version: Version, db_path: object, pread: bool = False):
+        """
+        pread: read with positional reads on a private fd, the searcher is then thread-safe
+        """
+        if pread:
+            return Searcher._new_pread(version, db_path, None)
         self = Searcher.__new__(Searcher)
         self.searcher = ffi.new("xdb_searcher_t *")
+        self.db_path = db_path
         db_path_b = ensure_bytes(db_path)
         db_path_ptr = ffi.cast("const char *", ffi.from_buffer(db_path_b))
         err = lib.xdb_new_with_file_only(version.version, self.searcher, db_path_ptr)
@@ -388,12 +649,21 @@ class Searcher:
             raise RuntimeError(
                 f"failed to create xdb searcher from {db_path} with errno={err}"
             )
+        _shared_handles.add(self)
         return self
 
     @staticmethod
-    def from_index(version: Version, db_path: object, index: VectorIndex):
+    def from_index(
+        version: Version, db_path: object, index: VectorIndex, pread: bool = False
+    ):
+        """
+        pread: read with positional reads on a private fd, the searcher is then thread-safe
+        """
+        if pread:
+            return Searcher._new_pread(version, db_path, index)
         self = Searcher.__new__(Searcher)
         self.searcher = ffi.new("xdb_searcher_t *")
+        self.db_path = db_path
         db_path_b = ensure_bytes(db_path)
         db_path_ptr = ffi.cast("const char *", ffi.from_buffer(db_path_b))
         self.index = index  # hold a ref
@@ -405,12 +675,30 @@ class Searcher:
                 "failed to create vector index cached searcher with path=%s, errcode=%d"
                 % (db_path, err)
             )
+        _shared_handles.add(self)
+        return self
+
+    @staticmethod
+    def _new_pread(version: Version, db_path: object, index):
+        self = Searcher.__new__(Searcher)
+        self.searcher = ffi.new("xdb_searcher_t *")
+        self.db_path = db_path
+        self._fd = os.open(ensure_bytes(db_path), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self.use_pread = True
+        self.searcher.version = version.version
+        if index is not None:
+            self.index = index  # hold a ref
+            self.searcher.v_index = index.index
         return self
 
     @staticmethod
     def from_buffer(version: Version, buffer: bytes):
         self = Searcher.__new__(Searcher)
         self.searcher = ffi.new("xdb_searcher_t *")
+        if isinstance(buffer, Content):
+            self._content = buffer  # hold a ref, the buffer points into it
+            self.db_path = buffer.db_path
+            buffer = buffer.getbuffer()
         self.pybuffer = buffer  # hold a ref
         self.buf = ffi.new("xdb_content_t *")
         self.buf.length = len(buffer)
@@ -420,62 +708,635 @@ class Searcher:
             raise RuntimeError("failed to create xdb searcher from buffer")
         return self
 
+    @staticmethod
+    def from_mmap(version: Version, db_path: object, advice=None):
+        """
+        Search over a read-only mapping of the xdb file, the mapping lives as long as the searcher.
+        Thread-safe like from_buffer and the pages are shared by every process mapping the file.
+        """
+        self = Searcher.from_buffer(version, map_file(db_path, advice))
+        self.db_path = db_path
+        self._advice = advice
+        return self
+
+    @staticmethod
+    def from_shared_memory(version: Version, name: str):
+        """
+        Search over a shared memory segment made by Content.to_shared_memory, no bytes are copied.
+        The segment is attached for as long as the searcher lives and is never unlinked by it.
+        """
+        shm = _attach_shared_memory(name)
+        self = Searcher.from_buffer(version, shm.buf)
+        self._shm = shm
+        return self
+
+    @staticmethod
+    def from_path(db_path: object, mode: str = "buffer", pread: bool = False):
+        """
+        Open db_path in one of the modes "file", "index", "buffer" or "mmap",
+        the Version comes from the file header. pread applies to file and index modes.
+        """
+        if mode not in ("file", "index", "buffer", "mmap"):
+            raise ValueError(f"mode must be one of 'file', 'index', 'buffer', 'mmap', got {mode!r}")
+        version = Version.from_header(Header.from_file(db_path))
+        if mode == "file":
+            return Searcher.from_file(version, db_path, pread)
+        if mode == "index":
+            return Searcher.from_index(version, db_path, VectorIndex.from_file(db_path), pread)
+        if mode == "buffer":
+            return Searcher.from_buffer(version, Content.from_file(db_path))
+        return Searcher.from_mmap(version, db_path)
+
     def search_by_string(self, ip: object, size: int = 1000) -> str:
-        region_buffer = RegionBuffer(size)
-        ip_b = ensure_bytes(ip)
-        ip_ptr = ffi.cast("const char*", ffi.from_buffer(ip_b))
-        err = lib.xdb_search_by_string(self.searcher, ip_ptr, region_buffer.buffer)
+        _check_size(size)
+        io_count = ffi.new("int *")
+        err, data_ptr, data_len = self._parse_and_locate(ensure_bytes(ip), True, io_count)
         if err != 0:
+            self.searcher.io_count = io_count[0]
             raise RuntimeError(f"failed search {ip} with errno={err}")
-        return ffi.string(ffi.cast("const char*", region_buffer.buffer.value)).decode(
-            "utf-8"
-        )
-
-    def search_by_string_into(self, ip: object, region_buffer: bytearray) -> None:
-        # cdef lib.xdb_region_buffer_t region
-        region = ffi.new("xdb_region_buffer_t *")
-        lib.xdb_region_buffer_init(
-            region,
-            ffi.cast("char*", ffi.from_buffer(region_buffer)),
-            len(region_buffer),
-        )
-
-        ip_b = ensure_bytes(ip)
-        ip_ptr = ffi.cast("const char*", ffi.from_buffer(ip_b))
-        err = lib.xdb_search_by_string(self.searcher, ip_ptr, region)
+        region = self._cached_region(data_ptr, data_len, io_count)
+        self.searcher.io_count = io_count[0]
+        return region
+
+    def search_by_string_into(self, ip: object, region_buffer: bytearray) -> int:
+        """
+        Copy the region bytes of ip into region_buffer, NUL terminated when there is room.
+        Returns the number of region bytes written.
+        """
+        io_count = ffi.new("int *")
+        err, data_ptr, data_len = self._parse_and_locate(ensure_bytes(ip), True, io_count)
         if err != 0:
+            self.searcher.io_count = io_count[0]
             raise RuntimeError(f"failed search {ip} with errno={err}")
+        return self._region_into(data_ptr, data_len, region_buffer, io_count)
 
     def search(self, ip: bytes, size: int = 1000) -> str:
-        region_buffer = RegionBuffer(size)
-        err = lib.xdb_search(
-            self.searcher,
-            ffi.cast("const unsigned char *", ffi.from_buffer(ip)),
-            len(ip),
-            region_buffer.buffer,
-        )
+        _check_size(size)
+        io_count = ffi.new("int *")
+        err, data_ptr, data_len = self._locate(ip, io_count)
         if err != 0:
+            self.searcher.io_count = io_count[0]
             raise RuntimeError(f"failed search {ip} with errno={err}")
-        return ffi.string(ffi.cast("const char*", region_buffer.buffer.value)).decode(
-            "utf-8"
-        )
+        region = self._cached_region(data_ptr, data_len, io_count)
+        self.searcher.io_count = io_count[0]
+        return region
+
+    def search_into(self, ip: bytes, region_buffer: bytearray) -> int:
+        """
+        Copy the region bytes of a packed ip into region_buffer, NUL terminated when there is room.
+        Returns the number of region bytes written.
+        """
+        io_count = ffi.new("int *")
+        err, data_ptr, data_len = self._locate(ip, io_count)
+        if err != 0:
+            self.searcher.io_count = io_count[0]
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        return self._region_into(data_ptr, data_len, region_buffer, io_count)
+
+    def _region_into(self, data_ptr: int, data_len: int, region_buffer, io_count) -> int:
+        region_buffer = memoryview(region_buffer).cast("B")
+        data = None
+        if 0 < data_len <= len(region_buffer):
+            data = self._read(data_ptr, data_len, io_count)
+        self.searcher.io_count = io_count[0]
+        if data_len > len(region_buffer):
+            raise ValueError(f"region buffer too small, need {data_len} bytes, got {len(region_buffer)}")
+        if data_len > 0:
+            if data is None:
+                raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+            region_buffer[:data_len] = data
+        if data_len < len(region_buffer):
+            region_buffer[data_len] = 0
+        return data_len
+
+    def search_view(self, ip: bytes) -> memoryview:
+        """
+        Region bytes of a packed ip as a memoryview into the buffer of a buffer, mmap or shared memory
+        searcher, nothing is copied. The view keeps the buffer alive.
+        """
+        if self.searcher.content == ffi.NULL:
+            raise ValueError("search_view needs a searcher over a buffer (from_buffer, from_mmap or from_shared_memory)")
+        err, data_ptr, data_len = self._locate(ip, ffi.new("int *"))
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        if self._view is None:
+            self._view = memoryview(self.pybuffer).cast("B")
+        return self._view[data_ptr : data_ptr + data_len]
+
+    def search_view_by_string(self, ip: object) -> memoryview:
+        """
+        search_view for an ip string.
+        """
+        if self.searcher.content == ffi.NULL:
+            raise ValueError("search_view needs a searcher over a buffer (from_buffer, from_mmap or from_shared_memory)")
+        err, data_ptr, data_len = self._parse_and_locate(ensure_bytes(ip), True, ffi.new("int *"))
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        if self._view is None:
+            self._view = memoryview(self.pybuffer).cast("B")
+        return self._view[data_ptr : data_ptr + data_len]
+
+    def _search_many(self, ips, by_string: bool, size: int, errors, coalesce=None) -> list:
+        if errors is not None and len(errors) < len(ips):
+            raise ValueError(
+                f"errors buffer too small, need {len(ips)} items, got {len(errors)}"
+            )
+        io_count = ffi.new("int *")
+        if (self.searcher.content == ffi.NULL) if coalesce is None else coalesce:
+            found = self._resolve_sorted(ips, by_string, io_count)
+        else:
+            found = [self._parse_and_locate(ensure_bytes(ip), by_string, io_count) for ip in ips]
+        ret = []
+        for i, (err, data_ptr, data_len) in enumerate(found):
+            if errors is not None:
+                errors[i] = err
+            if err == 0:
+                ret.append(self._cached_region(data_ptr, data_len, io_count))
+            else:
+                ret.append(None)
+        self.searcher.io_count = io_count[0]
+        return ret
 
-    def search_into(self, ip: bytes, region_buffer: bytearray) -> None:
-        # cdef lib.xdb_region_buffer_t region
-        region = ffi.new("xdb_region_buffer_t *")
-        lib.xdb_region_buffer_init(
-            region,
-            ffi.cast("char *", ffi.from_buffer(region_buffer)),
-            len(region_buffer),
-        )
-        err = lib.xdb_search(
-            self.searcher,
-            ffi.cast("const unsigned char *", ffi.from_buffer(ip)),
-            len(ip),
-            region,
-        )
+    def search_by_string_many(self, ips, size: int = 1000, errors=None, coalesce=None) -> list:
+        """
+        Search a batch of ip strings.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        coalesce: sort the batch by address and share index reads between neighbouring ips, the vector
+        rows and segment blocks of the batch are fetched with a few large reads instead of several small
+        ones per ip. Defaults to on for file and index mode. get_io_count() reports the reads of the batch.
+        """
+        if not isinstance(ips, (list, tuple)):
+            ips = list(ips)
+        _check_size(size)
+        return self._search_many(ips, True, size, errors, coalesce)
+
+    def search_many(self, ips, size: int = 1000, errors=None, coalesce=None) -> list:
+        """
+        Search a batch of packed ip bytes.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        coalesce: same as for search_by_string_many.
+        """
+        if not isinstance(ips, (list, tuple)):
+            ips = list(ips)
+        _check_size(size)
+        return self._search_many(ips, False, size, errors, coalesce)
+
+    def search_int(self, ip) -> str:
+        """
+        Search an int or an IPv4Address/IPv6Address, packed straight from the int value
+        without a round-trip through a string. Ints that do not fit the xdb's ip version
+        raise OverflowError, an address object of the other version fails with errno=10.
+        """
+        io_count = ffi.new("int *")
+        err, data_ptr, data_len = self._locate(_pack_ip_int(ip, self.searcher.version.bytes), io_count)
+        if err != 0:
+            self.searcher.io_count = io_count[0]
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        region = self._cached_region(data_ptr, data_len, io_count)
+        self.searcher.io_count = io_count[0]
+        return region
+
+    def search_int_many(self, ips, errors=None, coalesce=None) -> list:
+        """
+        Batch version of search_int.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        coalesce: same as for search_by_string_many.
+        """
+        nbytes = self.searcher.version.bytes
+        return self._search_many([_pack_ip_int(ip, nbytes) for ip in ips], False, 1000, errors, coalesce)
+
+    def search_iter(self, iterable, chunk_size: int = 4096, packed: bool = False):
+        """
+        Lazily search an iterable of ip strings (packed ip bytes if packed is set), yielding the
+        regions in order. The input is pulled chunk_size items at a time and resolved as one batch,
+        failed items yield None.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        it = iter(iterable)
+        chunk = list(islice(it, chunk_size))
+        while chunk:
+            yield from self._search_many(chunk, not packed, 1000, None)
+            chunk = list(islice(it, chunk_size))
+
+    def _read(self, offset: int, length: int, io_count):
+        # io_count is owned by the caller, so concurrent pread lookups never share a counter
+        if self.searcher.content != ffi.NULL:
+            if offset + length > self.searcher.content.length:
+                return None
+            return ffi.buffer(self.searcher.content.buffer + offset, length)[:]
+        buffer = ffi.new("char[]", length)
+        io_before = io_count[0]
+        err = lib.ip2region_read(self.searcher, self._fd, offset, buffer, length, io_count)
+        self._count_io(io_count[0] - io_before)
         if err != 0:
+            return None
+        return ffi.buffer(buffer, length)[:]
+
+    def _count_io(self, io: int) -> None:
+        if io and self.stats_on:
+            with self._stats_lock:
+                self._counters[2] += io
+
+    def _locate(self, ip: bytes, io_count) -> tuple:
+        # every lookup goes through here, records stats when they are on
+        if not self.stats_on:
+            return self._walk(ip, io_count)[:3]
+        start = _now_ns()
+        io_before = io_count[0]
+        err, data_ptr, data_len, steps = self._walk(ip, io_count)
+        self._record_lookup(err, _now_ns() - start, io_count[0] - io_before, steps)
+        return err, data_ptr, data_len
+
+    def _record_lookup(self, err: int, ns: int, io: int, steps: int) -> None:
+        with self._stats_lock:
+            counters = self._counters
+            counters[0] += 1
+            if err != 0:
+                counters[1] += 1
+            counters[3] += steps
+            counters[4] += ns
+            counters[5][min(ns.bit_length(), _LATENCY_BUCKETS - 1)] += 1
+            counters[6][min(io, _LOOKUP_IO_BUCKETS - 1)] += 1
+
+    def _walk(self, ip: bytes, io_count) -> tuple:
+        # same walk as xdb_search, but stops at the segment record and hands out the region position.
+        # returns (errno, data_ptr, data_len, bsearch steps), errno is 10 for ip length mismatch,
+        # 20/21 for vector/segment index io errors
+        found = ffi.new("unsigned int[2]")
+        steps = ffi.new("int *")
+        io_before = io_count[0]
+        err = lib.ip2region_walk(self.searcher, self._fd, bytes(ip), len(ip), found, found + 1, io_count, steps)
+        self._count_io(io_count[0] - io_before)
+        return err, found[0], found[1], steps[0]
+
+    def _bsearch(self, ip: bytes, s_ptr: int, e_ptr: int, block: bytes, block_count: int, io_count) -> tuple:
+        # binary search of the segments s_ptr..e_ptr, the first block_count of them may already sit in block.
+        # returns (errno, data_ptr, data_len, bsearch steps), errno is 21 for a segment index io error
+        found = ffi.new("unsigned int[2]")
+        steps = ffi.new("int *")
+        io_before = io_count[0]
+        err = lib.ip2region_bsearch(self.searcher, self._fd, ip, s_ptr, e_ptr, block, block_count,
+                                    found, found + 1, io_count, steps)
+        self._count_io(io_count[0] - io_before)
+        return err, found[0], found[1], steps[0]
+
+    def _locate_sorted(self, keys: list, found: list, io_count) -> None:
+        # keys are (packed ip, index) pairs sorted by address, all of the xdb's length, found[index] gets
+        # (errno, data_ptr, data_len). the vector rows of the batch come with one read when they lie close
+        # together, the segments of a vector cell with one read when that costs at most _COALESCE_PAGE bytes
+        # per address of the cell
+        n = len(keys)
+        if n == 0:
+            return
+        seg_size = self.searcher.version.segment_index_size
+        start = _now_ns() if self.stats_on else 0
+        io_before = io_count[0]
+        cells = [ip[0] << 8 | ip[1] for ip, _ in keys]
+        vector = None
+        first_cell = 0
+        if self.searcher.v_index == ffi.NULL:
+            distinct = sum(1 for k in range(n) if k == 0 or cells[k] != cells[k - 1])
+            span = cells[-1] - cells[0] + 1
+            if distinct > 1 and span * 8 <= distinct * _COALESCE_PAGE:
+                vector = self._read(xdb_header_info_length + cells[0] * 8, span * 8, io_count)
+                if vector is not None:
+                    first_cell = cells[0]
+        total_steps = 0
+        i = 0
+        while i < n:
+            cell = cells[i]
+            j = i + 1
+            while j < n and cells[j] == cell:
+                j += 1
+            err = 0
+            if self.searcher.v_index != ffi.NULL:
+                row = ffi.buffer(self.searcher.v_index.buffer + cell * 8, 8)[:]
+            elif vector is not None:
+                row = vector[(cell - first_cell) * 8 : (cell - first_cell) * 8 + 8]
+            else:
+                row = self._read(xdb_header_info_length + cell * 8, 8, io_count)
+                if row is None:
+                    err = 20
+            block, block_count = b"", 0
+            if err == 0:
+                s_ptr, e_ptr = _vector_struct.unpack(row)
+                count = (e_ptr - s_ptr) // seg_size
+                if 0 < count and count * seg_size <= (j - i) * _COALESCE_PAGE:
+                    block = self._read(s_ptr, count * seg_size, io_count)
+                    if block is None:
+                        block = b""  # the probes read on their own and report the error
+                    else:
+                        block_count = count
+            for ip, index in keys[i:j]:
+                if err != 0:
+                    found[index] = (err, 0, 0)
+                else:
+                    err_, data_ptr, data_len, steps = self._bsearch(ip, s_ptr, e_ptr, block, block_count, io_count)
+                    found[index] = (err_, data_ptr, data_len)
+                    total_steps += steps
+            i = j
+        if self.stats_on:
+            # a coalesced batch has no per lookup timing, time, io and steps are shared out evenly
+            ns = (_now_ns() - start) // n
+            io = io_count[0] - io_before
+            for k, (_, index) in enumerate(keys):
+                self._record_lookup(found[index][0], ns, io // n + (k < io % n), total_steps // n + (k < total_steps % n))
+
+    def _resolve_sorted(self, ips, by_string: bool, io_count) -> list:
+        # parse the batch, sort it by address and locate it in one sweep over the index
+        nbytes = self.searcher.version.bytes
+        found = [None] * len(ips)
+        keys = []
+        for i, ip in enumerate(ips):
+            ip = ensure_bytes(ip)
+            if by_string:
+                buffer = ffi.new("unsigned char[16]")
+                version = lib.xdb_parse_ip(ffi.cast("const char*", ffi.from_buffer(ip)), buffer, 16)
+                if version == ffi.NULL:
+                    found[i] = (1, 0, 0)
+                    if self.stats_on:
+                        self._record_lookup(1, 0, 0, 0)
+                    continue
+                ip = ffi.buffer(buffer, version.bytes)[:]
+            if len(ip) != nbytes:
+                found[i] = (10, 0, 0)
+                if self.stats_on:
+                    self._record_lookup(10, 0, 0, 0)
+                continue
+            keys.append((ip, i))
+        keys.sort()
+        self._locate_sorted(keys, found, io_count)
+        return found
+
+    def _parse_and_locate(self, ip: bytes, by_string: bool, io_count) -> tuple:
+        # errno is 1 if the ip string could not be parsed, otherwise the same as _locate
+        if not by_string:
+            return self._locate(ip, io_count)
+        buffer = ffi.new("unsigned char[16]")
+        version = lib.xdb_parse_ip(ffi.cast("const char*", ffi.from_buffer(ip)), buffer, 16)
+        if version == ffi.NULL:
+            if self.stats_on:
+                self._record_lookup(1, 0, 0, 0)
+            return 1, 0, 0
+        return self._locate(ffi.buffer(buffer, version.bytes)[:], io_count)
+
+    def _cached_region(self, data_ptr: int, data_len: int, io_count) -> str:
+        # repeat hits of a region hand out the very same str object
+        if data_len == 0:
+            return ""
+        if self.regions is None:
+            self.regions = {}
+        region = self.regions.get(data_ptr)
+        if region is not None:
+            self.cache_hits += 1
+            return region
+        self.cache_misses += 1
+        region = self.regions[data_ptr] = self._region_at(data_ptr, data_len, io_count)
+        return region
+
+    def _region_at(self, data_ptr: int, data_len: int, io_count) -> str:
+        buffer = self._read(data_ptr, data_len, io_count)
+        if buffer is None:
+            raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+        return buffer.decode("utf-8")
+
+    def _region_raw(self, data_ptr: int, data_len: int, io_count) -> bytes:
+        buffer = self._read(data_ptr, data_len, io_count)
+        if buffer is None:
+            raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+        return buffer
+
+    def _cached_region_object(self, data_ptr: int, data_len: int, io_count) -> Region:
+        if self.region_objects is None:
+            self.region_objects = {}
+        region = self.region_objects.get(data_ptr)
+        if region is None:
+            region = Region.from_raw(self._region_raw(data_ptr, data_len, io_count))
+            self.region_objects[data_ptr] = region
+        return region
+
+    def _project(self, data_ptr: int, data_len: int, columns: tuple, single: bool, io_count):
+        # decode only the requested columns, each column keeps its own data_ptr -> str cache
+        parts = None
+        values = []
+        if self.columns is None:
+            self.columns = [None, None, None, None]
+        for column in columns:
+            cache = self.columns[column]
+            if cache is None:
+                cache = self.columns[column] = {}
+            value = cache.get(data_ptr)
+            if value is None:
+                region = self.region_objects.get(data_ptr) if self.region_objects is not None else None
+                if region is not None:
+                    value = region.column(column)
+                else:
+                    if parts is None:
+                        parts = _split_region(self._region_raw(data_ptr, data_len, io_count))
+                    value = parts[column].decode("utf-8")
+                cache[data_ptr] = value
+            if single:
+                return value
+            values.append(value)
+        return tuple(values)
+
+    def search_region(self, ip: object, fields=None):
+        """
+        Look up ip and return its Region, None when the ip has no region.
+        A str ip is parsed, anything else is taken as the packed 4/16 byte address.
+        fields: a field name or a tuple of names out of REGION_FIELDS, only those columns are
+        decoded and a str (single name) or a tuple of str is returned instead of a Region.
+        """
+        columns = _region_columns(fields) if fields is not None else None
+        io_count = ffi.new("int *")
+        if isinstance(ip, str):
+            err, data_ptr, data_len = self._parse_and_locate(ensure_bytes(ip), True, io_count)
+        else:
+            err, data_ptr, data_len = self._locate(bytes(ip), io_count)
+        if err != 0:
+            self.searcher.io_count = io_count[0]
             raise RuntimeError(f"failed search {ip} with errno={err}")
+        if data_len == 0:
+            ret = None
+        elif columns is None:
+            ret = self._cached_region_object(data_ptr, data_len, io_count)
+        else:
+            ret = self._project(data_ptr, data_len, columns, isinstance(fields, str), io_count)
+        self.searcher.io_count = io_count[0]
+        return ret
+
+    def _load_regions(self) -> None:
+        # walk the whole segment index once and decode every distinct region
+        if self.regions_complete:
+            return
+        if self.regions is None:
+            self.regions = {}
+        version = self.searcher.version
+        nbytes = version.bytes
+        seg_size = version.segment_index_size
+        io_count = ffi.new("int *")
+        header = self._read(0, 16, io_count)
+        if header is None:
+            raise RuntimeError("failed to read xdb header")
+        start_ptr, end_ptr = _vector_struct.unpack_from(header, 8)
+        count = (end_ptr - start_ptr) // seg_size + 1
+        done = 0
+        while done < count:
+            chunk = min(count - done, 4096)
+            block = self._read(start_ptr + done * seg_size, chunk * seg_size, io_count)
+            if block is None:
+                raise RuntimeError("failed to read segment index with errno=21")
+            for offset in range(nbytes * 2, chunk * seg_size, seg_size):
+                data_len, data_ptr = _segment_tail_struct.unpack_from(block, offset)
+                if data_len != 0 and data_ptr not in self.regions:
+                    self.regions[data_ptr] = self._region_at(data_ptr, data_len, io_count)
+            done += chunk
+        self.regions_complete = True
+
+    def search_array(self, ips, out=None, versions=None):
+        """
+        Vectorized lookup over a contiguous ``uint32`` array of IPv4 addresses (host order)
+        or an ``(N, k)`` ``uint8`` array of packed addresses, k at least the address size of the xdb
+        (the rows of ``parse_ip_many``). versions: per row 4/6/0 as returned by ``parse_ip_many``,
+        rows that are not of the xdb's family fail.
+        Returns an int64 array of region ids (the region offset in the xdb),
+        0 for ips without region and -1 for failed lookups. Use ``regions_for_ids`` to decode them.
+        """
+        view = memoryview(ips)
+        n = view.shape[0]
+        if out is None:
+            out = array("q", [0]) * n
+        if len(out) < n:
+            raise ValueError(f"out buffer too small, need {n} items, got {len(out)}")
+        if n == 0:
+            return out
+        nbytes = self.searcher.version.bytes
+        if view.ndim == 1:
+            if nbytes != xdb_ipv4_bytes:
+                raise ValueError("a 1-D uint32 array only works with an IPv4 searcher")
+            if versions is not None:
+                raise ValueError("versions only go with rows of packed addresses")
+            rows = (value.to_bytes(4, "big") for value in view.cast("B").cast("I"))
+        elif view.ndim == 2:
+            width = view.shape[1]
+            if width < nbytes:
+                raise ValueError(f"expect at least {nbytes} bytes per row, got {width}")
+            if versions is not None and len(versions) < n:
+                raise ValueError(f"versions too short, need {n} items, got {len(versions)}")
+            flat = view.cast("B")
+            rows = (flat[i : i + nbytes].tobytes() for i in range(0, n * width, width))
+        else:
+            raise ValueError(f"expect a 1-D or 2-D array, got {view.ndim}-D")
+        family = self.searcher.version.id
+        io_count = ffi.new("int *")
+        for i, ip in enumerate(rows):
+            if versions is not None and versions[i] != family:
+                out[i] = -1
+                continue
+            err, data_ptr, data_len = self._locate(ip, io_count)
+            if err != 0:
+                out[i] = -1
+            elif data_len == 0:
+                out[i] = 0
+            else:
+                out[i] = data_ptr
+        self.searcher.io_count = io_count[0]
+        return out
+
+    def preload_regions(self) -> int:
+        """
+        Decode every region of the xdb into the region cache up front, returns the number of regions.
+        """
+        self._load_regions()
+        return len(self.regions)
+
+    def region_cache_info(self) -> dict:
+        """
+        Hit/miss counters and size of the region string cache.
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self.regions) if self.regions is not None else 0,
+            "complete": self.regions_complete,
+        }
+
+    def clear_region_cache(self) -> None:
+        self.regions = None
+        self.region_objects = None
+        self.columns = None
+        self.regions_complete = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def region_table(self) -> dict:
+        """
+        Mapping of region id to region string for every region in the xdb.
+        """
+        self._load_regions()
+        return dict(self.regions)
+
+    def regions_for_ids(self, ids) -> list:
+        """
+        Turn region ids returned by ``search_array`` back into strings, None for 0 and -1.
+        """
+        self._load_regions()
+        regions = self.regions
+        return [regions.get(region_id) for region_id in ids]
+
+    def compile(self, direct_table: bool = False) -> "CompiledSearcher":
+        """
+        Flatten the segment index of this searcher into a CompiledSearcher.
+        """
+        return CompiledSearcher.from_searcher(self, direct_table)
+
+    def enable_stats(self, enabled: bool = True) -> None:
+        """
+        Turn lookup stats on or off, counters are updated under a lock while they are on.
+        """
+        if enabled and self._counters is None:
+            self._stats_lock = threading.Lock()
+            self._counters = [0, 0, 0, 0, 0, [0] * _LATENCY_BUCKETS, [0] * _LOOKUP_IO_BUCKETS]
+        self.stats_on = bool(enabled)
+
+    def reset_stats(self) -> None:
+        if self._counters is not None:
+            with self._stats_lock:
+                self._counters[:] = [0, 0, 0, 0, 0, [0] * _LATENCY_BUCKETS, [0] * _LOOKUP_IO_BUCKETS]
+
+    def stats(self) -> dict:
+        """
+        Lookup counters: lookups, errors, io (file reads, region reads included), bsearch_steps,
+        latency_ns (total), latency_histogram (bucket k counts lookups under 2**k ns, the last
+        bucket the slower rest) and lookup_io (index reads per lookup, the last bucket 8 or more).
+        Latency is the index walk of a lookup, region decoding is not part of it.
+        """
+        if self._counters is None:
+            counters = [0, 0, 0, 0, 0, [0] * _LATENCY_BUCKETS, [0] * _LOOKUP_IO_BUCKETS]
+        else:
+            with self._stats_lock:
+                counters = self._counters[:5] + [list(self._counters[5]), list(self._counters[6])]
+        return {
+            "enabled": self.stats_on,
+            "lookups": counters[0],
+            "errors": counters[1],
+            "io": counters[2],
+            "bsearch_steps": counters[3],
+            "latency_ns": counters[4],
+            "latency_histogram": counters[5],
+            "lookup_io": counters[6],
+        }
+
+    @property
+    def in_memory(self):
+        """True for searchers that never touch the disk on lookup (buffer and mmap modes)"""
+        return self.searcher.content != ffi.NULL
+
+    @property
+    def thread_safe(self):
+        """True for searchers that can be shared by threads without a lock (buffer, mmap and pread modes)"""
+        return self.searcher.content != ffi.NULL or self.use_pread
 
     def get_io_count(self) -> int:
         return lib.xdb_get_io_count(self.searcher)
@@ -487,5 +1348,760 @@ class Searcher:
             raise RuntimeError("failed to get version from searcher")
         return Version.from_ptr(version)
 
+    def __reduce__(self):
+        """
+        Pickled by source, not by content: file and index searchers reopen the file, buffer and mmap
+        searchers over a file map it and shared memory searchers attach to the same segment.
+        Only a buffer of unknown origin travels as a copy. Caches and stats start empty.
+        """
+        version = self.get_version()
+        if self._shm is not None:
+            return _unpickle, ("from_shared_memory", (version, self._shm.name))
+        if self.searcher.content != ffi.NULL:
+            if self.db_path is None:
+                return _unpickle, ("from_buffer", (version, bytes(self.pybuffer)))
+            return _unpickle, ("from_mmap", (version, self.db_path, self._advice))
+        if self.index is not None:
+            return _unpickle, ("from_index", (version, self.db_path, self.index, self.use_pread))
+        return _unpickle, ("from_file", (version, self.db_path, self.use_pread))
+
+    def _reopen(self) -> None:
+        # in a forked child the FILE* still shares its file offset with the parent,
+        # point its fd at a new open file description of the same file
+        if self.searcher.handle == ffi.NULL:
+            return
+        fd = os.open(ensure_bytes(self.db_path), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            os.dup2(fd, lib.fileno(self.searcher.handle))
+        finally:
+            os.close(fd)
+
     def __del__(self):
+        if self.use_pread:
+            os.close(self._fd)
         lib.xdb_close(self.searcher)
+        if self._shm is not None:
+            self.pybuffer = None
+            try:
+                self._shm.close()
+            except BufferError:  # views handed out still point into the segment
+                pass
+
+
+# file and index searchers reading through a FILE*, reopened in forked children
+_shared_handles = weakref.WeakSet()
+
+
+def _reopen_after_fork():
+    for searcher in list(_shared_handles):
+        searcher._reopen()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+def _unpickle(kind: str, args: tuple):
+    # rebuilds what the __reduce__ methods hand out, kind is a class or a Searcher constructor
+    if kind == "Version":
+        return Version.ipv6() if args[0] == 6 else Version.ipv4()
+    if kind == "Header":
+        return Header.from_file(*args)
+    if kind == "VectorIndex":
+        return VectorIndex.from_file(*args)
+    if kind == "Content":
+        return Content.from_file(*args)
+    if kind == "DualStackSearcher":
+        return DualStackSearcher.from_searchers(*args)
+    return getattr(Searcher, kind)(*args)
+
+
+class CompiledSearcher:
+    """
+    Read-only searcher over a flat struct-of-arrays copy of the segment index:
+    sorted start/end keys and a parallel region id array.
+    Lookups are a single binary search and never touch the xdb again.
+    """
+
+    # cdef:
+    #     lib.xdb_version_t *version
+    #     starts, ends: array("I") for IPv4, list of int for IPv6
+    #     array("I") region_ids
+    #     list regions  # region id -> region string, id 0 is the empty region
+
+    #     array("I") direct  # IPv4 only, /24 block -> first segment
+    direct = None
+    direct_build_seconds = 0.0
+    direct_split_blocks = 0
+
+    @staticmethod
+    def from_searcher(searcher: Searcher, direct_table: bool = False) -> "CompiledSearcher":
+        self = CompiledSearcher.__new__(CompiledSearcher)
+        self._build(searcher)
+        if direct_table:
+            self.build_direct_table()
+        return self
+
+    @staticmethod
+    def from_buffer(
+        version: Version, buffer: bytes, direct_table: bool = False
+    ) -> "CompiledSearcher":
+        return CompiledSearcher.from_searcher(
+            Searcher.from_buffer(version, buffer), direct_table
+        )
+
+    @staticmethod
+    def from_file(
+        version: Version, db_path: object, direct_table: bool = False
+    ) -> "CompiledSearcher":
+        return CompiledSearcher.from_searcher(
+            Searcher.from_file(version, db_path), direct_table
+        )
+
+    def _build(self, searcher: Searcher) -> None:
+        version = searcher.searcher.version
+        nbytes = version.bytes
+        seg_size = version.segment_index_size
+        io_count = ffi.new("int *")
+        header = searcher._read(0, 16, io_count)
+        if header is None:
+            raise RuntimeError("failed to read xdb header")
+        start_ptr, end_ptr = _vector_struct.unpack_from(header, 8)
+        count = (end_ptr - start_ptr) // seg_size + 1
+        # IPv4 segment ips are stored little-endian, IPv6 ones big-endian
+        order = "little" if nbytes == xdb_ipv4_bytes else "big"
+        starts = array("I") if nbytes == xdb_ipv4_bytes else []
+        ends = array("I") if nbytes == xdb_ipv4_bytes else []
+        region_ids = array("I")
+        regions = [""]
+        ids = {}
+        done = 0
+        while done < count:
+            chunk = min(count - done, 4096)
+            block = searcher._read(start_ptr + done * seg_size, chunk * seg_size, io_count)
+            if block is None:
+                raise RuntimeError("failed to read segment index with errno=21")
+            for offset in range(0, chunk * seg_size, seg_size):
+                starts.append(int.from_bytes(block[offset : offset + nbytes], order))
+                ends.append(
+                    int.from_bytes(block[offset + nbytes : offset + nbytes * 2], order)
+                )
+                data_len, data_ptr = _segment_tail_struct.unpack_from(
+                    block, offset + nbytes * 2
+                )
+                if data_len == 0:
+                    region_ids.append(0)
+                    continue
+                region_id = ids.get(data_ptr)
+                if region_id is None:
+                    region_id = ids[data_ptr] = len(regions)
+                    regions.append(searcher._cached_region(data_ptr, data_len, io_count))
+                region_ids.append(region_id)
+            done += chunk
+        self.version = version
+        self.starts = starts
+        self.ends = ends
+        self.region_ids = region_ids
+        self.regions = regions
+
+    def build_direct_table(self) -> dict:
+        """
+        Opt-in IPv4 accelerator: a 2^24 entry table keyed by the top 24 bits of the ip.
+        /24 blocks covered by a single segment resolve with one read,
+        split blocks fall back to a binary search narrowed to the segments of that block.
+        Costs 64 MiB, returns ``direct_table_info()``.
+        """
+        if self.version.bytes != xdb_ipv4_bytes:
+            raise ValueError("the direct table only works with IPv4")
+        if self.direct is not None:
+            return self.direct_table_info()
+        t = time.perf_counter()
+        direct = array("I", [_DIRECT_EMPTY]) * _DIRECT_BLOCKS
+        split_blocks = 0
+        for k, (start, end) in enumerate(zip(self.starts, self.ends)):
+            b0 = start >> 8
+            b1 = end >> 8
+            for b, full in (
+                (b0, (start & 0xFF) == 0 and (b0 < b1 or (end & 0xFF) == 0xFF)),
+                (b1, (end & 0xFF) == 0xFF),
+            ):
+                if direct[b] == _DIRECT_EMPTY:
+                    direct[b] = k if full else k | _DIRECT_SPLIT
+                    split_blocks += not full
+                else:
+                    split_blocks += not direct[b] & _DIRECT_SPLIT
+                    direct[b] |= _DIRECT_SPLIT
+                if b0 == b1:
+                    break
+            if b1 - b0 > 1:
+                direct[b0 + 1 : b1] = array("I", [k]) * (b1 - b0 - 1)
+        self.direct = direct
+        self.direct_split_blocks = split_blocks
+        self.direct_build_seconds = time.perf_counter() - t
+        return self.direct_table_info()
+
+    def direct_table_info(self) -> dict:
+        """
+        Build cost and memory footprint of the /24 direct table.
+        """
+        return {
+            "enabled": self.direct is not None,
+            "build_seconds": self.direct_build_seconds,
+            "memory_bytes": _DIRECT_BLOCKS * 4 if self.direct is not None else 0,
+            "blocks": _DIRECT_BLOCKS,
+            "split_blocks": self.direct_split_blocks,
+        }
+
+    def benchmark_direct_table(self, samples: int = 1000000, seed: int = 2463534242) -> dict:
+        """
+        Time ``samples`` random IPv4 lookups with and without the direct table and report the speedup.
+        """
+        if self.direct is None:
+            self.build_direct_table()
+        keys = []
+        for _ in range(samples):
+            # xorshift32
+            seed ^= (seed << 13) & 0xFFFFFFFF
+            seed ^= seed >> 17
+            seed ^= (seed << 5) & 0xFFFFFFFF
+            keys.append(seed)
+        t = time.perf_counter()
+        for key in keys:
+            self._find_v4(key, False)
+        search_seconds = time.perf_counter() - t
+        t = time.perf_counter()
+        for key in keys:
+            self._find_v4(key, True)
+        direct_seconds = time.perf_counter() - t
+        return {
+            "samples": samples,
+            "search_ns": search_seconds / samples * 1e9,
+            "direct_ns": direct_seconds / samples * 1e9,
+            "speedup": search_seconds / direct_seconds if direct_seconds > 0 else float("inf"),
+        }
+
+    def _find_v4(self, key: int, use_direct: bool) -> int:
+        lo, hi = 0, len(self.starts)
+        if use_direct and self.direct is not None:
+            entry = self.direct[key >> 8]
+            if entry == _DIRECT_EMPTY:
+                return 0
+            if not entry & _DIRECT_SPLIT:
+                return self.region_ids[entry]
+            # narrow the search to the segments overlapping this block
+            lo = entry & ~_DIRECT_SPLIT
+            if (key >> 8) + 1 < _DIRECT_BLOCKS:
+                next_entry = self.direct[(key >> 8) + 1]
+                if next_entry != _DIRECT_EMPTY:
+                    hi = (next_entry & ~_DIRECT_SPLIT) + 1
+        idx = bisect_right(self.starts, key, lo, hi) - 1
+        if idx < lo or self.ends[idx] < key:
+            return 0
+        return self.region_ids[idx]
+
+    def _find(self, ip: bytes) -> int:
+        # returns the region id (0 for no region) or -10 for ip length mismatch
+        if len(ip) != self.version.bytes:
+            return -10
+        key = int.from_bytes(ip, "big")
+        if len(ip) == xdb_ipv4_bytes:
+            return self._find_v4(key, True)
+        idx = bisect_right(self.starts, key) - 1
+        if idx < 0 or self.ends[idx] < key:
+            return 0
+        return self.region_ids[idx]
+
+    def _parse_and_find(self, ip: bytes, by_string: bool) -> int:
+        # returns -1 if the ip string could not be parsed, otherwise the same as _find
+        if not by_string:
+            return self._find(ip)
+        buffer = ffi.new("unsigned char[16]")
+        version = lib.xdb_parse_ip(
+            ffi.cast("const char*", ffi.from_buffer(ip)), buffer, 16
+        )
+        if version == ffi.NULL:
+            return -1
+        return self._find(ffi.buffer(buffer, version.bytes)[:])
+
+    def search_by_string(self, ip: object) -> str:
+        ret = self._parse_and_find(ensure_bytes(ip), True)
+        if ret < 0:
+            raise RuntimeError(f"failed search {ip} with errno={-ret}")
+        return self.regions[ret]
+
+    def search(self, ip: bytes) -> str:
+        ret = self._find(ip)
+        if ret < 0:
+            raise RuntimeError(f"failed search {ip} with errno={-ret}")
+        return self.regions[ret]
+
+    def _search_many(self, ips, by_string: bool, errors) -> list:
+        if not isinstance(ips, (list, tuple)):
+            ips = list(ips)
+        if errors is not None and len(errors) < len(ips):
+            raise ValueError(
+                f"errors buffer too small, need {len(ips)} items, got {len(errors)}"
+            )
+        ret = []
+        for i, ip in enumerate(ips):
+            found = self._parse_and_find(ensure_bytes(ip), by_string)
+            if errors is not None:
+                errors[i] = -found if found < 0 else 0
+            ret.append(self.regions[found] if found >= 0 else None)
+        return ret
+
+    def search_by_string_many(self, ips, errors=None) -> list:
+        return self._search_many(ips, True, errors)
+
+    def search_many(self, ips, errors=None) -> list:
+        return self._search_many(ips, False, errors)
+
+    def search_int(self, ip) -> str:
+        """
+        Same as Searcher.search_int
+        """
+        ret = self._find(_pack_ip_int(ip, self.version.bytes))
+        if ret < 0:
+            raise RuntimeError(f"failed search {ip} with errno={-ret}")
+        return self.regions[ret]
+
+    def search_int_many(self, ips, errors=None) -> list:
+        """
+        Same as Searcher.search_int_many
+        """
+        nbytes = self.version.bytes
+        return self._search_many([_pack_ip_int(ip, nbytes) for ip in ips], False, errors)
+
+    def search_iter(self, iterable, chunk_size: int = 4096, packed: bool = False):
+        """
+        Same as Searcher.search_iter
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        it = iter(iterable)
+        chunk = list(islice(it, chunk_size))
+        while chunk:
+            yield from self._search_many(chunk, not packed, None)
+            chunk = list(islice(it, chunk_size))
+
+    def get_version(self) -> Version:
+        return Version.from_ptr(self.version)
+
+    @property
+    def memory_usage(self):
+        """bytes held by the flat tables, region strings excluded"""
+        if isinstance(self.starts, array):
+            return len(self.starts) * self.starts.itemsize * 3
+        return sum(key.__sizeof__() for key in self.starts) * 2 + len(self.region_ids) * 4
+
+    def __len__(self):
+        return len(self.region_ids)
+
+
+class CachedSearcher:
+    """
+    Bounded result cache in front of a Searcher, keyed by the packed 4/16 byte address.
+    Entries map an address to its region position, the region string itself comes from the
+    searcher's region cache, so a hit costs no IO at all. Eviction uses the CLOCK policy,
+    ttl (seconds, 0 disables it) drops entries older than that on lookup.
+    The table lives in C (ip2region_cache_* of build.py), the same hash map as the cython backend.
+    Searchers that are not thread_safe share one file offset, their file reads are serialized.
+    """
+
+    def __init__(self, searcher: Searcher, capacity: int = 65536, ttl: float = 0):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.searcher = searcher
+        self.capacity = capacity
+        self.ttl = ttl
+        cache = lib.ip2region_cache_new(capacity, int(ttl * 1000000))
+        if cache == ffi.NULL:
+            raise MemoryError
+        self._cache = ffi.gc(cache, lib.ip2region_cache_free)
+        self._found = ffi.new("unsigned int[2]")  # data_ptr, data_len of the last hit, guarded by _lock
+        self._lock = threading.Lock()
+        self._io_lock = None if searcher.thread_safe else threading.Lock()
+
+    def _search(self, ip: bytes, origin) -> str:
+        if self._io_lock is None:
+            return self._lookup(ip, origin)
+        with self._io_lock:
+            return self._lookup(ip, origin)
+
+    def _get(self, ip: bytes):
+        # (data_ptr, data_len) of a live entry, None on a miss
+        with self._lock:
+            if lib.ip2region_cache_get(self._cache, ip, len(ip), self._found):
+                return self._found[0], self._found[1]
+            return None
+
+    def _put(self, ip: bytes, data_ptr: int, data_len: int) -> None:
+        with self._lock:
+            lib.ip2region_cache_put(self._cache, ip, len(ip), data_ptr, data_len)
+
+    def _lookup(self, ip: bytes, origin) -> str:
+        entry = self._get(ip)
+        io_count = ffi.new("int *")
+        if entry is None:
+            err, data_ptr, data_len = self.searcher._locate(ip, io_count)
+            if err != 0:
+                raise RuntimeError(f"failed search {origin} with errno={err}")
+            self._put(ip, data_ptr, data_len)
+        else:
+            data_ptr, data_len = entry
+        return self.searcher._cached_region(data_ptr, data_len, io_count)
+
+    def _search_many(self, ips, by_string: bool, errors) -> list:
+        if errors is not None and len(errors) < len(ips):
+            raise ValueError(
+                f"errors buffer too small, need {len(ips)} items, got {len(errors)}"
+            )
+        if self._io_lock is None:
+            return self._lookup_many(ips, by_string, errors)
+        with self._io_lock:
+            return self._lookup_many(ips, by_string, errors)
+
+    def _lookup_many(self, ips, by_string: bool, errors) -> list:
+        # hits come from the cache, the misses of the batch are located by the searcher in one pass,
+        # sorted with shared index reads when the searcher reads from a file
+        nbytes = self.searcher.searcher.version.bytes
+        found = [None] * len(ips)
+        misses = []
+        for i, ip in enumerate(ips):
+            if by_string:
+                buffer = ffi.new("unsigned char[16]")
+                version = lib.xdb_parse_ip(ffi.cast("const char*", ffi.from_buffer(ensure_bytes(ip))), buffer, 16)
+                if version == ffi.NULL:
+                    found[i] = (1, 0, 0)
+                    continue
+                ip = ffi.buffer(buffer, version.bytes)[:]
+            else:
+                ip = bytes(ip)
+            if len(ip) != nbytes:
+                found[i] = (10, 0, 0)
+                continue
+            entry = self._get(ip)
+            if entry is None:
+                misses.append((ip, i))
+            else:
+                found[i] = (0, entry[0], entry[1])
+        io_count = ffi.new("int *")
+        if misses:
+            if self.searcher.in_memory:
+                located = [self.searcher._locate(ip, io_count) for ip, _ in misses]
+            else:
+                located = self.searcher._resolve_sorted([ip for ip, _ in misses], False, io_count)
+            for (ip, i), (err, data_ptr, data_len) in zip(misses, located):
+                found[i] = (err, data_ptr, data_len)
+                if err == 0:
+                    self._put(ip, data_ptr, data_len)
+        ret = []
+        for i, (err, data_ptr, data_len) in enumerate(found):
+            if errors is not None:
+                errors[i] = err
+            if err == 0:
+                ret.append(self.searcher._cached_region(data_ptr, data_len, io_count))
+            else:
+                ret.append(None)
+        return ret
+
+    def search_by_string(self, ip: object) -> str:
+        buffer = ffi.new("unsigned char[16]")
+        version = lib.xdb_parse_ip(
+            ffi.cast("const char*", ffi.from_buffer(ensure_bytes(ip))), buffer, 16
+        )
+        if version == ffi.NULL:
+            raise RuntimeError(f"failed search {ip} with errno=1")
+        return self._search(ffi.buffer(buffer, version.bytes)[:], ip)
+
+    def search(self, ip: bytes) -> str:
+        return self._search(bytes(ip), ip)
+
+    def search_by_string_many(self, ips, errors=None) -> list:
+        """
+        Search a batch of ip strings, the misses of the batch go to the searcher together.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        """
+        if not isinstance(ips, (list, tuple)):
+            ips = list(ips)
+        return self._search_many(ips, True, errors)
+
+    def search_many(self, ips, errors=None) -> list:
+        """
+        Search a batch of packed ip bytes, the misses of the batch go to the searcher together.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        """
+        if not isinstance(ips, (list, tuple)):
+            ips = list(ips)
+        return self._search_many(ips, False, errors)
+
+    @property
+    def in_memory(self):
+        """in_memory of the wrapped searcher"""
+        return self.searcher.in_memory
+
+    @property
+    def thread_safe(self):
+        """thread_safe of the wrapped searcher, the cache itself is always safe to share"""
+        return self.searcher.thread_safe
+
+    def cache_info(self) -> dict:
+        cache = self._cache
+        return {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "evictions": cache.evictions,
+            "expired": cache.expired,
+            "size": cache.size,
+            "capacity": self.capacity,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            lib.ip2region_cache_clear(self._cache)
+
+
+_V6_REGION_ID = 1 << 32  # tags region ids of the IPv6 database in DualStackSearcher
+_ZERO10 = bytes(10)
+
+
+def _route_ip(ip: bytes, map_v4: bool) -> tuple:
+    # (4, key) when ip goes to the IPv4 database (IPv4, or IPv4-mapped ::ffff:a.b.c.d / IPv4-compatible
+    # ::a.b.c.d IPv6 if map_v4), (6, key) for the IPv6 database, (0, None) for a bad length
+    if len(ip) == 4:
+        return 4, ip
+    if len(ip) != 16:
+        return 0, None
+    if map_v4 and ip[:10] == _ZERO10:
+        if ip[10:12] == b"\xff\xff" or (ip[10:12] == b"\x00\x00" and (ip[12:15] != b"\x00\x00\x00" or ip[15] > 1)):
+            return 4, ip[12:]
+    return 6, ip
+
+
+class DualStackSearcher:
+    """
+    One front for an IPv4 and an IPv6 xdb: every address is parsed once and dispatched to the
+    database of its family, IPv4-mapped and IPv4-compatible IPv6 addresses go to the IPv4 one
+    unless map_v4 is False. Either path may be None, lookups of that family then fail with errno=11.
+    """
+
+    def __init__(self, v4_path=None, v6_path=None, mode: str = "buffer", map_v4: bool = True):
+        self._set(
+            Searcher.from_path(v4_path, mode, True) if v4_path is not None else None,
+            Searcher.from_path(v6_path, mode, True) if v6_path is not None else None,
+            map_v4,
+        )
+
+    @staticmethod
+    def from_searchers(v4: Searcher, v6: Searcher, map_v4: bool = True) -> "DualStackSearcher":
+        self = DualStackSearcher.__new__(DualStackSearcher)
+        self._set(v4, v6, map_v4)
+        return self
+
+    def _set(self, v4: Searcher, v6: Searcher, map_v4: bool) -> None:
+        if v4 is not None and v4.searcher.version.bytes != 4:
+            raise ValueError("v4 searcher is not over an IPv4 xdb")
+        if v6 is not None and v6.searcher.version.bytes != 16:
+            raise ValueError("v6 searcher is not over an IPv6 xdb")
+        self.v4 = v4
+        self.v6 = v6
+        self.map_v4 = map_v4
+
+    def __reduce__(self):
+        return _unpickle, ("DualStackSearcher", (self.v4, self.v6, self.map_v4))
+
+    def _route(self, ip: bytes, by_string: bool) -> tuple:
+        # parse once and pick the database, (errno, family, key), errno is 1 for a bad ip string,
+        # 10 for a bad length, 11 without a database
+        if by_string:
+            buffer = ffi.new("unsigned char[16]")
+            version = lib.xdb_parse_ip(ffi.cast("const char*", ffi.from_buffer(ip)), buffer, 16)
+            if version == ffi.NULL:
+                return 1, 0, None
+            ip = ffi.buffer(buffer, version.bytes)[:]
+        family, key = _route_ip(ip, self.map_v4)
+        if family == 0:
+            return 10, 0, None
+        if (self.v4 if family == 4 else self.v6) is None:
+            return 11, family, None
+        return 0, family, key
+
+    def _lookup(self, ip, by_string: bool) -> tuple:
+        # (searcher, data_ptr, data_len) for one ip, raises on failure
+        err, family, key = self._route(ensure_bytes(ip) if by_string else bytes(ip), by_string)
+        if err == 0:
+            searcher = self.v4 if family == 4 else self.v6
+            io_count = ffi.new("int *")
+            err, data_ptr, data_len = searcher._locate(key, io_count)
+            searcher.searcher.io_count = io_count[0]
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        return searcher, data_ptr, data_len
+
+    def search_by_string(self, ip: object) -> str:
+        searcher, data_ptr, data_len = self._lookup(ip, True)
+        return searcher._cached_region(data_ptr, data_len, ffi.new("int *"))
+
+    def search(self, ip: bytes) -> str:
+        """
+        Search a packed 4 or 16 byte address.
+        """
+        searcher, data_ptr, data_len = self._lookup(ip, False)
+        return searcher._cached_region(data_ptr, data_len, ffi.new("int *"))
+
+    def search_int(self, ip) -> str:
+        """
+        Search an int or an IPv4Address/IPv6Address, ints up to 2**32-1 are taken as IPv4.
+        """
+        err, family, key = self._route(_pack_ip_int(ip, 0), False)
+        if err == 0:
+            searcher = self.v4 if family == 4 else self.v6
+            io_count = ffi.new("int *")
+            err, data_ptr, data_len = searcher._locate(key, io_count)
+            searcher.searcher.io_count = io_count[0]
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        return searcher._cached_region(data_ptr, data_len, ffi.new("int *"))
+
+    def search_region(self, ip: object, fields=None):
+        """
+        Same as Searcher.search_region, dispatched by address family.
+        """
+        columns = _region_columns(fields) if fields is not None else None
+        searcher, data_ptr, data_len = self._lookup(ip, isinstance(ip, str))
+        if data_len == 0:
+            return None
+        io_count = ffi.new("int *")
+        if columns is None:
+            return searcher._cached_region_object(data_ptr, data_len, io_count)
+        return searcher._project(data_ptr, data_len, columns, isinstance(fields, str), io_count)
+
+    def _search_many(self, ips, by_string: bool, errors) -> list:
+        # route the whole batch, then locate the IPv4 group and the IPv6 group each in one pass,
+        # results land back at their input position
+        if not isinstance(ips, (list, tuple)):
+            ips = list(ips)
+        n = len(ips)
+        if errors is not None and len(errors) < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {len(errors)}")
+        routed = [self._route(ensure_bytes(ip), by_string) for ip in ips]
+        found = [None] * n
+        for family, searcher in ((4, self.v4), (6, self.v6)):
+            if searcher is None:
+                continue
+            io_count = ffi.new("int *")
+            for i, (err, fam, key) in enumerate(routed):
+                if err == 0 and fam == family:
+                    found[i] = searcher._locate(key, io_count)
+            searcher.searcher.io_count = io_count[0]
+        ret = []
+        io_count = ffi.new("int *")
+        for i, (err, family, _) in enumerate(routed):
+            if err == 0:
+                err, data_ptr, data_len = found[i]
+            if errors is not None:
+                errors[i] = err
+            if err == 0:
+                searcher = self.v4 if family == 4 else self.v6
+                ret.append(searcher._cached_region(data_ptr, data_len, io_count))
+            else:
+                ret.append(None)
+        return ret
+
+    def search_by_string_many(self, ips, errors=None) -> list:
+        """
+        Search a batch of mixed IPv4/IPv6 strings, failed items are None.
+        """
+        return self._search_many(ips, True, errors)
+
+    def search_many(self, ips, errors=None) -> list:
+        """
+        Search a batch of packed 4/16 byte addresses, failed items are None.
+        """
+        return self._search_many(ips, False, errors)
+
+    def search_int_many(self, ips, errors=None) -> list:
+        """
+        Search a batch of ints and IPv4Address/IPv6Address objects, failed items are None.
+        """
+        return self._search_many([_pack_ip_int(ip, 0) for ip in ips], False, errors)
+
+    def search_array(self, ips, out=None, versions=None):
+        """
+        Vectorized lookup over an (N, 16) uint8 array of IPv6 rows, IPv4 traffic as IPv4-mapped rows
+        (or an (N, 4) array / 1-D uint32 array of pure IPv4). With the versions of ``parse_ip_many``
+        rows of mixed families are dispatched by their version instead.
+        Returns int64 region ids, ids of the IPv6 database are tagged with 1 << 32,
+        0 for no region and -1 for failures. Use ``regions_for_ids`` to decode them.
+        """
+        view = memoryview(ips)
+        if view.shape[0] == 0:
+            return out if out is not None else array("q")
+        if versions is None and (view.ndim == 1 or (view.ndim == 2 and view.shape[1] == 4)):
+            if self.v4 is None:
+                raise ValueError("no IPv4 database for an IPv4 array")
+            return self.v4.search_array(ips, out)
+        if view.ndim != 2 or view.shape[1] < 16:
+            raise ValueError(f"expect a 1-D uint32 array or rows of 4 or 16 bytes, got shape {view.shape}")
+        n = view.shape[0]
+        if out is None:
+            out = array("q", [0]) * n
+        if len(out) < n:
+            raise ValueError(f"out buffer too small, need {n} items, got {len(out)}")
+        if versions is not None and len(versions) < n:
+            raise ValueError(f"versions too short, need {n} items, got {len(versions)}")
+        width = view.shape[1]
+        raw = view.cast("B").tobytes()
+        io4 = ffi.new("int *")
+        io6 = ffi.new("int *")
+        for i in range(n):
+            version = 6 if versions is None else versions[i]
+            if version not in (4, 6):
+                out[i] = -1
+                continue
+            family, key = _route_ip(raw[i * width : i * width + (4 if version == 4 else 16)], self.map_v4)
+            searcher = self.v4 if family == 4 else self.v6
+            if searcher is None:
+                out[i] = -1
+                continue
+            err, data_ptr, data_len = searcher._locate(key, io4 if family == 4 else io6)
+            if err != 0:
+                out[i] = -1
+            elif data_len == 0:
+                out[i] = 0
+            else:
+                out[i] = data_ptr | (_V6_REGION_ID if family == 6 else 0)
+        if self.v4 is not None:
+            self.v4.searcher.io_count = io4[0]
+        if self.v6 is not None:
+            self.v6.searcher.io_count = io6[0]
+        return out
+
+    def regions_for_ids(self, ids) -> list:
+        """
+        Turn region ids returned by ``search_array`` back into strings, None for 0 and -1.
+        """
+        regions4 = regions6 = None
+        ret = []
+        for region_id in ids:
+            if region_id <= 0:
+                ret.append(None)
+            elif region_id & _V6_REGION_ID:
+                if regions6 is None:
+                    self.v6._load_regions()
+                    regions6 = self.v6.regions
+                ret.append(regions6.get(region_id ^ _V6_REGION_ID))
+            else:
+                if regions4 is None:
+                    self.v4._load_regions()
+                    regions4 = self.v4.regions
+                ret.append(regions4.get(region_id))
+        return ret
+
+    @property
+    def in_memory(self):
+        return (self.v4 is None or self.v4.in_memory) and (self.v6 is None or self.v6.in_memory)
+
+    @property
+    def thread_safe(self):
+        return (self.v4 is None or self.v4.thread_safe) and (self.v6 is None or self.v6.thread_safe)
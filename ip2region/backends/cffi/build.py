@@ -233,11 +233,322 @@ int xdb_search(xdb_searcher_t *, const bytes_ip_t *, int, xdb_region_buffer_t *)
 xdb_version_t * xdb_get_version(xdb_searcher_t *);
 
 int xdb_get_io_count(xdb_searcher_t *);
+
+// reopening file handles after fork
+int fileno(FILE *);
+
+// lookup walk, same as the cython backend: stops at the segment record and hands out the region position.
+// fd >= 0 reads with pread on fd instead of the searcher's FILE*
+int ip2region_read(xdb_searcher_t *, int, unsigned int, char *, size_t, int *);
+int ip2region_bsearch(xdb_searcher_t *, int, const char *, unsigned int, unsigned int, const char *, int,
+                      unsigned int *, unsigned int *, int *, int *);
+int ip2region_walk(xdb_searcher_t *, int, const char *, int, unsigned int *, unsigned int *, int *, int *);
+
+// result cache of CachedSearcher, same table as the cython backend: packed ip -> region position,
+// CLOCK eviction. not synchronized, callers hold a lock
+typedef struct {
+    size_t capacity;
+    size_t size;
+    unsigned long long hits;
+    unsigned long long misses;
+    unsigned long long evictions;
+    unsigned long long expired;
+    ...;
+} ip2region_cache_t;
+
+ip2region_cache_t * ip2region_cache_new(size_t, long);
+void ip2region_cache_free(ip2region_cache_t *);
+int ip2region_cache_get(ip2region_cache_t *, const char *, int, unsigned int *);
+void ip2region_cache_put(ip2region_cache_t *, const char *, int, unsigned int, unsigned int);
+void ip2region_cache_clear(ip2region_cache_t *);
     """
 )
 
 source = """
+#include <stdlib.h>
+#include <string.h>
 #include "xdb_api.h"
+
+#ifdef _WIN32
+#include <windows.h>
+#include <io.h>
+static long long ip2region_pread(int fd, void *buffer, size_t length, long long offset)
+{
+    OVERLAPPED ov;
+    DWORD done = 0;
+    memset(&ov, 0, sizeof(ov));
+    ov.Offset = (DWORD)(offset & 0xffffffff);
+    ov.OffsetHigh = (DWORD)(offset >> 32);
+    if (!ReadFile((HANDLE)_get_osfhandle(fd), buffer, (DWORD)length, &done, &ov))
+        return -1;
+    return (long long)done;
+}
+#else
+#include <unistd.h>
+static long long ip2region_pread(int fd, void *buffer, size_t length, long long offset)
+{
+    return (long long)pread(fd, buffer, length, (off_t)offset);
+}
+#endif
+
+// length bytes at offset, from the content in buffer mode, with pread when fd >= 0,
+// otherwise through the searcher's FILE*. returns 0, or -1 on a short read
+static int ip2region_read(xdb_searcher_t *searcher, int fd, unsigned int offset, char *buffer, size_t length, int *io_count)
+{
+    long long ret;
+    size_t done = 0;
+    if (searcher->content != NULL) {
+        if ((size_t)offset + length > searcher->content->length)
+            return -1;
+        memcpy(buffer, searcher->content->buffer + offset, length);
+        return 0;
+    }
+    io_count[0] += 1;
+    if (fd >= 0) {
+        while (done < length) {
+            ret = ip2region_pread(fd, buffer + done, length - done, (long long)offset + (long long)done);
+            if (ret <= 0)
+                return -1;
+            done += (size_t)ret;
+        }
+        return 0;
+    }
+    if (fseek(searcher->handle, (long)offset, SEEK_SET) != 0)
+        return -1;
+    if (fread(buffer, 1, length, searcher->handle) != length)
+        return -1;
+    return 0;
+}
+
+// binary search of the segments s_ptr..e_ptr, the first block_count of them may already sit in block.
+// returns 0, or 21 for a segment index io error
+static int ip2region_bsearch(xdb_searcher_t *searcher, int fd, const char *ip, unsigned int s_ptr, unsigned int e_ptr,
+                             const char *block, int block_count, unsigned int *data_ptr, unsigned int *data_len,
+                             int *io_count, int *steps)
+{
+    xdb_version_t *version = searcher->version;
+    int nbytes = version->bytes;
+    int seg_size = version->segment_index_size;
+    int l = 0, h = (int)((e_ptr - s_ptr) / seg_size), m;
+    char segment_buffer[38];
+    const char *buffer;
+    *data_ptr = 0;
+    *data_len = 0;
+    while (l <= h) {
+        m = (l + h) >> 1;
+        *steps += 1;
+        if (searcher->content != NULL) {
+            if ((size_t)s_ptr + (size_t)(m + 1) * seg_size > searcher->content->length)
+                return 21;
+            buffer = searcher->content->buffer + s_ptr + m * seg_size;
+        } else if (m < block_count) {
+            buffer = block + m * seg_size;
+        } else {
+            if (ip2region_read(searcher, fd, s_ptr + m * seg_size, segment_buffer, seg_size, io_count) != 0)
+                return 21;
+            buffer = segment_buffer;
+        }
+        if (version->ip_compare((const bytes_ip_t *)ip, nbytes, buffer, 0) < 0) {
+            h = m - 1;
+        } else if (version->ip_compare((const bytes_ip_t *)ip, nbytes, buffer, nbytes) > 0) {
+            l = m + 1;
+        } else {
+            *data_len = (unsigned int)xdb_le_get_uint16(buffer, nbytes * 2);
+            *data_ptr = xdb_le_get_uint32(buffer, nbytes * 2 + 2);
+            break;
+        }
+    }
+    return 0;
+}
+
+// same walk as xdb_search, but stops at the segment record and hands out the region position.
+// returns 0, 10 for ip length mismatch, 20/21 for vector/segment index io errors
+static int ip2region_walk(xdb_searcher_t *searcher, int fd, const char *ip, int ip_len,
+                          unsigned int *data_ptr, unsigned int *data_len, int *io_count, int *steps)
+{
+    const unsigned char *key = (const unsigned char *)ip;
+    int idx;
+    char vector_buffer[8];
+    const char *buffer;
+    *data_ptr = 0;
+    *data_len = 0;
+    if (ip_len != searcher->version->bytes)
+        return 10;
+    idx = key[0] * xdb_vector_index_cols * xdb_vector_index_size + key[1] * xdb_vector_index_size;
+    if (searcher->v_index != NULL) {
+        buffer = searcher->v_index->buffer + idx;
+    } else if (searcher->content != NULL) {
+        if ((size_t)(xdb_header_info_length + idx + 8) > searcher->content->length)
+            return 20;
+        buffer = searcher->content->buffer + xdb_header_info_length + idx;
+    } else {
+        if (ip2region_read(searcher, fd, (unsigned int)(xdb_header_info_length + idx), vector_buffer, 8, io_count) != 0)
+            return 20;
+        buffer = vector_buffer;
+    }
+    return ip2region_bsearch(searcher, fd, ip, xdb_le_get_uint32(buffer, 0), xdb_le_get_uint32(buffer, 4),
+                             NULL, 0, data_ptr, data_len, io_count, steps);
+}
+
+typedef struct {
+    unsigned char key[16];
+    int key_len;
+    unsigned int data_ptr;
+    unsigned int data_len;
+    int next;                  // next slot in the same bucket, -1 ends the chain
+    unsigned char referenced;  // CLOCK bit
+    long stored_at;            // xdb_now() microseconds
+} ip2region_cache_slot_t;
+
+typedef struct {
+    size_t capacity;
+    size_t size;
+    unsigned long long hits;
+    unsigned long long misses;
+    unsigned long long evictions;
+    unsigned long long expired;
+    size_t hand;
+    unsigned int mask;
+    long ttl_us;
+    int *buckets;
+    ip2region_cache_slot_t *slots;
+} ip2region_cache_t;
+
+static unsigned int ip2region_fnv1a(const unsigned char *key, int length)
+{
+    unsigned int h = 2166136261u;
+    int i;
+    for (i = 0; i < length; i++)
+        h = (h ^ key[i]) * 16777619u;
+    return h;
+}
+
+// NULL when out of memory
+static ip2region_cache_t *ip2region_cache_new(size_t capacity, long ttl_us)
+{
+    size_t nbuckets = 1;
+    ip2region_cache_t *cache = (ip2region_cache_t *)calloc(1, sizeof(ip2region_cache_t));
+    if (cache == NULL)
+        return NULL;
+    while (nbuckets < capacity)
+        nbuckets <<= 1;
+    cache->capacity = capacity;
+    cache->mask = (unsigned int)(nbuckets - 1);
+    cache->ttl_us = ttl_us;
+    cache->buckets = (int *)malloc(nbuckets * sizeof(int));
+    cache->slots = (ip2region_cache_slot_t *)malloc(capacity * sizeof(ip2region_cache_slot_t));
+    if (cache->buckets == NULL || cache->slots == NULL) {
+        free(cache->buckets);
+        free(cache->slots);
+        free(cache);
+        return NULL;
+    }
+    memset(cache->buckets, 0xff, nbuckets * sizeof(int));  // -1
+    return cache;
+}
+
+static void ip2region_cache_free(ip2region_cache_t *cache)
+{
+    free(cache->buckets);
+    free(cache->slots);
+    free(cache);
+}
+
+// 1 and the region position in found[0] (data_ptr) / found[1] (data_len) for a live entry, 0 on a miss
+static int ip2region_cache_get(ip2region_cache_t *cache, const char *ip, int key_len, unsigned int *found)
+{
+    const unsigned char *key = (const unsigned char *)ip;
+    ip2region_cache_slot_t *slot;
+    int i;
+    if (key_len <= 16) {
+        i = cache->buckets[ip2region_fnv1a(key, key_len) & cache->mask];
+        while (i >= 0) {
+            slot = &cache->slots[i];
+            if (slot->key_len == key_len && memcmp(slot->key, key, key_len) == 0) {
+                if (cache->ttl_us > 0 && xdb_now() - slot->stored_at > cache->ttl_us) {
+                    cache->expired += 1;
+                    break;
+                }
+                slot->referenced = 1;
+                found[0] = slot->data_ptr;
+                found[1] = slot->data_len;
+                cache->hits += 1;
+                return 1;
+            }
+            i = slot->next;
+        }
+    }
+    cache->misses += 1;
+    return 0;
+}
+
+static void ip2region_cache_unlink(ip2region_cache_t *cache, int victim)
+{
+    ip2region_cache_slot_t *slot = &cache->slots[victim];
+    int *link = &cache->buckets[ip2region_fnv1a(slot->key, slot->key_len) & cache->mask];
+    while (*link >= 0) {
+        if (*link == victim) {
+            *link = slot->next;
+            return;
+        }
+        link = &cache->slots[*link].next;
+    }
+}
+
+static void ip2region_cache_put(ip2region_cache_t *cache, const char *ip, int key_len,
+                                unsigned int data_ptr, unsigned int data_len)
+{
+    const unsigned char *key = (const unsigned char *)ip;
+    unsigned int bucket;
+    ip2region_cache_slot_t *slot = NULL;
+    int i;
+    if (key_len > 16)
+        return;
+    bucket = ip2region_fnv1a(key, key_len) & cache->mask;
+    i = cache->buckets[bucket];
+    while (i >= 0) {
+        slot = &cache->slots[i];
+        if (slot->key_len == key_len && memcmp(slot->key, key, key_len) == 0)
+            break;
+        i = slot->next;
+    }
+    if (i < 0) {
+        if (cache->size < cache->capacity) {
+            i = (int)cache->size;
+            cache->size += 1;
+        } else {
+            // CLOCK: give referenced slots a second chance
+            while (cache->slots[cache->hand].referenced) {
+                cache->slots[cache->hand].referenced = 0;
+                cache->hand = (cache->hand + 1) % cache->capacity;
+            }
+            i = (int)cache->hand;
+            cache->hand = (cache->hand + 1) % cache->capacity;
+            ip2region_cache_unlink(cache, i);
+            cache->evictions += 1;
+        }
+        slot = &cache->slots[i];
+        memcpy(slot->key, key, key_len);
+        slot->key_len = key_len;
+        slot->next = cache->buckets[bucket];
+        cache->buckets[bucket] = i;
+    }
+    slot->data_ptr = data_ptr;
+    slot->data_len = data_len;
+    slot->referenced = 0;
+    slot->stored_at = cache->ttl_us > 0 ? xdb_now() : 0;
+}
+
+static void ip2region_cache_clear(ip2region_cache_t *cache)
+{
+    memset(cache->buckets, 0xff, ((size_t)cache->mask + 1) * sizeof(int));
+    cache->size = 0;
+    cache->hand = 0;
+    cache->hits = 0;
+    cache->misses = 0;
+    cache->evictions = 0;
+    cache->expired = 0;
+}
 """
 
 ffibuilder.set_source(
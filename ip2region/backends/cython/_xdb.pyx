@@ -3,14 +3,100 @@
 import cython
 
 from cpython.bytes cimport (PyBytes_AS_STRING, PyBytes_FromString,
-                            PyBytes_FromStringAndSize)
+                            PyBytes_FromStringAndSize, PyBytes_GET_SIZE)
+from cpython.long cimport PyLong_AsUnsignedLongLongMask
 from cpython.mem cimport PyMem_Free, PyMem_Malloc
-from cpython.unicode cimport PyUnicode_AsUTF8, PyUnicode_FromString
-from libc.stdint cimport uint8_t
-from libc.stdio cimport FILE, fclose, fopen
+from cpython.unicode cimport (PyUnicode_AsUTF8, PyUnicode_DecodeUTF8,
+                              PyUnicode_FromString)
+from libc.stdint cimport int8_t, int32_t, int64_t, uint8_t, uint32_t, uint64_t
+from libc.stdio cimport FILE, SEEK_SET, fclose, fopen, fread, fseek
+from libc.stdlib cimport free, malloc, qsort, realloc
+from libc.string cimport memcmp, memcpy, memset
 
 from ip2region.backends.cython cimport ip2region as xdb
 
+
+cdef extern from * nogil:
+    """
+    #ifdef _WIN32
+    #include <windows.h>
+    #include <io.h>
+    #include <fcntl.h>
+    static long long ip2region_pread(int fd, void *buffer, size_t length, long long offset)
+    {
+        OVERLAPPED ov;
+        DWORD done = 0;
+        memset(&ov, 0, sizeof(ov));
+        ov.Offset = (DWORD)(offset & 0xffffffff);
+        ov.OffsetHigh = (DWORD)(offset >> 32);
+        if (!ReadFile((HANDLE)_get_osfhandle(fd), buffer, (DWORD)length, &done, &ov))
+            return -1;
+        return (long long)done;
+    }
+    static int ip2region_open(const char *path) { return _open(path, _O_RDONLY | _O_BINARY); }
+    static int ip2region_close(int fd) { return _close(fd); }
+    #define ip2region_dup2 _dup2
+    #define ip2region_fileno _fileno
+    #else
+    #include <fcntl.h>
+    #include <unistd.h>
+    static long long ip2region_pread(int fd, void *buffer, size_t length, long long offset)
+    {
+        return (long long)pread(fd, buffer, length, (off_t)offset);
+    }
+    static int ip2region_open(const char *path) { return open(path, O_RDONLY); }
+    static int ip2region_close(int fd) { return close(fd); }
+    #define ip2region_dup2 dup2
+    #define ip2region_fileno fileno
+    #endif
+    static int ip2region_reopen(FILE *handle, const char *path)
+    {
+        int ret, fd = ip2region_open(path);
+        if (fd < 0)
+            return -1;
+        ret = ip2region_dup2(fd, ip2region_fileno(handle));
+        ip2region_close(fd);
+        return ret < 0 ? -1 : 0;
+    }
+    """
+    # positional read without touching any shared file offset
+    long long ip2region_pread(int fd, void *buffer, size_t length, long long offset)
+    int ip2region_open(const char *path)
+    int ip2region_close(int fd)
+    # point the fd of handle at a new open file description of path, the FILE* stays valid
+    int ip2region_reopen(FILE *handle, const char *path)
+
+cdef extern from * nogil:
+    """
+    #ifdef _WIN32
+    #include <windows.h>
+    static unsigned long long ip2region_now_ns(void)
+    {
+        static LARGE_INTEGER frequency;
+        LARGE_INTEGER counter;
+        if (frequency.QuadPart == 0)
+            QueryPerformanceFrequency(&frequency);
+        QueryPerformanceCounter(&counter);
+        return (unsigned long long)(counter.QuadPart / frequency.QuadPart) * 1000000000ULL
+            + (unsigned long long)(counter.QuadPart % frequency.QuadPart) * 1000000000ULL / frequency.QuadPart;
+    }
+    #define ip2region_atomic_add(p, v) ((void)_InterlockedExchangeAdd64((volatile long long *)(p), (long long)(v)))
+    #else
+    #include <time.h>
+    static unsigned long long ip2region_now_ns(void)
+    {
+        struct timespec ts;
+        clock_gettime(CLOCK_MONOTONIC, &ts);
+        return (unsigned long long)ts.tv_sec * 1000000000ULL + (unsigned long long)ts.tv_nsec;
+    }
+    #define ip2region_atomic_add(p, v) ((void)__atomic_fetch_add((p), (unsigned long long)(v), __ATOMIC_RELAXED))
+    #endif
+    """
+    # monotonic clock in nanoseconds, xdb_now() only has microseconds
+    unsigned long long ip2region_now_ns()
+    # relaxed atomic add on an unsigned long long counter
+    void ip2region_atomic_add(unsigned long long *counter, unsigned long long value)
+
 xdb_structure_20           = xdb.xdb_structure_20
 xdb_structure_30           = xdb.xdb_structure_30
 xdb_header_info_length     = xdb.xdb_header_info_length
@@ -27,9 +113,23 @@ xdb_vector_index_length    = xdb.xdb_vector_index_length
 xdb_region_buffer_wrapper  = xdb.xdb_region_buffer_wrapper
 xdb_region_buffer_auto     = xdb.xdb_region_buffer_auto
 
+import mmap
+import os
+import time
+import warnings
+import weakref
+from array import array
+from ipaddress import IPv4Address, IPv6Address
+from itertools import islice
 from pathlib import Path
 
 
+cdef inline int check_size(Py_ssize_t size) except -1:
+    # size used to bound the region buffer, regions now come whole from the region cache
+    if size != 1000:
+        warnings.warn("size is ignored and will be removed, regions are no longer cut to size", DeprecationWarning)
+    return 0
+
 cdef inline bytes ensure_bytes(object inp):
     if isinstance(inp, unicode):
         return inp.encode()
@@ -40,6 +140,55 @@ cdef inline bytes ensure_bytes(object inp):
     else:
         return bytes(inp)
 
+cdef object MAX_V4 = 0xffffffff
+cdef object MAX_V6 = (1 << 128) - 1
+
+cdef int pack_ip_int(object ip, int nbytes, unsigned char *out) except -1:
+    # writes the big-endian address of an int or an IPv4Address/IPv6Address to out, straight from the
+    # int value. nbytes is 4 or 16, 0 picks by the address family (ints up to 2**32-1 are IPv4).
+    # returns the bytes written, 0 for an address object of the other family, ints that do not fit
+    # nbytes raise OverflowError
+    cdef int family = 0, i
+    cdef uint64_t hi, lo
+    if isinstance(ip, bool):
+        raise TypeError("expect an int, IPv4Address or IPv6Address, got bool")
+    if not isinstance(ip, int):
+        if isinstance(ip, IPv4Address):
+            family = 4
+        elif isinstance(ip, IPv6Address):
+            family = 16
+        else:
+            raise TypeError(f"expect an int, IPv4Address or IPv6Address, got {type(ip).__name__}")
+        if nbytes == 0:
+            nbytes = family
+        elif nbytes != family:
+            return 0
+        ip = int(ip)
+    if nbytes == 0:
+        nbytes = 4 if 0 <= ip <= MAX_V4 else 16
+    if ip < 0 or ip > (MAX_V4 if nbytes == 4 else MAX_V6):
+        raise OverflowError(f"{ip} does not fit a {nbytes * 8} bit address")
+    if nbytes == 4:
+        lo = PyLong_AsUnsignedLongLongMask(ip)
+        for i in range(4):
+            out[i] = <unsigned char>(lo >> (24 - 8 * i))
+        return 4
+    lo = PyLong_AsUnsignedLongLongMask(ip)
+    hi = PyLong_AsUnsignedLongLongMask(ip >> 64)
+    for i in range(8):
+        out[i] = <unsigned char>(hi >> (56 - 8 * i))
+        out[8 + i] = <unsigned char>(lo >> (56 - 8 * i))
+    return 16
+
+cdef int pack_ip_ints(list ips, int nbytes, unsigned char *keys, const char **ips_ptr, int *ips_len) except -1:
+    # packs a batch into 16 byte slots of keys, address objects of the other family get length 0 and
+    # fail with errno=10
+    cdef Py_ssize_t i
+    for i in range(len(ips)):
+        ips_ptr[i] = <const char *>(keys + i * 16)
+        ips_len[i] = pack_ip_int(ips[i], nbytes, keys + i * 16)
+    return 0
+
 @cython.final
 @cython.no_gc
 @cython.freelist(8)
@@ -48,6 +197,7 @@ cdef class Header:
         xdb.xdb_header_t * header
         Py_ssize_t[1] shape
         Py_ssize_t[1] strides
+        readonly object db_path
 
     @staticmethod
     def from_file(object db_path):
@@ -56,6 +206,7 @@ cdef class Header:
         self.header = xdb.xdb_load_header_from_file(<const char*>db_path_b)
         if not self.header:
             raise RuntimeError(f"failed to load header from {db_path}")
+        self.db_path = db_path
         return self
 
     @property
@@ -127,6 +278,10 @@ cdef class Header:
     # def __releasebuffer__(self, Py_buffer *buffer):
     #     ...
 
+    def __reduce__(self):
+        # reloaded from the file, not copied
+        return _unpickle, ("Header", (self.db_path,))
+
     def __dealloc__(self):
         if self.header:
             xdb.xdb_free_header(self.header)
@@ -139,6 +294,7 @@ cdef class VectorIndex:
         xdb.xdb_vector_index_t *index
         Py_ssize_t[1] shape
         Py_ssize_t[1] strides
+        readonly object db_path
 
     @staticmethod
     def from_file(object db_path):
@@ -147,6 +303,7 @@ cdef class VectorIndex:
         self.index = xdb.xdb_load_vector_index_from_file(<const char*>db_path_b)
         if not self.index:
             raise RuntimeError(f"failed to load vector index from {db_path}")
+        self.db_path = db_path
         return self
 
     def __getbuffer__(self, Py_buffer *buffer, int flags):
@@ -166,6 +323,10 @@ cdef class VectorIndex:
         buffer.strides = self.strides
         buffer.suboffsets = NULL  # for pointer arrays only
 
+    def __reduce__(self):
+        # reloaded from the file, not copied
+        return _unpickle, ("VectorIndex", (self.db_path,))
+
     def __dealloc__(self):
         if self.index:
             xdb.xdb_free_vector_index(self.index)
@@ -178,6 +339,7 @@ cdef class Content:
         xdb.xdb_content_t *content
         Py_ssize_t[1] shape
         Py_ssize_t[1] strides
+        readonly object db_path
 
     @staticmethod
     def from_file(object db_path):
@@ -186,6 +348,7 @@ cdef class Content:
         self.content = xdb.xdb_load_content_from_file(<const char*>db_path_b)
         if not self.content:
             raise RuntimeError(f"failed to load xdb content from {db_path}")
+        self.db_path = db_path
         return self
 
     def __getbuffer__(self, Py_buffer *buffer, int flags):
@@ -205,11 +368,73 @@ cdef class Content:
         buffer.strides = self.strides
         buffer.suboffsets = NULL  # for pointer arrays only
 
+    def to_shared_memory(self, object name = None):
+        """
+        Copy the content into a new shared memory segment and return its SharedMemory.
+        The caller owns the segment: keep it open while other processes attach with
+        Searcher.from_shared_memory(version, shm.name), then close() and unlink() it.
+        """
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name, create=True, size=self.content.length)
+        cdef uint8_t[::1] view = shm.buf
+        memcpy(&view[0], self.content.buffer, self.content.length)
+        return shm
+
+    def __reduce__(self):
+        # reloaded from the file, not copied
+        return _unpickle, ("Content", (self.db_path,))
+
     def __dealloc__(self):
         if self.content:
             xdb.xdb_free_content(self.content)
 
 
+_MADVISE = {
+    "normal": "MADV_NORMAL",
+    "random": "MADV_RANDOM",
+    "sequential": "MADV_SEQUENTIAL",
+    "willneed": "MADV_WILLNEED",
+    "hugepage": "MADV_HUGEPAGE",
+}
+
+
+def _attach_shared_memory(str name):
+    # attach without registering the segment with the resource tracker, so a detaching or exiting
+    # process never unlinks it, its creator owns the lifetime
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # 3.13+
+    except TypeError:
+        pass
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+def map_file(object db_path, object advice = None):
+    """
+    Map an xdb file read-only, the pages are shared with every other process mapping the same file.
+    advice: madvise hints, names from ``normal, random, sequential, willneed, hugepage`` or mmap.MADV_* ints,
+    hints the platform does not support are skipped.
+    """
+    with open(ensure_bytes(db_path), "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if advice is None:
+        return mapping
+    if isinstance(advice, (str, int)):
+        advice = (advice,)
+    for item in advice:
+        if isinstance(item, str):
+            if item not in _MADVISE:
+                mapping.close()
+                raise ValueError(f"unknown madvise hint {item!r}, expect one of {', '.join(_MADVISE)}")
+            item = getattr(mmap, _MADVISE[item], None)
+        if item is not None and hasattr(mapping, "madvise"):
+            mapping.madvise(item)
+    return mapping
+
+
 cpdef inline int verify(object db_path) except -1:
     cdef bytes db_path_b = ensure_bytes(db_path)
     cdef const char* db_path_ptr = <const char*>db_path_b
@@ -291,6 +516,9 @@ cdef class Version:
             ret = xdb.xdb_version_is_v6(self.version)
         return ret
 
+    def __reduce__(self):
+        return _unpickle, ("Version", (6 if self.is_ipv6() else 4,))
+
 cpdef inline int init_winsock() noexcept:
     cdef int ret
     with nogil:
@@ -329,6 +557,50 @@ cpdef inline Version parse_ip_into(str ip_string, uint8_t[::1] buffer):
         raise RuntimeError(f"failed to parse version")
     return Version.from_ptr(version)
 
+def parse_ip_many(object ips, object out = None):
+    """
+    Parse a batch of ip strings (str or bytes) into the rows of an (N, 16) uint8 buffer, all of them
+    in one nogil pass without a Python object per address. out defaults to a new (N, 16) memoryview.
+    Returns (out, versions), versions is an int8 array holding 4 or 6 per row and 0 for strings that
+    failed to parse. IPv4 rows keep the address in their first 4 bytes, unused bytes are zeroed.
+    Both feed straight into ``search_array(out, versions=versions)``.
+    """
+    cdef list keep = [ip if isinstance(ip, str) else ensure_bytes(ip) for ip in ips]
+    cdef Py_ssize_t n = len(keep), i
+    versions = array("b", bytes(n))
+    if n == 0:
+        # memoryview can not take a (0, 16) shape
+        return (out if out is not None else memoryview(bytearray())), versions
+    if out is None:
+        out = memoryview(bytearray(n * 16)).cast("B", (n, 16))
+    cdef uint8_t[:, ::1] rows = out
+    if rows.shape[0] < n or rows.shape[1] < 16:
+        raise ValueError(f"out buffer too small, need ({n}, 16), got ({rows.shape[0]}, {rows.shape[1]})")
+    cdef int8_t[::1] versions_view = versions
+    cdef Py_ssize_t width = rows.shape[1]
+    cdef xdb.xdb_version_t *version
+    cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+    if not ips_ptr:
+        raise MemoryError
+    try:
+        for i in range(n):
+            if isinstance(keep[i], str):
+                ips_ptr[i] = PyUnicode_AsUTF8(keep[i])
+            else:
+                ips_ptr[i] = PyBytes_AS_STRING(keep[i])
+        with nogil:
+            for i in range(n):
+                version = xdb.xdb_parse_ip(ips_ptr[i], &rows[i, 0], 16)
+                if version == NULL:
+                    memset(&rows[i, 0], 0, width)
+                    versions_view[i] = 0
+                else:
+                    memset(&rows[i, 0] + version.bytes, 0, width - version.bytes)
+                    versions_view[i] = <int8_t>version.id
+    finally:
+        PyMem_Free(ips_ptr)
+    return out, versions
+
 cpdef inline str ip_to_string(const uint8_t[::1] buffer):
     cdef char ret[100]
     with nogil:
@@ -366,6 +638,138 @@ cdef class RegionBuffer:
             self.region_buffer = NULL
 
 
+cdef enum:
+    LATENCY_BUCKETS = 40  # bucket k counts lookups faster than 2**k ns, the last one everything slower
+    LOOKUP_IO_BUCKETS = 9  # index reads per lookup, the last one 8 or more
+
+ctypedef struct SearchStats:
+    unsigned long long lookups
+    unsigned long long errors
+    unsigned long long io
+    unsigned long long steps
+    unsigned long long latency_ns
+    unsigned long long latency[LATENCY_BUCKETS]
+    unsigned long long lookup_io[LOOKUP_IO_BUCKETS]
+
+cdef inline void record_lookup(SearchStats *stats, int err, unsigned long long ns, int io, int steps) noexcept nogil:
+    cdef int bucket = 0
+    while bucket < LATENCY_BUCKETS - 1 and ns >> bucket:
+        bucket += 1
+    ip2region_atomic_add(&stats.lookups, 1)
+    if err != 0:
+        ip2region_atomic_add(&stats.errors, 1)
+    ip2region_atomic_add(&stats.steps, <unsigned long long>steps)
+    ip2region_atomic_add(&stats.latency_ns, ns)
+    ip2region_atomic_add(&stats.latency[bucket], 1)
+    ip2region_atomic_add(&stats.lookup_io[io if io < LOOKUP_IO_BUCKETS - 1 else LOOKUP_IO_BUCKETS - 1], 1)
+
+ctypedef struct BatchKey:
+    unsigned char ip[16]  # zero padded past the address
+    Py_ssize_t index  # position in the batch
+
+cdef int compare_batch_keys(const void *a, const void *b) noexcept nogil:
+    cdef const BatchKey *x = <const BatchKey *>a
+    cdef const BatchKey *y = <const BatchKey *>b
+    cdef int ret = memcmp(x.ip, y.ip, 16)
+    if ret != 0:
+        return ret
+    return (x.index > y.index) - (x.index < y.index)
+
+cdef inline int batch_cell(const BatchKey *key) noexcept nogil:
+    # vector index cell of a key
+    return (key.ip[0] << 8) | key.ip[1]
+
+cdef enum:
+    COALESCE_PAGE = 4096  # a coalesced read may cost up to this many bytes per address it serves
+
+REGION_FIELDS = ("country", "province", "city", "isp")
+cdef dict _REGION_COLUMNS = {name: i for i, name in enumerate(REGION_FIELDS)}
+
+cdef tuple region_columns(object fields):
+    # column indexes for a field name or a sequence of names
+    cdef list columns = []
+    for name in ((fields,) if isinstance(fields, str) else fields):
+        column = _REGION_COLUMNS.get(name)
+        if column is None:
+            raise ValueError(f"unknown region field {name!r}, expect one of {REGION_FIELDS}")
+        columns.append(column)
+    return tuple(columns)
+
+cdef inline void split_region(const char *raw, Py_ssize_t length, Py_ssize_t *bounds) noexcept nogil:
+    # start/end of the 4 columns of a "country|province|city|isp" record, missing columns are empty
+    cdef Py_ssize_t i, start = 0
+    cdef int column = 0
+    for i in range(length):
+        if raw[i] == b'|':
+            bounds[2 * column] = start
+            bounds[2 * column + 1] = i
+            column += 1
+            start = i + 1
+            if column == 4:
+                return
+    bounds[2 * column] = start
+    bounds[2 * column + 1] = length
+    column += 1
+    while column < 4:
+        bounds[2 * column] = length
+        bounds[2 * column + 1] = length
+        column += 1
+
+@cython.final
+@cython.freelist(64)
+cdef class Region:
+    """
+    Decoded region record, the fields keep the xdb text as is ("0" is the xdb's "unknown").
+    """
+    cdef readonly str country, province, city, isp
+
+    def __init__(self, str country = "", str province = "", str city = "", str isp = ""):
+        self.country = country
+        self.province = province
+        self.city = city
+        self.isp = isp
+
+    @staticmethod
+    cdef Region from_raw(const char *raw, Py_ssize_t length):
+        cdef Py_ssize_t bounds[8]
+        cdef Region self = Region.__new__(Region)
+        split_region(raw, length, bounds)
+        self.country = PyUnicode_DecodeUTF8(raw + bounds[0], bounds[1] - bounds[0], NULL)
+        self.province = PyUnicode_DecodeUTF8(raw + bounds[2], bounds[3] - bounds[2], NULL)
+        self.city = PyUnicode_DecodeUTF8(raw + bounds[4], bounds[5] - bounds[4], NULL)
+        self.isp = PyUnicode_DecodeUTF8(raw + bounds[6], bounds[7] - bounds[6], NULL)
+        return self
+
+    cdef inline str column(self, int index):
+        if index == 0:
+            return self.country
+        elif index == 1:
+            return self.province
+        elif index == 2:
+            return self.city
+        return self.isp
+
+    def __iter__(self):
+        return iter((self.country, self.province, self.city, self.isp))
+
+    def __eq__(self, other):
+        if not isinstance(other, Region):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash((self.country, self.province, self.city, self.isp))
+
+    def __str__(self):
+        return f"{self.country}|{self.province}|{self.city}|{self.isp}"
+
+    def __repr__(self):
+        return f"Region(country={self.country!r}, province={self.province!r}, city={self.city!r}, isp={self.isp!r})"
+
+    def __reduce__(self):
+        return Region, (self.country, self.province, self.city, self.isp)
+
+
 @cython.final
 @cython.freelist(8)
 cdef class Searcher:
@@ -373,10 +777,35 @@ cdef class Searcher:
         xdb.xdb_searcher_t searcher
         xdb.xdb_content_t buf  # pointer to pybuffer
         const uint8_t[::1] pybuffer
+        object view  # memoryview of pybuffer, made by the first search_view
         VectorIndex index
+        dict regions  # data_ptr -> region string
+        dict region_objects  # data_ptr -> Region
+        list columns  # per column dict of data_ptr -> str, filled by projected lookups
+        bint regions_complete
+        unsigned long long cache_hits
+        unsigned long long cache_misses
+        bint use_pread  # file reads go through pread on fd instead of the shared FILE*
+        int fd
+        object shm  # attached SharedMemory, detached when the searcher goes away
+        SearchStats *counters  # allocated by enable_stats, lives as long as the searcher
+        bint stats_on
+        readonly object db_path  # the xdb file, None for a buffer of unknown origin
+        object advice  # madvise hints of from_mmap
+        object __weakref__
+
+    def __cinit__(self):
+        # made up front, the region caches are shared by threads of thread_safe searchers
+        self.regions = {}
+        self.region_objects = {}
 
     @staticmethod
-    def from_file(Version version, object db_path):
+    def from_file(Version version, object db_path, bint pread = False):
+        """
+        pread: read with positional reads on a private fd, the searcher is then thread-safe
+        """
+        if pread:
+            return Searcher._new_pread(version, db_path, None)
         cdef Searcher self = Searcher.__new__(Searcher)
         cdef bytes db_path_b = ensure_bytes(db_path)
         cdef int err
@@ -385,10 +814,17 @@ cdef class Searcher:
             err = xdb.xdb_new_with_file_only(version.version, &self.searcher, db_path_ptr)
         if err != 0:
             raise RuntimeError(f"failed to create xdb searcher from {db_path} with errno={err}")
+        self.db_path = db_path
+        _shared_handles.add(self)
         return self
 
     @staticmethod
-    def from_index(Version version, object db_path, VectorIndex index):
+    def from_index(Version version, object db_path, VectorIndex index, bint pread = False):
+        """
+        pread: read with positional reads on a private fd, the searcher is then thread-safe
+        """
+        if pread:
+            return Searcher._new_pread(version, db_path, index)
         cdef Searcher self = Searcher.__new__(Searcher)
         cdef bytes db_path_b = ensure_bytes(db_path)
         cdef int err
@@ -398,6 +834,31 @@ cdef class Searcher:
             err = xdb.xdb_new_with_vector_index(version.version, &self.searcher, db_path_ptr, index.index)
         if err != 0:
             raise RuntimeError("failed to create vector index cached searcher with path=%s, errcode=%d" % (db_path, err))
+        self.db_path = db_path
+        _shared_handles.add(self)
+        return self
+
+    @staticmethod
+    cdef Searcher _new_pread(Version version, object db_path, VectorIndex index):
+        cdef Searcher self = Searcher.__new__(Searcher)
+        cdef bytes db_path_b = ensure_bytes(db_path)
+        cdef const char *db_path_ptr = <const char *> db_path_b
+        with nogil:
+            self.fd = ip2region_open(db_path_ptr)
+        if self.fd < 0:
+            raise RuntimeError(f"failed to open {db_path}")
+        self.use_pread = True
+        self.db_path = db_path
+        self.searcher.version = version.version
+        self.searcher.handle = NULL
+        self.searcher.header = NULL
+        self.searcher.io_count = 0
+        self.searcher.content = NULL
+        if index is not None:
+            self.index = index  # hold a ref
+            self.searcher.v_index = index.index
+        else:
+            self.searcher.v_index = NULL
         return self
 
     @staticmethod
@@ -411,48 +872,890 @@ cdef class Searcher:
             err =  xdb.xdb_new_with_buffer(version.version, &self.searcher, &self.buf)
         if err != 0:
             raise RuntimeError("failed to create xdb searcher from buffer")
+        if isinstance(buffer.base, Content):
+            self.db_path = (<Content>buffer.base).db_path
+        return self
+
+    @staticmethod
+    def from_mmap(Version version, object db_path, object advice = None):
+        """
+        Search over a read-only mapping of the xdb file, the mapping lives as long as the searcher.
+        Thread-safe like from_buffer and the pages are shared by every process mapping the file.
+        """
+        cdef Searcher self = Searcher.from_buffer(version, map_file(db_path, advice))
+        self.db_path = db_path
+        self.advice = advice
+        return self
+
+    @staticmethod
+    def from_shared_memory(Version version, str name):
+        """
+        Search over a shared memory segment made by Content.to_shared_memory, no bytes are copied.
+        The segment is attached for as long as the searcher lives and is never unlinked by it.
+        """
+        shm = _attach_shared_memory(name)
+        cdef Searcher self = Searcher.from_buffer(version, shm.buf)
+        self.shm = shm
         return self
 
+    @staticmethod
+    def from_path(object db_path, str mode = "buffer", bint pread = False):
+        """
+        Open db_path in one of the modes "file", "index", "buffer" or "mmap",
+        the Version comes from the file header. pread applies to file and index modes.
+        """
+        if mode not in ("file", "index", "buffer", "mmap"):
+            raise ValueError(f"mode must be one of 'file', 'index', 'buffer', 'mmap', got {mode!r}")
+        cdef Version version = Version.from_header(Header.from_file(db_path))
+        if mode == "file":
+            return Searcher.from_file(version, db_path, pread)
+        if mode == "index":
+            return Searcher.from_index(version, db_path, VectorIndex.from_file(db_path), pread)
+        if mode == "buffer":
+            return Searcher.from_buffer(version, Content.from_file(db_path))
+        return Searcher.from_mmap(version, db_path)
+
     cpdef inline str search_by_string(self, object ip, Py_ssize_t size = 1000):
-        cdef RegionBuffer region_buffer = RegionBuffer(size)
+        check_size(size)
         cdef bytes ip_b = ensure_bytes(ip)
-        cdef int err
         cdef const char *ip_ptr = <const char*>ip_b
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        cdef str region
         with nogil:
-            err = xdb.xdb_search_by_string(&self.searcher, ip_ptr,  &region_buffer.buffer)
+            err = self._parse_and_locate(ip_ptr, 0, True, &data_ptr, &data_len, &io_count)
         if err != 0:
+            self.searcher.io_count = io_count
             raise RuntimeError(f"failed search {ip} with errno={err}")
-        return PyUnicode_FromString(<const char*>region_buffer.buffer.value)
-
-    cpdef inline search_by_string_into(self, object ip, uint8_t[::1] region_buffer):
-        cdef xdb.xdb_region_buffer_t region
-        xdb.xdb_region_buffer_init(&region, <char*>&region_buffer[0], <size_t>region_buffer.shape[0])
-
+        region = self._cached_region(data_ptr, data_len, &io_count)
+        self.searcher.io_count = io_count
+        return region
+
+    cpdef inline int search_by_string_into(self, object ip, uint8_t[::1] region_buffer) except -1:
+        """
+        Copy the region bytes of ip into region_buffer, NUL terminated when there is room.
+        Returns the number of region bytes written.
+        """
         cdef bytes ip_b = ensure_bytes(ip)
         cdef const char *ip_ptr = <const char *> ip_b
-        cdef int err
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
         with nogil:
-            err = xdb.xdb_search_by_string(&self.searcher, ip_ptr, &region)
+            err = self._parse_and_locate(ip_ptr, 0, True, &data_ptr, &data_len, &io_count)
         if err != 0:
+            self.searcher.io_count = io_count
             raise RuntimeError(f"failed search {ip} with errno={err}")
+        return self._region_into(data_ptr, data_len, region_buffer, &io_count)
 
     cpdef inline str search(self, const uint8_t[::1] ip, Py_ssize_t size = 1000):
-        cdef RegionBuffer region_buffer = RegionBuffer(size)
-        cdef int err
+        check_size(size)
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        cdef str region
         with nogil:
-            err = xdb.xdb_search(&self.searcher, <const unsigned char *>&ip[0], <int>ip.shape[0], &region_buffer.buffer)
+            err = self._locate(<const unsigned char *>&ip[0], <int>ip.shape[0], &data_ptr, &data_len, &io_count)
         if err != 0:
+            self.searcher.io_count = io_count
             raise RuntimeError(f"failed search {ip} with errno={err}")
-        return PyUnicode_FromString(<const char*>region_buffer.buffer.value)
-
-    cpdef inline search_into(self, const uint8_t[::1] ip, uint8_t[::1] region_buffer):
-        cdef xdb.xdb_region_buffer_t region
-        xdb.xdb_region_buffer_init(&region, <char *> &region_buffer[0], <size_t> region_buffer.shape[0])
+        region = self._cached_region(data_ptr, data_len, &io_count)
+        self.searcher.io_count = io_count
+        return region
+
+    cpdef inline int search_into(self, const uint8_t[::1] ip, uint8_t[::1] region_buffer) except -1:
+        """
+        Copy the region bytes of a packed ip into region_buffer, NUL terminated when there is room.
+        Returns the number of region bytes written.
+        """
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        with nogil:
+            err = self._locate(<const unsigned char *>&ip[0], <int>ip.shape[0], &data_ptr, &data_len, &io_count)
+        if err != 0:
+            self.searcher.io_count = io_count
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        return self._region_into(data_ptr, data_len, region_buffer, &io_count)
+
+    cdef int _region_into(self, unsigned int data_ptr, unsigned int data_len, uint8_t[::1] region_buffer, int *io_count) except -1:
+        cdef int err = 0
+        if 0 < <Py_ssize_t>data_len <= region_buffer.shape[0]:
+            with nogil:
+                err = self._read(data_ptr, <char *>&region_buffer[0], data_len, io_count)
+        self.searcher.io_count = io_count[0]
+        if <Py_ssize_t>data_len > region_buffer.shape[0]:
+            raise ValueError(f"region buffer too small, need {data_len} bytes, got {region_buffer.shape[0]}")
+        if err != 0:
+            raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+        if <Py_ssize_t>data_len < region_buffer.shape[0]:
+            region_buffer[data_len] = 0
+        return <int>data_len
+
+    cpdef object search_view(self, const uint8_t[::1] ip):
+        """
+        Region bytes of a packed ip as a memoryview into the buffer of a buffer, mmap or shared memory
+        searcher, nothing is copied. The view keeps the buffer alive.
+        """
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        if self.searcher.content == NULL:
+            raise ValueError("search_view needs a searcher over a buffer (from_buffer, from_mmap or from_shared_memory)")
+        with nogil:
+            err = self._locate(<const unsigned char *>&ip[0], <int>ip.shape[0], &data_ptr, &data_len, &io_count)
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        if self.view is None:
+            self.view = memoryview(self.pybuffer)
+        return self.view[data_ptr:data_ptr + data_len]
+
+    cpdef object search_view_by_string(self, object ip):
+        """
+        search_view for an ip string.
+        """
+        cdef bytes ip_b = ensure_bytes(ip)
+        cdef const char *ip_ptr = <const char *> ip_b
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        if self.searcher.content == NULL:
+            raise ValueError("search_view needs a searcher over a buffer (from_buffer, from_mmap or from_shared_memory)")
+        with nogil:
+            err = self._parse_and_locate(ip_ptr, 0, True, &data_ptr, &data_len, &io_count)
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        if self.view is None:
+            self.view = memoryview(self.pybuffer)
+        return self.view[data_ptr:data_ptr + data_len]
+
+    cdef list _search_many(self, object ips, bint by_string, Py_ssize_t size, int[::1] errors, object coalesce = None):
+        cdef list keep = [ensure_bytes(ip) for ip in ips]
+        cdef Py_ssize_t n = len(keep), i
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef bytes ip_b
+        try:
+            if not ips_ptr or not ips_len:
+                raise MemoryError
+            for i in range(n):
+                ip_b = <bytes>keep[i]
+                ips_ptr[i] = PyBytes_AS_STRING(ip_b)
+                ips_len[i] = <int>PyBytes_GET_SIZE(ip_b)
+            return self._resolve_many(n, ips_ptr, ips_len, by_string, errors, coalesce)
+        finally:
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+
+    cdef list _resolve_many(self, Py_ssize_t n, const char **ips_ptr, int *ips_len, bint by_string, int[::1] errors, object coalesce):
+        # locate the whole batch inside one nogil block, then map region positions through the region cache.
+        # coalesce (default: for file backed searchers) sorts the batch first and shares index reads
+        cdef int * errs = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef unsigned int * data_ptrs = <unsigned int *> PyMem_Malloc(n * sizeof(unsigned int))
+        cdef unsigned int * data_lens = <unsigned int *> PyMem_Malloc(n * sizeof(unsigned int))
+        cdef BatchKey * keys = NULL
+        cdef Py_ssize_t i
+        cdef list ret
+        cdef int io_count = 0, ok = 0
+        try:
+            if not errs or not data_ptrs or not data_lens:
+                raise MemoryError
+            if self.searcher.content == NULL if coalesce is None else coalesce:
+                keys = <BatchKey *> PyMem_Malloc(n * sizeof(BatchKey))
+                if not keys:
+                    raise MemoryError
+            with nogil:
+                if keys != NULL:
+                    ok = self._resolve_sorted(n, ips_ptr, ips_len, by_string, keys, errs, data_ptrs, data_lens, &io_count)
+                else:
+                    for i in range(n):
+                        errs[i] = self._parse_and_locate(ips_ptr[i], ips_len[i], by_string, &data_ptrs[i], &data_lens[i], &io_count)
+            if ok < 0:
+                raise MemoryError
+            ret = []
+            for i in range(n):
+                if errors is not None:
+                    errors[i] = errs[i]
+                if errs[i] == 0:
+                    ret.append(self._cached_region(data_ptrs[i], data_lens[i], &io_count))
+                else:
+                    ret.append(None)
+            return ret
+        finally:
+            self.searcher.io_count = io_count
+            PyMem_Free(errs)
+            PyMem_Free(data_ptrs)
+            PyMem_Free(data_lens)
+            PyMem_Free(keys)
+
+    cpdef inline list search_by_string_many(self, object ips, Py_ssize_t size = 1000, int[::1] errors = None, object coalesce = None):
+        """
+        Search a batch of ip strings, releasing the GIL once for the whole batch.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        coalesce: sort the batch by address and share index reads between neighbouring ips, the vector
+        rows and segment blocks of the batch are fetched with a few large reads instead of several small
+        ones per ip. Defaults to on for file and index mode. get_io_count() reports the reads of the batch.
+        """
+        check_size(size)
+        return self._search_many(ips, True, size, errors, coalesce)
+
+    cpdef inline list search_many(self, object ips, Py_ssize_t size = 1000, int[::1] errors = None, object coalesce = None):
+        """
+        Search a batch of packed ip bytes, releasing the GIL once for the whole batch.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        coalesce: same as for search_by_string_many.
+        """
+        check_size(size)
+        return self._search_many(ips, False, size, errors, coalesce)
+
+    cpdef str search_int(self, object ip):
+        """
+        Search an int or an IPv4Address/IPv6Address, packed in C straight from the int value
+        without a round-trip through a string or bytes. Ints that do not fit the xdb's ip version
+        raise OverflowError, an address object of the other version fails with errno=10.
+        """
+        cdef unsigned char packed[16]
+        cdef int nbytes = self.searcher.version.bytes
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        cdef str region
+        cdef int ip_len = pack_ip_int(ip, nbytes, packed)
+        with nogil:
+            err = self._locate(packed, ip_len, &data_ptr, &data_len, &io_count)
+        if err != 0:
+            self.searcher.io_count = io_count
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        region = self._cached_region(data_ptr, data_len, &io_count)
+        self.searcher.io_count = io_count
+        return region
+
+    cpdef list search_int_many(self, object ips, int[::1] errors = None, object coalesce = None):
+        """
+        Batch version of search_int, releasing the GIL once for the whole batch.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        coalesce: same as for search_by_string_many.
+        """
+        cdef list items = ips if isinstance(ips, list) else list(ips)
+        cdef Py_ssize_t n = len(items)
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        cdef unsigned char * keys = <unsigned char *> PyMem_Malloc(n * 16)
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        try:
+            if not keys or not ips_ptr or not ips_len:
+                raise MemoryError
+            pack_ip_ints(items, self.searcher.version.bytes, keys, ips_ptr, ips_len)
+            return self._resolve_many(n, ips_ptr, ips_len, False, errors, coalesce)
+        finally:
+            PyMem_Free(keys)
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+
+    def search_iter(self, object iterable, Py_ssize_t chunk_size = 4096, bint packed = False):
+        """
+        Lazily search an iterable of ip strings (packed ip bytes if packed is set), yielding the
+        regions in order. The input is pulled chunk_size items at a time and every chunk is
+        resolved with one GIL-free batch, failed items yield None.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        it = iter(iterable)
+        chunk = list(islice(it, chunk_size))
+        while chunk:
+            yield from self._search_many(chunk, not packed, 1000, None)
+            chunk = list(islice(it, chunk_size))
+
+    cdef int _read(self, unsigned int offset, char *buffer, size_t length, int *io_count) noexcept nogil:
+        # io_count is owned by the caller, so concurrent pread lookups never share a counter
+        cdef long long ret
+        cdef size_t done = 0
+        if self.searcher.content != NULL:
+            if <size_t>offset + length > self.searcher.content.length:
+                return -1
+            memcpy(buffer, self.searcher.content.buffer + offset, length)
+            return 0
+        io_count[0] += 1
+        if self.stats_on:
+            ip2region_atomic_add(&self.counters.io, 1)
+        if self.use_pread:
+            while done < length:
+                ret = ip2region_pread(self.fd, buffer + done, length - done, <long long>offset + <long long>done)
+                if ret <= 0:
+                    return -1
+                done += <size_t>ret
+            return 0
+        if fseek(self.searcher.handle, <long>offset, SEEK_SET) != 0:
+            return -1
+        if fread(buffer, 1, length, self.searcher.handle) != length:
+            return -1
+        return 0
+
+    cdef int _locate(self, const unsigned char *ip, int ip_len, unsigned int *data_ptr, unsigned int *data_len, int *io_count) noexcept nogil:
+        # every lookup goes through here, records stats when they are on
+        cdef unsigned long long start
+        cdef int err, steps = 0, io_before = io_count[0]
+        if not self.stats_on:
+            return self._walk(ip, ip_len, data_ptr, data_len, io_count, &steps)
+        start = ip2region_now_ns()
+        err = self._walk(ip, ip_len, data_ptr, data_len, io_count, &steps)
+        record_lookup(self.counters, err, ip2region_now_ns() - start, io_count[0] - io_before, steps)
+        return err
+
+    cdef int _walk(self, const unsigned char *ip, int ip_len, unsigned int *data_ptr, unsigned int *data_len, int *io_count, int *steps) noexcept nogil:
+        # same walk as xdb_search, but stops at the segment record and hands out the region position.
+        # returns 0 on success, 10 for ip length mismatch, 20/21 for vector/segment index io errors
+        cdef xdb.xdb_version_t *version = self.searcher.version
+        cdef int idx
+        cdef unsigned int s_ptr, e_ptr
+        cdef char vector_buffer[8]
+        cdef const char *buffer
+        data_ptr[0] = 0
+        data_len[0] = 0
+        if ip_len != version.bytes:
+            return 10
+        idx = ip[0] * xdb.xdb_vector_index_cols * xdb.xdb_vector_index_size + ip[1] * xdb.xdb_vector_index_size
+        if self.searcher.v_index != NULL:
+            buffer = self.searcher.v_index.buffer + idx
+        elif self.searcher.content != NULL:
+            if <size_t>(xdb.xdb_header_info_length + idx + 8) > self.searcher.content.length:
+                return 20
+            buffer = self.searcher.content.buffer + xdb.xdb_header_info_length + idx
+        else:
+            if self._read(<unsigned int>(xdb.xdb_header_info_length + idx), vector_buffer, 8, io_count) != 0:
+                return 20
+            buffer = vector_buffer
+        s_ptr = xdb.xdb_le_get_uint32(buffer, 0)
+        e_ptr = xdb.xdb_le_get_uint32(buffer, 4)
+        return self._bsearch(ip, s_ptr, e_ptr, NULL, 0, data_ptr, data_len, io_count, steps)
+
+    cdef int _bsearch(self, const unsigned char *ip, unsigned int s_ptr, unsigned int e_ptr, const char *block, int block_count,
+                      unsigned int *data_ptr, unsigned int *data_len, int *io_count, int *steps) noexcept nogil:
+        # binary search of the segments s_ptr..e_ptr, the first block_count of them may already sit in block.
+        # returns 0, or 21 for a segment index io error
+        cdef xdb.xdb_version_t *version = self.searcher.version
+        cdef int nbytes = version.bytes
+        cdef int seg_size = version.segment_index_size
+        cdef int l = 0, h = <int>(e_ptr - s_ptr) // seg_size, m
+        cdef char segment_buffer[38]
+        cdef const char *buffer
+        data_ptr[0] = 0
+        data_len[0] = 0
+        while l <= h:
+            m = (l + h) >> 1
+            steps[0] += 1
+            if self.searcher.content != NULL:
+                if <size_t>s_ptr + <size_t>(m + 1) * seg_size > self.searcher.content.length:
+                    return 21
+                buffer = self.searcher.content.buffer + s_ptr + m * seg_size
+            elif m < block_count:
+                buffer = block + m * seg_size
+            else:
+                if self._read(s_ptr + m * seg_size, segment_buffer, seg_size, io_count) != 0:
+                    return 21
+                buffer = segment_buffer
+            if version.ip_compare(ip, nbytes, buffer, 0) < 0:
+                h = m - 1
+            elif version.ip_compare(ip, nbytes, buffer, nbytes) > 0:
+                l = m + 1
+            else:
+                data_len[0] = <unsigned int>xdb.xdb_le_get_uint16(buffer, nbytes * 2)
+                data_ptr[0] = xdb.xdb_le_get_uint32(buffer, nbytes * 2 + 2)
+                break
+        return 0
+
+    cdef int _locate_sorted(self, BatchKey *keys, Py_ssize_t n, int *errs, unsigned int *data_ptrs, unsigned int *data_lens, int *io_count) noexcept nogil:
+        # keys are sorted by address and all of the xdb's length, results land at their index.
+        # the vector rows of the batch come with one read when they lie close together, the segments of
+        # a vector cell with one read when that costs at most COALESCE_PAGE bytes per address of the cell.
+        # returns -1 when out of memory, nothing is located then
+        cdef int nbytes = self.searcher.version.bytes
+        cdef int seg_size = self.searcher.version.segment_index_size
+        cdef int err, steps, block_count, cell, first_cell = 0, last_cell, cells = 0
+        cdef Py_ssize_t i = 0, j, k, index
+        cdef unsigned int s_ptr = 0, e_ptr = 0
+        cdef unsigned long long start = 0, ns, io, total_steps = 0
+        cdef int io_before = io_count[0]
+        cdef char row[8]
+        cdef const char *vector = NULL
+        cdef char *rows = NULL
+        cdef char *block = NULL
+        cdef char *grown
+        cdef size_t block_size = 0, need
+        if n == 0:
+            return 0
+        if self.stats_on:
+            start = ip2region_now_ns()
+        if self.searcher.v_index != NULL:
+            vector = self.searcher.v_index.buffer
+        else:
+            first_cell = batch_cell(&keys[0])
+            last_cell = batch_cell(&keys[n - 1])
+            for k in range(n):
+                if k == 0 or batch_cell(&keys[k]) != batch_cell(&keys[k - 1]):
+                    cells += 1
+            if cells > 1 and <size_t>(last_cell - first_cell + 1) * 8 <= <size_t>cells * COALESCE_PAGE:
+                rows = <char *>malloc((last_cell - first_cell + 1) * 8)
+                if rows == NULL:
+                    return -1
+                if self._read(<unsigned int>(xdb.xdb_header_info_length + first_cell * 8), rows, (last_cell - first_cell + 1) * 8, io_count) == 0:
+                    vector = rows
+                else:
+                    first_cell = 0
+        while i < n:
+            cell = batch_cell(&keys[i])
+            j = i + 1
+            while j < n and batch_cell(&keys[j]) == cell:
+                j += 1
+            err = 0
+            if vector != NULL:
+                s_ptr = xdb.xdb_le_get_uint32(vector + (cell - first_cell) * 8, 0)
+                e_ptr = xdb.xdb_le_get_uint32(vector + (cell - first_cell) * 8, 4)
+            elif self._read(<unsigned int>(xdb.xdb_header_info_length + cell * 8), row, 8, io_count) == 0:
+                s_ptr = xdb.xdb_le_get_uint32(row, 0)
+                e_ptr = xdb.xdb_le_get_uint32(row, 4)
+            else:
+                err = 20
+            block_count = 0
+            if err == 0:
+                block_count = <int>((e_ptr - s_ptr) // seg_size)
+                need = <size_t>block_count * seg_size
+                if block_count > 0 and need <= <size_t>(j - i) * COALESCE_PAGE:
+                    if need > block_size:
+                        grown = <char *>realloc(block, need)
+                        if grown == NULL:
+                            free(rows)
+                            free(block)
+                            return -1
+                        block = grown
+                        block_size = need
+                    if self._read(s_ptr, block, need, io_count) != 0:
+                        block_count = 0  # the probes read on their own and report the error
+                else:
+                    block_count = 0
+            for k in range(i, j):
+                index = keys[k].index
+                if err != 0:
+                    errs[index] = err
+                    data_ptrs[index] = 0
+                    data_lens[index] = 0
+                else:
+                    steps = 0
+                    errs[index] = self._bsearch(keys[k].ip, s_ptr, e_ptr, block, block_count,
+                                                &data_ptrs[index], &data_lens[index], io_count, &steps)
+                    total_steps += steps
+            i = j
+        free(rows)
+        free(block)
+        if self.stats_on:
+            # a coalesced batch has no per lookup timing, time, io and steps are shared out evenly
+            ns = (ip2region_now_ns() - start) // <unsigned long long>n
+            io = <unsigned long long>(io_count[0] - io_before)
+            for k in range(n):
+                record_lookup(self.counters, errs[keys[k].index], ns,
+                              <int>(io // n + (1 if <unsigned long long>k < io % n else 0)),
+                              <int>(total_steps // n + (1 if <unsigned long long>k < total_steps % n else 0)))
+        return 0
+
+    cdef int _resolve_sorted(self, Py_ssize_t n, const char **ips_ptr, int *ips_len, bint by_string, BatchKey *keys,
+                             int *errs, unsigned int *data_ptrs, unsigned int *data_lens, int *io_count) noexcept nogil:
+        # parse the batch into keys, sort them by address and locate them in one sweep over the index
+        cdef int nbytes = self.searcher.version.bytes, length
+        cdef xdb.xdb_version_t *version
+        cdef Py_ssize_t i, m = 0
+        for i in range(n):
+            data_ptrs[i] = 0
+            data_lens[i] = 0
+            memset(keys[m].ip, 0, 16)
+            if by_string:
+                version = xdb.xdb_parse_ip(ips_ptr[i], keys[m].ip, 16)
+                if version == NULL:
+                    errs[i] = 1
+                    if self.stats_on:
+                        record_lookup(self.counters, 1, 0, 0, 0)
+                    continue
+                length = version.bytes
+            else:
+                length = ips_len[i]
+                if length == nbytes:
+                    memcpy(keys[m].ip, ips_ptr[i], nbytes)
+            if length != nbytes:
+                errs[i] = 10
+                if self.stats_on:
+                    record_lookup(self.counters, 10, 0, 0, 0)
+                continue
+            keys[m].index = i
+            m += 1
+        qsort(keys, m, sizeof(BatchKey), compare_batch_keys)
+        return self._locate_sorted(keys, m, errs, data_ptrs, data_lens, io_count)
+
+    cdef inline int _parse_and_locate(self, const char *ip, int ip_len, bint by_string, unsigned int *data_ptr, unsigned int *data_len, int *io_count) noexcept nogil:
+        # returns 1 if the ip string could not be parsed, otherwise the same errno as _locate
+        cdef unsigned char ip_bytes[16]
+        cdef xdb.xdb_version_t *version
+        if not by_string:
+            return self._locate(<const unsigned char *>ip, ip_len, data_ptr, data_len, io_count)
+        version = xdb.xdb_parse_ip(ip, ip_bytes, 16)
+        if version == NULL:
+            data_ptr[0] = 0
+            data_len[0] = 0
+            if self.stats_on:
+                record_lookup(self.counters, 1, 0, 0, 0)
+            return 1
+        return self._locate(ip_bytes, version.bytes, data_ptr, data_len, io_count)
+
+    cdef inline str _cached_region(self, unsigned int data_ptr, unsigned int data_len, int *io_count):
+        # repeat hits of a region hand out the very same str object
+        cdef object region
+        if data_len == 0:
+            return ""
+        region = self.regions.get(data_ptr)
+        if region is not None:
+            ip2region_atomic_add(&self.cache_hits, 1)
+            return <str>region
+        ip2region_atomic_add(&self.cache_misses, 1)
+        region = self._region_at(data_ptr, data_len, io_count)
+        self.regions[data_ptr] = region
+        return <str>region
+
+    cdef str _region_at(self, unsigned int data_ptr, unsigned int data_len, int *io_count):
+        cdef char *buffer
         cdef int err
+        if self.searcher.content != NULL:
+            if <size_t>data_ptr + data_len > self.searcher.content.length:
+                raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+            return PyUnicode_DecodeUTF8(self.searcher.content.buffer + data_ptr, <Py_ssize_t>data_len, NULL)
+        buffer = <char *> PyMem_Malloc(data_len + 1)
+        if not buffer:
+            raise MemoryError
+        try:
+            with nogil:
+                err = self._read(data_ptr, buffer, data_len, io_count)
+            if err != 0:
+                raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+            return PyUnicode_DecodeUTF8(buffer, <Py_ssize_t>data_len, NULL)
+        finally:
+            PyMem_Free(buffer)
+
+    cdef object _region_raw(self, unsigned int data_ptr, unsigned int data_len, const char **raw, int *io_count):
+        # points raw at the region bytes, the returned object keeps them alive in file modes
+        cdef bytes holder
+        cdef char *buffer
+        cdef int err
+        if self.searcher.content != NULL:
+            if <size_t>data_ptr + data_len > self.searcher.content.length:
+                raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+            raw[0] = self.searcher.content.buffer + data_ptr
+            return None
+        holder = PyBytes_FromStringAndSize(NULL, data_len)
+        buffer = PyBytes_AS_STRING(holder)
         with nogil:
-            err = xdb.xdb_search(&self.searcher, <const unsigned char *>&ip[0], <int>ip.shape[0], &region)
+            err = self._read(data_ptr, buffer, data_len, io_count)
+        if err != 0:
+            raise RuntimeError(f"failed to read region at {data_ptr} with errno=22")
+        raw[0] = buffer
+        return holder
+
+    cdef Region _cached_region_object(self, unsigned int data_ptr, unsigned int data_len, int *io_count):
+        cdef const char *raw
+        cdef object holder
+        cdef Region region
+        region = self.region_objects.get(data_ptr)
+        if region is None:
+            holder = self._region_raw(data_ptr, data_len, &raw, io_count)
+            region = Region.from_raw(raw, data_len)
+            self.region_objects[data_ptr] = region
+        return region
+
+    cdef object _project(self, unsigned int data_ptr, unsigned int data_len, tuple columns, bint single, int *io_count):
+        # decode only the requested columns, each column keeps its own data_ptr -> str cache
+        cdef Py_ssize_t bounds[8]
+        cdef const char *raw = NULL
+        cdef object holder = None, value
+        cdef Region region
+        cdef dict cache
+        cdef list values = []
+        cdef int column
+        if self.columns is None:
+            self.columns = [None, None, None, None]
+        for column in columns:
+            cache = self.columns[column]
+            if cache is None:
+                cache = self.columns[column] = {}
+            value = cache.get(data_ptr)
+            if value is None:
+                region = self.region_objects.get(data_ptr)
+                if region is not None:
+                    value = region.column(column)
+                else:
+                    if raw == NULL:
+                        holder = self._region_raw(data_ptr, data_len, &raw, io_count)
+                        split_region(raw, data_len, bounds)
+                    value = PyUnicode_DecodeUTF8(raw + bounds[2 * column], bounds[2 * column + 1] - bounds[2 * column], NULL)
+                cache[data_ptr] = value
+            if single:
+                return value
+            values.append(value)
+        return tuple(values)
+
+    def search_region(self, object ip, object fields = None):
+        """
+        Look up ip and return its Region, None when the ip has no region.
+        A str ip is parsed, anything else is taken as the packed 4/16 byte address.
+        fields: a field name or a tuple of names out of REGION_FIELDS, only those columns are
+        decoded and a str (single name) or a tuple of str is returned instead of a Region.
+        """
+        cdef tuple columns = None
+        cdef bytes ip_b
+        cdef const char *ip_ptr
+        cdef const uint8_t[::1] packed
+        cdef unsigned int data_ptr, data_len
+        cdef int err, io_count = 0
+        cdef object ret
+        if fields is not None:
+            columns = region_columns(fields)
+        if isinstance(ip, str):
+            ip_b = ensure_bytes(ip)
+            ip_ptr = <const char *>ip_b
+            with nogil:
+                err = self._parse_and_locate(ip_ptr, 0, True, &data_ptr, &data_len, &io_count)
+        else:
+            packed = ip
+            with nogil:
+                err = self._locate(<const unsigned char *>&packed[0], <int>packed.shape[0], &data_ptr, &data_len, &io_count)
         if err != 0:
+            self.searcher.io_count = io_count
             raise RuntimeError(f"failed search {ip} with errno={err}")
+        if data_len == 0:
+            ret = None
+        elif columns is None:
+            ret = self._cached_region_object(data_ptr, data_len, &io_count)
+        else:
+            ret = self._project(data_ptr, data_len, columns, isinstance(fields, str), &io_count)
+        self.searcher.io_count = io_count
+        return ret
+
+    cdef int _load_regions(self) except -1:
+        # walk the whole segment index once and decode every distinct region
+        cdef xdb.xdb_version_t *version = self.searcher.version
+        cdef int nbytes = version.bytes
+        cdef int seg_size = version.segment_index_size
+        cdef char header[16]
+        cdef unsigned int start_ptr, end_ptr, count, done = 0, chunk, i, data_ptr, data_len
+        cdef char *block
+        cdef const char *record
+        cdef int err, io_count = 0
+        if self.regions_complete:
+            return 0
+        with nogil:
+            err = self._read(0, header, 16, &io_count)
+        if err != 0:
+            raise RuntimeError("failed to read xdb header")
+        start_ptr = xdb.xdb_le_get_uint32(header, 8)
+        end_ptr = xdb.xdb_le_get_uint32(header, 12)
+        count = (end_ptr - start_ptr) // seg_size + 1
+        block = <char *> PyMem_Malloc(4096 * seg_size)
+        if not block:
+            raise MemoryError
+        try:
+            while done < count:
+                chunk = count - done if count - done < 4096 else 4096
+                with nogil:
+                    err = self._read(start_ptr + done * seg_size, block, chunk * seg_size, &io_count)
+                if err != 0:
+                    raise RuntimeError(f"failed to read segment index with errno=21")
+                for i in range(chunk):
+                    record = block + i * seg_size
+                    data_len = <unsigned int>xdb.xdb_le_get_uint16(record, nbytes * 2)
+                    data_ptr = xdb.xdb_le_get_uint32(record, nbytes * 2 + 2)
+                    if data_len != 0 and data_ptr not in self.regions:
+                        self.regions[data_ptr] = self._region_at(data_ptr, data_len, &io_count)
+                done += chunk
+        finally:
+            PyMem_Free(block)
+        self.regions_complete = True
+        return 0
+
+    cdef void _search_array_v4(self, const uint32_t[::1] ips, int64_t[::1] out) noexcept nogil:
+        cdef Py_ssize_t i
+        cdef unsigned char ip[4]
+        cdef uint32_t value
+        cdef unsigned int data_ptr, data_len
+        cdef int io_count = 0
+        for i in range(ips.shape[0]):
+            value = ips[i]
+            ip[0] = <unsigned char>(value >> 24)
+            ip[1] = <unsigned char>(value >> 16)
+            ip[2] = <unsigned char>(value >> 8)
+            ip[3] = <unsigned char>value
+            if self._locate(ip, 4, &data_ptr, &data_len, &io_count) != 0:
+                out[i] = -1
+            elif data_len == 0:
+                out[i] = 0
+            else:
+                out[i] = <int64_t>data_ptr
+        self.searcher.io_count = io_count
+
+    cdef void _search_array_v6(self, const uint8_t[:, ::1] ips, const int8_t *versions, int64_t[::1] out) noexcept nogil:
+        # rows may be wider than the address, only their first bytes are looked up.
+        # with versions, rows of the other family (or 0, unparsable) fail without a lookup
+        cdef Py_ssize_t i
+        cdef unsigned int data_ptr, data_len
+        cdef int io_count = 0
+        cdef int nbytes = self.searcher.version.bytes
+        cdef int family = self.searcher.version.id
+        for i in range(ips.shape[0]):
+            if versions != NULL and versions[i] != family:
+                out[i] = -1
+            elif self._locate(<const unsigned char *>&ips[i, 0], nbytes, &data_ptr, &data_len, &io_count) != 0:
+                out[i] = -1
+            elif data_len == 0:
+                out[i] = 0
+            else:
+                out[i] = <int64_t>data_ptr
+        self.searcher.io_count = io_count
+
+    def search_array(self, object ips, object out = None, object versions = None):
+        """
+        Vectorized lookup over a contiguous ``uint32`` array of IPv4 addresses (host order)
+        or an ``(N, k)`` ``uint8`` array of packed addresses, k at least the address size of the xdb
+        (the rows of ``parse_ip_many``). versions: per row 4/6/0 as returned by ``parse_ip_many``,
+        rows that are not of the xdb's family fail.
+        Returns an int64 array of region ids (the region offset in the xdb),
+        0 for ips without region and -1 for failed lookups. Use ``regions_for_ids`` to decode them.
+        """
+        cdef memoryview view = memoryview(ips)
+        cdef Py_ssize_t n = view.shape[0]
+        if out is None:
+            out = array("q", [0]) * n
+        cdef int64_t[::1] out_view = out
+        if out_view.shape[0] < n:
+            raise ValueError(f"out buffer too small, need {n} items, got {out_view.shape[0]}")
+        cdef const uint32_t[::1] v4
+        cdef const uint8_t[:, ::1] v6
+        cdef const int8_t[::1] versions_view
+        cdef const int8_t *versions_ptr = NULL
+        if n == 0:
+            return out
+        if view.ndim == 1:
+            if self.searcher.version.bytes != 4:
+                raise ValueError("a 1-D uint32 array only works with an IPv4 searcher")
+            if versions is not None:
+                raise ValueError("versions only go with rows of packed addresses")
+            v4 = ips
+            with nogil:
+                self._search_array_v4(v4, out_view)
+        elif view.ndim == 2:
+            v6 = ips
+            if v6.shape[1] < self.searcher.version.bytes:
+                raise ValueError(f"expect at least {self.searcher.version.bytes} bytes per row, got {v6.shape[1]}")
+            if versions is not None:
+                versions_view = versions
+                if versions_view.shape[0] < n:
+                    raise ValueError(f"versions too short, need {n} items, got {versions_view.shape[0]}")
+                if n > 0:
+                    versions_ptr = &versions_view[0]
+            with nogil:
+                self._search_array_v6(v6, versions_ptr, out_view)
+        else:
+            raise ValueError(f"expect a 1-D or 2-D array, got {view.ndim}-D")
+        return out
+
+    cpdef Py_ssize_t preload_regions(self) except -1:
+        """
+        Decode every region of the xdb into the region cache up front, returns the number of regions.
+        """
+        self._load_regions()
+        return len(self.regions)
+
+    cpdef dict region_cache_info(self):
+        """
+        Hit/miss counters and size of the region string cache.
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self.regions),
+            "complete": self.regions_complete,
+        }
+
+    cpdef clear_region_cache(self):
+        self.regions = {}
+        self.region_objects = {}
+        self.columns = None
+        self.regions_complete = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    cpdef dict region_table(self):
+        """
+        Mapping of region id to region string for every region in the xdb.
+        """
+        self._load_regions()
+        return dict(self.regions)
+
+    cpdef list regions_for_ids(self, object ids):
+        """
+        Turn region ids returned by ``search_array`` back into strings, None for 0 and -1.
+        """
+        self._load_regions()
+        cdef dict regions = self.regions
+        return [regions.get(region_id) for region_id in ids]
+
+    cpdef CompiledSearcher compile(self, bint direct_table = False):
+        """
+        Flatten the segment index of this searcher into a CompiledSearcher.
+        """
+        return CompiledSearcher.from_searcher(self, direct_table)
+
+    cpdef enable_stats(self, bint enabled = True):
+        """
+        Turn lookup stats on or off, counters are atomics so they can stay on in production.
+        """
+        if enabled and self.counters == NULL:
+            self.counters = <SearchStats *> PyMem_Malloc(sizeof(SearchStats))
+            if not self.counters:
+                raise MemoryError
+            memset(self.counters, 0, sizeof(SearchStats))
+        self.stats_on = enabled
+
+    cpdef reset_stats(self):
+        if self.counters != NULL:
+            memset(self.counters, 0, sizeof(SearchStats))
+
+    cpdef dict stats(self):
+        """
+        Lookup counters: lookups, errors, io (file reads, region reads included), bsearch_steps,
+        latency_ns (total), latency_histogram (bucket k counts lookups under 2**k ns, the last
+        bucket the slower rest) and lookup_io (index reads per lookup, the last bucket 8 or more).
+        Latency is the index walk of a lookup, region decoding is not part of it.
+        """
+        cdef SearchStats snapshot
+        if self.counters != NULL:
+            snapshot = self.counters[0]
+        else:
+            memset(&snapshot, 0, sizeof(SearchStats))
+        return {
+            "enabled": self.stats_on,
+            "lookups": snapshot.lookups,
+            "errors": snapshot.errors,
+            "io": snapshot.io,
+            "bsearch_steps": snapshot.steps,
+            "latency_ns": snapshot.latency_ns,
+            "latency_histogram": [snapshot.latency[i] for i in range(LATENCY_BUCKETS)],
+            "lookup_io": [snapshot.lookup_io[i] for i in range(LOOKUP_IO_BUCKETS)],
+        }
+
+    @property
+    def in_memory(self):
+        """True for searchers that never touch the disk on lookup (buffer and mmap modes)"""
+        return self.searcher.content != NULL
+
+    @property
+    def thread_safe(self):
+        """True for searchers that can be shared by threads without a lock (buffer, mmap and pread modes)"""
+        return self.searcher.content != NULL or self.use_pread
 
     cpdef inline int get_io_count(self):
         with nogil:
@@ -466,5 +1769,1133 @@ cdef class Searcher:
             raise RuntimeError("failed to get version from searcher")
         return Version.from_ptr(version)
 
+    def __reduce__(self):
+        """
+        Pickled by source, not by content: file and index searchers reopen the file, buffer and mmap
+        searchers over a file map it and shared memory searchers attach to the same segment.
+        Only a buffer of unknown origin travels as a copy. Caches and stats start empty.
+        """
+        cdef Version version = self.get_version()
+        if self.shm is not None:
+            return _unpickle, ("from_shared_memory", (version, self.shm.name))
+        if self.searcher.content != NULL:
+            if self.db_path is None:
+                return _unpickle, ("from_buffer", (version, bytes(self.pybuffer)))
+            return _unpickle, ("from_mmap", (version, self.db_path, self.advice))
+        if self.index is not None:
+            return _unpickle, ("from_index", (version, self.db_path, self.index, self.use_pread))
+        return _unpickle, ("from_file", (version, self.db_path, self.use_pread))
+
+    cdef int _reopen(self) except -1:
+        # in a forked child the FILE* still shares its file offset with the parent
+        cdef bytes db_path_b = ensure_bytes(self.db_path)
+        if self.searcher.handle != NULL and ip2region_reopen(self.searcher.handle, <const char *>db_path_b) != 0:
+            raise RuntimeError(f"failed to reopen {self.db_path} after fork")
+        return 0
+
     def __dealloc__(self):
-        xdb.xdb_close(&self.searcher)
\ No newline at end of file
+        if self.use_pread:
+            ip2region_close(self.fd)
+        xdb.xdb_close(&self.searcher)
+        if self.counters != NULL:
+            PyMem_Free(self.counters)
+            self.counters = NULL
+        if self.shm is not None:
+            self.pybuffer = None
+            try:
+                self.shm.close()
+            except BufferError:  # views handed out still point into the segment
+                pass
+
+
+# file and index searchers reading through a FILE*, reopened in forked children
+_shared_handles = weakref.WeakSet()
+
+
+def _reopen_after_fork():
+    for searcher in list(_shared_handles):
+        (<Searcher>searcher)._reopen()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+def _unpickle(str kind, tuple args):
+    # rebuilds what the __reduce__ methods hand out, kind is a class or a Searcher constructor
+    if kind == "Version":
+        return Version.ipv6() if args[0] == 6 else Version.ipv4()
+    if kind == "Header":
+        return Header.from_file(*args)
+    if kind == "VectorIndex":
+        return VectorIndex.from_file(*args)
+    if kind == "Content":
+        return Content.from_file(*args)
+    if kind == "DualStackSearcher":
+        return DualStackSearcher.from_searchers(*args)
+    return getattr(Searcher, kind)(*args)
+
+
+cdef enum:
+    DIRECT_BLOCKS = 1 << 24
+cdef uint32_t DIRECT_EMPTY = 0xffffffffu
+cdef uint32_t DIRECT_SPLIT = 0x80000000u
+
+cdef inline uint64_t be_get_uint64(const char *buffer, int offset) noexcept nogil:
+    cdef const unsigned char *p = <const unsigned char *>buffer + offset
+    return ((<uint64_t>p[0] << 56) | (<uint64_t>p[1] << 48) | (<uint64_t>p[2] << 40) | (<uint64_t>p[3] << 32)
+            | (<uint64_t>p[4] << 24) | (<uint64_t>p[5] << 16) | (<uint64_t>p[6] << 8) | <uint64_t>p[7])
+
+
+@cython.final
+@cython.freelist(8)
+cdef class CompiledSearcher:
+    """
+    Read-only searcher over a flat struct-of-arrays copy of the segment index:
+    sorted uint32 start/end keys for IPv4 (two uint64 halves for IPv6) and a parallel region id array.
+    Lookups are a single branch-light binary search and never touch the xdb again.
+    """
+    cdef:
+        xdb.xdb_version_t *version
+        Py_ssize_t count
+        uint32_t *starts_v4
+        uint32_t *ends_v4
+        uint64_t *starts_hi
+        uint64_t *starts_lo
+        uint64_t *ends_hi
+        uint64_t *ends_lo
+        uint32_t *region_ids
+        list regions  # region id -> region string, id 0 is the empty region
+        uint32_t *direct  # IPv4 only, /24 block -> first segment, DIRECT_SPLIT if the block is not covered by one segment
+        double direct_build_seconds
+        Py_ssize_t direct_split_blocks
+
+    @staticmethod
+    def from_searcher(Searcher searcher, bint direct_table = False):
+        cdef CompiledSearcher self = CompiledSearcher.__new__(CompiledSearcher)
+        self._build(searcher)
+        if direct_table:
+            self.build_direct_table()
+        return self
+
+    @staticmethod
+    def from_buffer(Version version, const uint8_t[::1] buffer, bint direct_table = False):
+        return CompiledSearcher.from_searcher(Searcher.from_buffer(version, buffer), direct_table)
+
+    @staticmethod
+    def from_file(Version version, object db_path, bint direct_table = False):
+        return CompiledSearcher.from_searcher(Searcher.from_file(version, db_path), direct_table)
+
+    cdef int _build(self, Searcher searcher) except -1:
+        cdef xdb.xdb_version_t *version = searcher.searcher.version
+        cdef int nbytes = version.bytes
+        cdef int seg_size = version.segment_index_size
+        cdef char header[16]
+        cdef unsigned int start_ptr, end_ptr, done = 0, chunk, i, data_ptr, data_len
+        cdef Py_ssize_t count, k
+        cdef char *block
+        cdef const char *record
+        cdef dict ids = {}
+        cdef object region_id
+        cdef int err, io_count = 0
+        with nogil:
+            err = searcher._read(0, header, 16, &io_count)
+        if err != 0:
+            raise RuntimeError("failed to read xdb header")
+        start_ptr = xdb.xdb_le_get_uint32(header, 8)
+        end_ptr = xdb.xdb_le_get_uint32(header, 12)
+        count = (end_ptr - start_ptr) // seg_size + 1
+
+        self.version = version
+        self.regions = [""]
+        if nbytes == 4:
+            self.starts_v4 = <uint32_t *> PyMem_Malloc(count * sizeof(uint32_t))
+            self.ends_v4 = <uint32_t *> PyMem_Malloc(count * sizeof(uint32_t))
+            if not self.starts_v4 or not self.ends_v4:
+                raise MemoryError
+        else:
+            self.starts_hi = <uint64_t *> PyMem_Malloc(count * sizeof(uint64_t))
+            self.starts_lo = <uint64_t *> PyMem_Malloc(count * sizeof(uint64_t))
+            self.ends_hi = <uint64_t *> PyMem_Malloc(count * sizeof(uint64_t))
+            self.ends_lo = <uint64_t *> PyMem_Malloc(count * sizeof(uint64_t))
+            if not self.starts_hi or not self.starts_lo or not self.ends_hi or not self.ends_lo:
+                raise MemoryError
+        self.region_ids = <uint32_t *> PyMem_Malloc(count * sizeof(uint32_t))
+        block = <char *> PyMem_Malloc(4096 * seg_size)
+        if not self.region_ids or not block:
+            PyMem_Free(block)
+            raise MemoryError
+        try:
+            k = 0
+            while done < count:
+                chunk = count - done if count - done < 4096 else 4096
+                with nogil:
+                    err = searcher._read(start_ptr + done * seg_size, block, chunk * seg_size, &io_count)
+                if err != 0:
+                    raise RuntimeError("failed to read segment index with errno=21")
+                for i in range(chunk):
+                    record = block + i * seg_size
+                    if nbytes == 4:
+                        # IPv4 segment ips are stored little-endian
+                        self.starts_v4[k] = xdb.xdb_le_get_uint32(record, 0)
+                        self.ends_v4[k] = xdb.xdb_le_get_uint32(record, 4)
+                    else:
+                        self.starts_hi[k] = be_get_uint64(record, 0)
+                        self.starts_lo[k] = be_get_uint64(record, 8)
+                        self.ends_hi[k] = be_get_uint64(record, 16)
+                        self.ends_lo[k] = be_get_uint64(record, 24)
+                    data_len = <unsigned int>xdb.xdb_le_get_uint16(record, nbytes * 2)
+                    data_ptr = xdb.xdb_le_get_uint32(record, nbytes * 2 + 2)
+                    if data_len == 0:
+                        self.region_ids[k] = 0
+                    else:
+                        region_id = ids.get(data_ptr)
+                        if region_id is None:
+                            region_id = ids[data_ptr] = len(self.regions)
+                            self.regions.append(searcher._cached_region(data_ptr, data_len, &io_count))
+                        self.region_ids[k] = <uint32_t>region_id
+                    k += 1
+                done += chunk
+        finally:
+            PyMem_Free(block)
+        self.count = count
+        return 0
+
+    cpdef dict build_direct_table(self):
+        """
+        Opt-in IPv4 accelerator: a 2^24 entry table keyed by the top 24 bits of the ip.
+        /24 blocks covered by a single segment resolve with one read,
+        split blocks fall back to a binary search narrowed to the segments of that block.
+        Costs 64 MiB, returns ``direct_table_info()``.
+        """
+        cdef Py_ssize_t k
+        cdef uint32_t start, end, b, b0, b1
+        cdef bint full
+        cdef double t
+        if self.version.bytes != 4:
+            raise ValueError("the direct table only works with IPv4")
+        if self.direct != NULL:
+            return self.direct_table_info()
+        t = time.perf_counter()
+        self.direct = <uint32_t *> PyMem_Malloc(DIRECT_BLOCKS * sizeof(uint32_t))
+        if not self.direct:
+            raise MemoryError
+        with nogil:
+            memset(self.direct, 0xff, DIRECT_BLOCKS * sizeof(uint32_t))  # DIRECT_EMPTY
+            for k in range(self.count):
+                start = self.starts_v4[k]
+                end = self.ends_v4[k]
+                b0 = start >> 8
+                b1 = end >> 8
+                b = b0
+                while True:
+                    full = (b > b0 or (start & 0xff) == 0) and (b < b1 or (end & 0xff) == 0xff)
+                    if self.direct[b] == DIRECT_EMPTY:
+                        self.direct[b] = <uint32_t>k if full else (<uint32_t>k | DIRECT_SPLIT)
+                    else:
+                        self.direct[b] |= DIRECT_SPLIT
+                    if b == b1:
+                        break
+                    b += 1
+            for k in range(DIRECT_BLOCKS):
+                if self.direct[k] != DIRECT_EMPTY and self.direct[k] & DIRECT_SPLIT:
+                    self.direct_split_blocks += 1
+        self.direct_build_seconds = time.perf_counter() - t
+        return self.direct_table_info()
+
+    cpdef dict direct_table_info(self):
+        """
+        Build cost and memory footprint of the /24 direct table.
+        """
+        return {
+            "enabled": self.direct != NULL,
+            "build_seconds": self.direct_build_seconds,
+            "memory_bytes": DIRECT_BLOCKS * sizeof(uint32_t) if self.direct != NULL else 0,
+            "blocks": DIRECT_BLOCKS,
+            "split_blocks": self.direct_split_blocks,
+        }
+
+    cpdef dict benchmark_direct_table(self, Py_ssize_t samples = 1000000, uint32_t seed = 2463534242):
+        """
+        Time ``samples`` random IPv4 lookups with and without the direct table and report the speedup.
+        """
+        cdef double t, search_seconds, direct_seconds
+        if self.direct == NULL:
+            self.build_direct_table()
+        t = time.perf_counter()
+        with nogil:
+            self._bench_v4(samples, seed, False)
+        search_seconds = time.perf_counter() - t
+        t = time.perf_counter()
+        with nogil:
+            self._bench_v4(samples, seed, True)
+        direct_seconds = time.perf_counter() - t
+        return {
+            "samples": samples,
+            "search_ns": search_seconds / samples * 1e9,
+            "direct_ns": direct_seconds / samples * 1e9,
+            "speedup": search_seconds / direct_seconds if direct_seconds > 0 else float("inf"),
+        }
+
+    cdef uint64_t _bench_v4(self, Py_ssize_t samples, uint32_t seed, bint use_direct) noexcept nogil:
+        cdef Py_ssize_t i
+        cdef uint64_t checksum = 0
+        for i in range(samples):
+            # xorshift32
+            seed ^= seed << 13
+            seed ^= seed >> 17
+            seed ^= seed << 5
+            checksum += <uint64_t>self._find_v4(seed, use_direct)
+        return checksum
+
+    cdef inline int _find_v4(self, uint32_t key, bint use_direct) noexcept nogil:
+        cdef Py_ssize_t lo = 0, n = self.count, half
+        cdef uint32_t entry, next_entry
+        if use_direct and self.direct != NULL:
+            entry = self.direct[key >> 8]
+            if entry == DIRECT_EMPTY:
+                return 0
+            if not entry & DIRECT_SPLIT:
+                return <int>self.region_ids[entry]
+            # narrow the search to the segments overlapping this block
+            lo = entry & ~DIRECT_SPLIT
+            if (key >> 8) + 1 < DIRECT_BLOCKS:
+                next_entry = self.direct[(key >> 8) + 1]
+                if next_entry != DIRECT_EMPTY:
+                    n = (next_entry & ~DIRECT_SPLIT) - lo + 1
+                else:
+                    n = self.count - lo
+            else:
+                n = self.count - lo
+        while n > 1:
+            half = n >> 1
+            lo = lo + half if self.starts_v4[lo + half] <= key else lo
+            n -= half
+        if self.starts_v4[lo] > key or self.ends_v4[lo] < key:
+            return 0
+        return <int>self.region_ids[lo]
+
+    cdef inline int _find(self, const unsigned char *ip, int ip_len) noexcept nogil:
+        # returns the region id (0 for no region) or -10 for ip length mismatch
+        cdef uint64_t key_hi = 0, key_lo = 0
+        cdef Py_ssize_t lo = 0, n = self.count, half, m
+        cdef int i
+        if ip_len != self.version.bytes:
+            return -10
+        if n == 0:
+            return 0
+        if ip_len == 4:
+            return self._find_v4((<uint32_t>ip[0] << 24) | (<uint32_t>ip[1] << 16) | (<uint32_t>ip[2] << 8) | <uint32_t>ip[3], True)
+        for i in range(8):
+            key_hi = (key_hi << 8) | ip[i]
+            key_lo = (key_lo << 8) | ip[i + 8]
+        while n > 1:
+            half = n >> 1
+            m = lo + half
+            lo = m if (self.starts_hi[m] < key_hi or (self.starts_hi[m] == key_hi and self.starts_lo[m] <= key_lo)) else lo
+            n -= half
+        if self.starts_hi[lo] > key_hi or (self.starts_hi[lo] == key_hi and self.starts_lo[lo] > key_lo):
+            return 0
+        if self.ends_hi[lo] < key_hi or (self.ends_hi[lo] == key_hi and self.ends_lo[lo] < key_lo):
+            return 0
+        return <int>self.region_ids[lo]
+
+    cdef inline int _parse_and_find(self, const char *ip, int ip_len, bint by_string) noexcept nogil:
+        # returns -1 if the ip string could not be parsed, otherwise the same as _find
+        cdef unsigned char ip_bytes[16]
+        cdef xdb.xdb_version_t *version
+        if not by_string:
+            return self._find(<const unsigned char *>ip, ip_len)
+        version = xdb.xdb_parse_ip(ip, ip_bytes, 16)
+        if version == NULL:
+            return -1
+        return self._find(ip_bytes, version.bytes)
+
+    cpdef inline str search_by_string(self, object ip):
+        cdef bytes ip_b = ensure_bytes(ip)
+        cdef const char *ip_ptr = <const char *>ip_b
+        cdef int ret
+        with nogil:
+            ret = self._parse_and_find(ip_ptr, 0, True)
+        if ret < 0:
+            raise RuntimeError(f"failed search {ip} with errno={-ret}")
+        return <str>self.regions[ret]
+
+    cpdef inline str search(self, const uint8_t[::1] ip):
+        cdef int ret
+        with nogil:
+            ret = self._find(<const unsigned char *>&ip[0], <int>ip.shape[0])
+        if ret < 0:
+            raise RuntimeError(f"failed search {ip} with errno={-ret}")
+        return <str>self.regions[ret]
+
+    cdef list _search_many(self, object ips, bint by_string, int[::1] errors):
+        cdef list keep = [ensure_bytes(ip) for ip in ips]
+        cdef Py_ssize_t n = len(keep), i
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef bytes ip_b
+        try:
+            if not ips_ptr or not ips_len:
+                raise MemoryError
+            for i in range(n):
+                ip_b = <bytes>keep[i]
+                ips_ptr[i] = PyBytes_AS_STRING(ip_b)
+                ips_len[i] = <int>PyBytes_GET_SIZE(ip_b)
+            return self._resolve_many(n, ips_ptr, ips_len, by_string, errors)
+        finally:
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+
+    cdef list _resolve_many(self, Py_ssize_t n, const char **ips_ptr, int *ips_len, bint by_string, int[::1] errors):
+        cdef int * found = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef Py_ssize_t i
+        cdef list ret
+        try:
+            if not found:
+                raise MemoryError
+            with nogil:
+                for i in range(n):
+                    found[i] = self._parse_and_find(ips_ptr[i], ips_len[i], by_string)
+            ret = []
+            for i in range(n):
+                if errors is not None:
+                    errors[i] = -found[i] if found[i] < 0 else 0
+                ret.append(self.regions[found[i]] if found[i] >= 0 else None)
+            return ret
+        finally:
+            PyMem_Free(found)
+
+    cpdef inline list search_by_string_many(self, object ips, int[::1] errors = None):
+        return self._search_many(ips, True, errors)
+
+    cpdef inline list search_many(self, object ips, int[::1] errors = None):
+        return self._search_many(ips, False, errors)
+
+    cpdef str search_int(self, object ip):
+        """
+        Same as Searcher.search_int
+        """
+        cdef unsigned char packed[16]
+        cdef int ip_len = pack_ip_int(ip, self.version.bytes, packed)
+        cdef int ret
+        with nogil:
+            ret = self._find(packed, ip_len)
+        if ret < 0:
+            raise RuntimeError(f"failed search {ip} with errno={-ret}")
+        return <str>self.regions[ret]
+
+    cpdef list search_int_many(self, object ips, int[::1] errors = None):
+        """
+        Same as Searcher.search_int_many
+        """
+        cdef list items = ips if isinstance(ips, list) else list(ips)
+        cdef Py_ssize_t n = len(items)
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        cdef unsigned char * keys = <unsigned char *> PyMem_Malloc(n * 16)
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        try:
+            if not keys or not ips_ptr or not ips_len:
+                raise MemoryError
+            pack_ip_ints(items, self.version.bytes, keys, ips_ptr, ips_len)
+            return self._resolve_many(n, ips_ptr, ips_len, False, errors)
+        finally:
+            PyMem_Free(keys)
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+
+    def search_iter(self, object iterable, Py_ssize_t chunk_size = 4096, bint packed = False):
+        """
+        Same as Searcher.search_iter
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        it = iter(iterable)
+        chunk = list(islice(it, chunk_size))
+        while chunk:
+            yield from self._search_many(chunk, not packed, None)
+            chunk = list(islice(it, chunk_size))
+
+    cpdef inline Version get_version(self):
+        return Version.from_ptr(self.version)
+
+    @property
+    def memory_usage(self):
+        """bytes held by the flat tables, region strings excluded"""
+        if self.version != NULL and self.version.bytes == 4:
+            return self.count * 3 * sizeof(uint32_t)
+        return self.count * (4 * sizeof(uint64_t) + sizeof(uint32_t))
+
+    def __len__(self):
+        return self.count
+
+    def __dealloc__(self):
+        PyMem_Free(self.direct)
+        PyMem_Free(self.starts_v4)
+        PyMem_Free(self.ends_v4)
+        PyMem_Free(self.starts_hi)
+        PyMem_Free(self.starts_lo)
+        PyMem_Free(self.ends_hi)
+        PyMem_Free(self.ends_lo)
+        PyMem_Free(self.region_ids)
+
+
+ctypedef struct CacheSlot:
+    unsigned char key[16]
+    int key_len
+    unsigned int data_ptr
+    unsigned int data_len
+    int32_t next  # next slot in the same bucket, -1 ends the chain
+    unsigned char referenced  # CLOCK bit
+    long stored_at  # xdb_now() microseconds
+
+
+cdef inline uint32_t fnv1a(const unsigned char *key, int length) noexcept nogil:
+    cdef uint32_t h = 2166136261u
+    cdef int i
+    for i in range(length):
+        h = (h ^ key[i]) * 16777619u
+    return h
+
+
+@cython.final
+cdef class CachedSearcher:
+    """
+    Bounded result cache in front of a Searcher, keyed by the packed 4/16 byte address.
+    Entries map an address to its region position, the region string itself comes from the
+    searcher's region cache, so a hit costs no IO at all. Eviction uses the CLOCK policy,
+    ttl (seconds, 0 disables it) drops entries older than that on lookup.
+    Searchers that are not thread_safe share one file offset, their file reads are serialized.
+    """
+    cdef:
+        readonly Searcher searcher
+        Py_ssize_t capacity
+        Py_ssize_t size
+        Py_ssize_t hand
+        uint32_t mask
+        int32_t *buckets
+        CacheSlot *slots
+        long ttl_us
+        unsigned long long hits
+        unsigned long long misses
+        unsigned long long evictions
+        unsigned long long expired
+        cython.pymutex lock
+        bint serialize
+        cython.pymutex io_lock
+
+    def __cinit__(self, Searcher searcher, Py_ssize_t capacity = 65536, double ttl = 0):
+        cdef Py_ssize_t nbuckets = 1
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        while nbuckets < capacity:
+            nbuckets <<= 1
+        self.searcher = searcher
+        self.serialize = not searcher.thread_safe
+        self.capacity = capacity
+        self.mask = <uint32_t>(nbuckets - 1)
+        self.ttl_us = <long>(ttl * 1000000)
+        self.buckets = <int32_t *> PyMem_Malloc(nbuckets * sizeof(int32_t))
+        self.slots = <CacheSlot *> PyMem_Malloc(capacity * sizeof(CacheSlot))
+        if not self.buckets or not self.slots:
+            raise MemoryError
+        memset(self.buckets, 0xff, nbuckets * sizeof(int32_t))  # -1
+
+    def __dealloc__(self):
+        PyMem_Free(self.buckets)
+        PyMem_Free(self.slots)
+
+    cdef bint _get(self, const unsigned char *key, int key_len, unsigned int *data_ptr, unsigned int *data_len) noexcept nogil:
+        cdef int32_t i
+        cdef CacheSlot *slot
+        with self.lock:
+            i = self.buckets[fnv1a(key, key_len) & self.mask]
+            while i >= 0:
+                slot = &self.slots[i]
+                if slot.key_len == key_len and memcmp(slot.key, key, key_len) == 0:
+                    if self.ttl_us > 0 and xdb.xdb_now() - slot.stored_at > self.ttl_us:
+                        self.expired += 1
+                        break
+                    slot.referenced = 1
+                    data_ptr[0] = slot.data_ptr
+                    data_len[0] = slot.data_len
+                    self.hits += 1
+                    return True
+                i = slot.next
+            self.misses += 1
+            return False
+
+    cdef void _unlink(self, int32_t victim) noexcept nogil:
+        cdef CacheSlot *slot = &self.slots[victim]
+        cdef int32_t *link = &self.buckets[fnv1a(slot.key, slot.key_len) & self.mask]
+        while link[0] >= 0:
+            if link[0] == victim:
+                link[0] = slot.next
+                return
+            link = &self.slots[link[0]].next
+
+    cdef void _put(self, const unsigned char *key, int key_len, unsigned int data_ptr, unsigned int data_len) noexcept nogil:
+        cdef uint32_t bucket = fnv1a(key, key_len) & self.mask
+        cdef int32_t i
+        cdef CacheSlot *slot
+        with self.lock:
+            i = self.buckets[bucket]
+            while i >= 0:
+                slot = &self.slots[i]
+                if slot.key_len == key_len and memcmp(slot.key, key, key_len) == 0:
+                    break
+                i = slot.next
+            if i < 0:
+                if self.size < self.capacity:
+                    i = <int32_t>self.size
+                    self.size += 1
+                else:
+                    # CLOCK: give referenced slots a second chance
+                    while self.slots[self.hand].referenced:
+                        self.slots[self.hand].referenced = 0
+                        self.hand = (self.hand + 1) % self.capacity
+                    i = <int32_t>self.hand
+                    self.hand = (self.hand + 1) % self.capacity
+                    self._unlink(i)
+                    self.evictions += 1
+                slot = &self.slots[i]
+                memcpy(slot.key, key, key_len)
+                slot.key_len = key_len
+                slot.next = self.buckets[bucket]
+                self.buckets[bucket] = i
+            slot.data_ptr = data_ptr
+            slot.data_len = data_len
+            slot.referenced = 0
+            slot.stored_at = xdb.xdb_now() if self.ttl_us > 0 else 0
+
+    cdef str _search(self, const unsigned char *ip, int ip_len, object origin):
+        if self.serialize:
+            with self.io_lock:
+                return self._lookup(ip, ip_len, origin)
+        return self._lookup(ip, ip_len, origin)
+
+    cdef str _lookup(self, const unsigned char *ip, int ip_len, object origin):
+        cdef unsigned int data_ptr, data_len
+        cdef int err = 0, io_count = 0
+        cdef bint hit
+        with nogil:
+            hit = self._get(ip, ip_len, &data_ptr, &data_len)
+            if not hit:
+                err = self.searcher._locate(ip, ip_len, &data_ptr, &data_len, &io_count)
+                if err == 0:
+                    self._put(ip, ip_len, data_ptr, data_len)
+        if err != 0:
+            raise RuntimeError(f"failed search {origin} with errno={err}")
+        return self.searcher._cached_region(data_ptr, data_len, &io_count)
+
+    cpdef str search_by_string(self, object ip):
+        cdef bytes ip_b = ensure_bytes(ip)
+        cdef const char *ip_ptr = <const char *>ip_b
+        cdef unsigned char ip_bytes[16]
+        cdef xdb.xdb_version_t *version
+        with nogil:
+            version = xdb.xdb_parse_ip(ip_ptr, ip_bytes, 16)
+        if version == NULL:
+            raise RuntimeError(f"failed search {ip} with errno=1")
+        return self._search(ip_bytes, version.bytes, ip)
+
+    cpdef str search(self, const uint8_t[::1] ip):
+        if ip.shape[0] > 16:
+            raise RuntimeError(f"failed search {ip} with errno=10")
+        return self._search(<const unsigned char *>&ip[0], <int>ip.shape[0], ip)
+
+    cdef list _search_many(self, object ips, bint by_string, int[::1] errors):
+        cdef list keep = [ensure_bytes(ip) for ip in ips]
+        cdef Py_ssize_t n = len(keep)
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        if self.serialize:
+            with self.io_lock:
+                return self._lookup_many(keep, n, by_string, errors)
+        return self._lookup_many(keep, n, by_string, errors)
+
+    cdef list _lookup_many(self, list keep, Py_ssize_t n, bint by_string, int[::1] errors):
+        # hits come from the cache, the misses of the batch are located by the searcher in one nogil pass,
+        # sorted with shared index reads when the searcher reads from a file.
+        # errs/data_ptrs/data_lens hold the batch in their first n items and the misses in the last n
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef unsigned char * keys = <unsigned char *> PyMem_Malloc(n * 16)
+        cdef int * errs = <int *> PyMem_Malloc(2 * n * sizeof(int))
+        cdef unsigned int * data_ptrs = <unsigned int *> PyMem_Malloc(2 * n * sizeof(unsigned int))
+        cdef unsigned int * data_lens = <unsigned int *> PyMem_Malloc(2 * n * sizeof(unsigned int))
+        cdef Py_ssize_t * miss_index = <Py_ssize_t *> PyMem_Malloc(n * sizeof(Py_ssize_t))
+        cdef BatchKey * batch = NULL
+        cdef xdb.xdb_version_t *version
+        cdef int nbytes = self.searcher.searcher.version.bytes, length, io_count = 0, ok = 0
+        cdef Py_ssize_t i, k, m = 0
+        cdef bytes ip_b
+        cdef list ret
+        try:
+            if not ips_ptr or not ips_len or not keys or not errs or not data_ptrs or not data_lens or not miss_index:
+                raise MemoryError
+            for i in range(n):
+                ip_b = <bytes>keep[i]
+                ips_ptr[i] = PyBytes_AS_STRING(ip_b)
+                ips_len[i] = <int>PyBytes_GET_SIZE(ip_b)
+            if self.searcher.searcher.content == NULL:
+                batch = <BatchKey *> PyMem_Malloc(n * sizeof(BatchKey))
+                if not batch:
+                    raise MemoryError
+            with nogil:
+                for i in range(n):
+                    errs[i] = 0
+                    if by_string:
+                        version = xdb.xdb_parse_ip(ips_ptr[i], keys + i * 16, 16)
+                        if version == NULL:
+                            errs[i] = 1
+                            continue
+                        length = version.bytes
+                    else:
+                        length = ips_len[i]
+                        if length == nbytes:
+                            memcpy(keys + i * 16, ips_ptr[i], nbytes)
+                    if length != nbytes:
+                        errs[i] = 10
+                    elif not self._get(keys + i * 16, nbytes, &data_ptrs[i], &data_lens[i]):
+                        # item i is parsed, its slot in ips_ptr/ips_len is free for miss m <= i
+                        ips_ptr[m] = <const char *>(keys + i * 16)
+                        ips_len[m] = nbytes
+                        miss_index[m] = i
+                        m += 1
+                if batch != NULL:
+                    ok = self.searcher._resolve_sorted(m, ips_ptr, ips_len, False, batch, errs + n, data_ptrs + n, data_lens + n, &io_count)
+                else:
+                    for k in range(m):
+                        errs[n + k] = self.searcher._locate(<const unsigned char *>ips_ptr[k], nbytes, &data_ptrs[n + k], &data_lens[n + k], &io_count)
+                if ok == 0:
+                    for k in range(m):
+                        i = miss_index[k]
+                        errs[i] = errs[n + k]
+                        data_ptrs[i] = data_ptrs[n + k]
+                        data_lens[i] = data_lens[n + k]
+                        if errs[i] == 0:
+                            self._put(keys + i * 16, nbytes, data_ptrs[i], data_lens[i])
+            if ok < 0:
+                raise MemoryError
+            ret = []
+            for i in range(n):
+                if errors is not None:
+                    errors[i] = errs[i]
+                if errs[i] == 0:
+                    ret.append(self.searcher._cached_region(data_ptrs[i], data_lens[i], &io_count))
+                else:
+                    ret.append(None)
+            return ret
+        finally:
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+            PyMem_Free(keys)
+            PyMem_Free(errs)
+            PyMem_Free(data_ptrs)
+            PyMem_Free(data_lens)
+            PyMem_Free(miss_index)
+            PyMem_Free(batch)
+
+    cpdef list search_by_string_many(self, object ips, int[::1] errors = None):
+        """
+        Search a batch of ip strings, the misses of the batch go to the searcher together.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        """
+        return self._search_many(ips, True, errors)
+
+    cpdef list search_many(self, object ips, int[::1] errors = None):
+        """
+        Search a batch of packed ip bytes, the misses of the batch go to the searcher together.
+        Failed items are None in the returned list, their errno is written to ``errors`` if given.
+        """
+        return self._search_many(ips, False, errors)
+
+    @property
+    def in_memory(self):
+        """in_memory of the wrapped searcher"""
+        return self.searcher.in_memory
+
+    @property
+    def thread_safe(self):
+        """thread_safe of the wrapped searcher, the cache itself is always safe to share"""
+        return self.searcher.thread_safe
+
+    cpdef dict cache_info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "size": self.size,
+            "capacity": self.capacity,
+        }
+
+    cpdef clear(self):
+        with self.lock:
+            memset(self.buckets, 0xff, (<Py_ssize_t>self.mask + 1) * sizeof(int32_t))
+            self.size = 0
+            self.hand = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expired = 0
+
+
+cdef int64_t V6_REGION_ID = 1LL << 32  # tags region ids of the IPv6 database in DualStackSearcher
+
+cdef inline int route_ip(const unsigned char *ip, int ip_len, bint map_v4, unsigned char *key) noexcept nogil:
+    # 4 when ip goes to the IPv4 database (IPv4, or IPv4-mapped ::ffff:a.b.c.d / IPv4-compatible ::a.b.c.d
+    # IPv6 if map_v4), 6 for the IPv6 database, 0 for a bad length. key gets the address to look up
+    cdef int i
+    if ip_len == 4:
+        memcpy(key, ip, 4)
+        return 4
+    if ip_len != 16:
+        return 0
+    if map_v4:
+        i = 0
+        while i < 10 and ip[i] == 0:
+            i += 1
+        if i == 10 and ((ip[10] == 0xff and ip[11] == 0xff)
+                        or (ip[10] == 0 and ip[11] == 0 and (ip[12] != 0 or ip[13] != 0 or ip[14] != 0 or ip[15] > 1))):
+            memcpy(key, ip + 12, 4)
+            return 4
+    memcpy(key, ip, 16)
+    return 6
+
+@cython.final
+cdef class DualStackSearcher:
+    """
+    One front for an IPv4 and an IPv6 xdb: every address is parsed once and dispatched to the
+    database of its family, IPv4-mapped and IPv4-compatible IPv6 addresses go to the IPv4 one
+    unless map_v4 is False. Either path may be None, lookups of that family then fail with errno=11.
+    """
+    cdef:
+        readonly Searcher v4
+        readonly Searcher v6
+        readonly bint map_v4
+
+    def __init__(self, object v4_path = None, object v6_path = None, str mode = "buffer", bint map_v4 = True):
+        self._set(Searcher.from_path(v4_path, mode, True) if v4_path is not None else None,
+                  Searcher.from_path(v6_path, mode, True) if v6_path is not None else None,
+                  map_v4)
+
+    @staticmethod
+    def from_searchers(Searcher v4, Searcher v6, bint map_v4 = True):
+        cdef DualStackSearcher self = DualStackSearcher.__new__(DualStackSearcher)
+        self._set(v4, v6, map_v4)
+        return self
+
+    cdef int _set(self, Searcher v4, Searcher v6, bint map_v4) except -1:
+        if v4 is not None and v4.searcher.version.bytes != 4:
+            raise ValueError("v4 searcher is not over an IPv4 xdb")
+        if v6 is not None and v6.searcher.version.bytes != 16:
+            raise ValueError("v6 searcher is not over an IPv6 xdb")
+        self.v4 = v4
+        self.v6 = v6
+        self.map_v4 = map_v4
+        return 0
+
+    def __reduce__(self):
+        return _unpickle, ("DualStackSearcher", (self.v4, self.v6, self.map_v4))
+
+    cdef inline int _route(self, const char *ip, int ip_len, bint by_string, unsigned char *key, int *family) noexcept nogil:
+        # parse once and pick the database, returns 1 for a bad ip string, 10 for a bad length, 11 without a database
+        cdef unsigned char ip_bytes[16]
+        cdef xdb.xdb_version_t *version
+        cdef const unsigned char *p = <const unsigned char *>ip
+        family[0] = 0
+        if by_string:
+            version = xdb.xdb_parse_ip(ip, ip_bytes, 16)
+            if version == NULL:
+                return 1
+            p = ip_bytes
+            ip_len = version.bytes
+        family[0] = route_ip(p, ip_len, self.map_v4, key)
+        if family[0] == 0:
+            return 10
+        if family[0] == 4 and self.v4 is None or family[0] == 6 and self.v6 is None:
+            return 11
+        return 0
+
+    cdef inline Searcher _target(self, int family):
+        return self.v4 if family == 4 else self.v6
+
+    cdef tuple _lookup(self, object ip, bint by_string):
+        # (searcher, data_ptr, data_len) for one ip, raises on failure
+        cdef bytes ip_b
+        cdef const uint8_t[::1] packed
+        if by_string:
+            ip_b = ensure_bytes(ip)
+            return self._lookup_ptr(ip, <const char *>ip_b, 0, True)
+        packed = ip
+        return self._lookup_ptr(ip, <const char *>&packed[0], <int>packed.shape[0], False)
+
+    cdef tuple _lookup_ptr(self, object ip, const char *ip_ptr, int ip_len, bint by_string):
+        cdef int family, err, io_count = 0
+        cdef unsigned char key[16]
+        cdef unsigned int data_ptr, data_len
+        cdef Searcher searcher
+        with nogil:
+            err = self._route(ip_ptr, ip_len, by_string, key, &family)
+        if err == 0:
+            searcher = self._target(family)
+            with nogil:
+                err = searcher._locate(key, 4 if family == 4 else 16, &data_ptr, &data_len, &io_count)
+            searcher.searcher.io_count = io_count
+        if err != 0:
+            raise RuntimeError(f"failed search {ip} with errno={err}")
+        return searcher, data_ptr, data_len
+
+    cpdef str search_by_string(self, object ip):
+        cdef Searcher searcher
+        cdef unsigned int data_ptr, data_len
+        cdef int io_count = 0
+        searcher, data_ptr, data_len = self._lookup(ip, True)
+        return searcher._cached_region(data_ptr, data_len, &io_count)
+
+    cpdef str search(self, const uint8_t[::1] ip):
+        """
+        Search a packed 4 or 16 byte address.
+        """
+        cdef Searcher searcher
+        cdef unsigned int data_ptr, data_len
+        cdef int io_count = 0
+        searcher, data_ptr, data_len = self._lookup(ip, False)
+        return searcher._cached_region(data_ptr, data_len, &io_count)
+
+    cpdef str search_int(self, object ip):
+        """
+        Search an int or an IPv4Address/IPv6Address, ints up to 2**32-1 are taken as IPv4.
+        """
+        cdef unsigned char packed[16]
+        cdef Searcher searcher
+        cdef unsigned int data_ptr, data_len
+        cdef int io_count = 0
+        cdef int ip_len = pack_ip_int(ip, 0, packed)
+        searcher, data_ptr, data_len = self._lookup_ptr(ip, <const char *>packed, ip_len, False)
+        return searcher._cached_region(data_ptr, data_len, &io_count)
+
+    def search_region(self, object ip, object fields = None):
+        """
+        Same as Searcher.search_region, dispatched by address family.
+        """
+        cdef Searcher searcher
+        cdef unsigned int data_ptr, data_len
+        cdef int io_count = 0
+        cdef tuple columns = region_columns(fields) if fields is not None else None
+        searcher, data_ptr, data_len = self._lookup(ip, isinstance(ip, str))
+        if data_len == 0:
+            return None
+        if columns is None:
+            return searcher._cached_region_object(data_ptr, data_len, &io_count)
+        return searcher._project(data_ptr, data_len, columns, isinstance(fields, str), &io_count)
+
+    cdef list _search_many(self, object ips, bint by_string, int[::1] errors):
+        cdef list keep = [ensure_bytes(ip) for ip in ips]
+        cdef Py_ssize_t n = len(keep), i
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef bytes ip_b
+        try:
+            if not ips_ptr or not ips_len:
+                raise MemoryError
+            for i in range(n):
+                ip_b = <bytes>keep[i]
+                ips_ptr[i] = PyBytes_AS_STRING(ip_b)
+                ips_len[i] = <int>PyBytes_GET_SIZE(ip_b)
+            return self._resolve_many(n, ips_ptr, ips_len, by_string, errors)
+        finally:
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+
+    cdef list _resolve_many(self, Py_ssize_t n, const char **ips_ptr, int *ips_len, bint by_string, int[::1] errors):
+        # route the whole batch, then locate the IPv4 group and the IPv6 group each in one pass,
+        # results land back at their input position
+        cdef int * errs = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef int * families = <int *> PyMem_Malloc(n * sizeof(int))
+        cdef unsigned char * keys = <unsigned char *> PyMem_Malloc(n * 16)
+        cdef unsigned int * data_ptrs = <unsigned int *> PyMem_Malloc(n * sizeof(unsigned int))
+        cdef unsigned int * data_lens = <unsigned int *> PyMem_Malloc(n * sizeof(unsigned int))
+        cdef Py_ssize_t i
+        cdef list ret
+        cdef int io4 = 0, io6 = 0
+        cdef Searcher v4 = self.v4, v6 = self.v6
+        try:
+            if not errs or not families or not keys or not data_ptrs or not data_lens:
+                raise MemoryError
+            with nogil:
+                for i in range(n):
+                    errs[i] = self._route(ips_ptr[i], ips_len[i], by_string, keys + i * 16, &families[i])
+                for i in range(n):
+                    if errs[i] == 0 and families[i] == 4:
+                        errs[i] = v4._locate(keys + i * 16, 4, &data_ptrs[i], &data_lens[i], &io4)
+                for i in range(n):
+                    if errs[i] == 0 and families[i] == 6:
+                        errs[i] = v6._locate(keys + i * 16, 16, &data_ptrs[i], &data_lens[i], &io6)
+            ret = []
+            for i in range(n):
+                if errors is not None:
+                    errors[i] = errs[i]
+                if errs[i] == 0:
+                    ret.append((v4 if families[i] == 4 else v6)._cached_region(data_ptrs[i], data_lens[i], &io4 if families[i] == 4 else &io6))
+                else:
+                    ret.append(None)
+            if v4 is not None:
+                v4.searcher.io_count = io4
+            if v6 is not None:
+                v6.searcher.io_count = io6
+            return ret
+        finally:
+            PyMem_Free(errs)
+            PyMem_Free(families)
+            PyMem_Free(keys)
+            PyMem_Free(data_ptrs)
+            PyMem_Free(data_lens)
+
+    cpdef list search_by_string_many(self, object ips, int[::1] errors = None):
+        """
+        Search a batch of mixed IPv4/IPv6 strings, failed items are None.
+        """
+        return self._search_many(ips, True, errors)
+
+    cpdef list search_many(self, object ips, int[::1] errors = None):
+        """
+        Search a batch of packed 4/16 byte addresses, failed items are None.
+        """
+        return self._search_many(ips, False, errors)
+
+    cpdef list search_int_many(self, object ips, int[::1] errors = None):
+        """
+        Search a batch of ints and IPv4Address/IPv6Address objects, failed items are None.
+        """
+        cdef list items = ips if isinstance(ips, list) else list(ips)
+        cdef Py_ssize_t n = len(items)
+        if errors is not None and errors.shape[0] < n:
+            raise ValueError(f"errors buffer too small, need {n} items, got {errors.shape[0]}")
+        if n == 0:
+            return []
+        cdef unsigned char * packed = <unsigned char *> PyMem_Malloc(n * 16)
+        cdef const char ** ips_ptr = <const char **> PyMem_Malloc(n * sizeof(char *))
+        cdef int * ips_len = <int *> PyMem_Malloc(n * sizeof(int))
+        try:
+            if not packed or not ips_ptr or not ips_len:
+                raise MemoryError
+            pack_ip_ints(items, 0, packed, ips_ptr, ips_len)
+            return self._resolve_many(n, ips_ptr, ips_len, False, errors)
+        finally:
+            PyMem_Free(packed)
+            PyMem_Free(ips_ptr)
+            PyMem_Free(ips_len)
+
+    cdef void _search_array(self, const uint8_t[:, ::1] ips, const int8_t *versions, int64_t[::1] out) noexcept nogil:
+        # without versions every row is a 16 byte address, with them version 4 rows hold an IPv4
+        # address in their first 4 bytes and version 0 rows fail
+        cdef Py_ssize_t i
+        cdef unsigned char key[16]
+        cdef unsigned int data_ptr, data_len
+        cdef int family, err, io4 = 0, io6 = 0
+        for i in range(ips.shape[0]):
+            if versions == NULL or versions[i] == 6:
+                family = route_ip(<const unsigned char *>&ips[i, 0], 16, self.map_v4, key)
+            elif versions[i] == 4:
+                family = route_ip(<const unsigned char *>&ips[i, 0], 4, self.map_v4, key)
+            else:
+                family = 0
+            if family == 4 and self.v4 is not None:
+                err = self.v4._locate(key, 4, &data_ptr, &data_len, &io4)
+            elif family == 6 and self.v6 is not None:
+                err = self.v6._locate(key, 16, &data_ptr, &data_len, &io6)
+            else:
+                err = -1
+            if err != 0:
+                out[i] = -1
+            elif data_len == 0:
+                out[i] = 0
+            else:
+                out[i] = <int64_t>data_ptr | (V6_REGION_ID if family == 6 else 0)
+        if self.v4 is not None:
+            self.v4.searcher.io_count = io4
+        if self.v6 is not None:
+            self.v6.searcher.io_count = io6
+
+    def search_array(self, object ips, object out = None, object versions = None):
+        """
+        Vectorized lookup over an (N, 16) uint8 array of IPv6 rows, IPv4 traffic as IPv4-mapped rows
+        (or an (N, 4) array / 1-D uint32 array of pure IPv4). With the versions of ``parse_ip_many``
+        rows of mixed families are dispatched by their version instead.
+        Returns int64 region ids, ids of the IPv6 database are tagged with 1 << 32,
+        0 for no region and -1 for failures. Use ``regions_for_ids`` to decode them.
+        """
+        cdef memoryview view = memoryview(ips)
+        if view.shape[0] == 0:
+            return out if out is not None else array("q")
+        if versions is None and (view.ndim == 1 or (view.ndim == 2 and view.shape[1] == 4)):
+            if self.v4 is None:
+                raise ValueError("no IPv4 database for an IPv4 array")
+            return self.v4.search_array(ips, out)
+        if view.ndim != 2 or view.shape[1] < 16:
+            raise ValueError(f"expect a 1-D uint32 array or rows of 4 or 16 bytes, got shape {view.shape}")
+        cdef Py_ssize_t n = view.shape[0]
+        if out is None:
+            out = array("q", [0]) * n
+        cdef int64_t[::1] out_view = out
+        if out_view.shape[0] < n:
+            raise ValueError(f"out buffer too small, need {n} items, got {out_view.shape[0]}")
+        cdef const uint8_t[:, ::1] rows = ips
+        cdef const int8_t[::1] versions_view
+        cdef const int8_t *versions_ptr = NULL
+        if versions is not None:
+            versions_view = versions
+            if versions_view.shape[0] < n:
+                raise ValueError(f"versions too short, need {n} items, got {versions_view.shape[0]}")
+            if n > 0:
+                versions_ptr = &versions_view[0]
+        with nogil:
+            self._search_array(rows, versions_ptr, out_view)
+        return out
+
+    cpdef list regions_for_ids(self, object ids):
+        """
+        Turn region ids returned by ``search_array`` back into strings, None for 0 and -1.
+        """
+        cdef dict regions4 = None, regions6 = None
+        cdef list ret = []
+        cdef int64_t region_id
+        for region_id in ids:
+            if region_id <= 0:
+                ret.append(None)
+            elif region_id & V6_REGION_ID:
+                if regions6 is None:
+                    self.v6._load_regions()
+                    regions6 = self.v6.regions
+                ret.append(regions6.get(region_id ^ V6_REGION_ID))
+            else:
+                if regions4 is None:
+                    self.v4._load_regions()
+                    regions4 = self.v4.regions
+                ret.append(regions4.get(region_id))
+        return ret
+
+    @property
+    def in_memory(self):
+        return (self.v4 is None or self.v4.in_memory) and (self.v6 is None or self.v6.in_memory)
+
+    @property
+    def thread_safe(self):
+        return (self.v4 is None or self.v4.thread_safe) and (self.v6 is None or self.v6.thread_safe)
@@ -0,0 +1,141 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from ip2region.backends import Searcher
+from ip2region.stream import iter_column
+
+MODES = ("file", "index", "buffer", "mmap")
+
+_searcher = None  # per worker process
+
+
+def open_searcher(db_path, mode: str = "mmap"):
+    """
+    Open a Searcher over db_path the way the CLI ``--mode`` names it.
+    """
+    return Searcher.from_path(db_path, mode)
+
+
+def _init_worker(db_path, mode: str) -> None:
+    global _searcher
+    _searcher = open_searcher(db_path, mode)
+
+
+def _resolve(ips: list) -> tuple:
+    regions = _searcher.search_by_string_many(ips)
+    return regions, _searcher.get_io_count()
+
+
+def _read_lines(inputs):
+    for path in inputs:
+        if path == "-":
+            for line in sys.stdin.buffer:
+                yield line.rstrip(b"\r\n")
+        else:
+            with open(path, "rb") as f:
+                for line in f:
+                    yield line.rstrip(b"\r\n")
+
+
+def _chunks(lines, column, sep, chunk_size: int):
+    it = iter(lines)
+    chunk = list(islice(it, chunk_size))
+    while chunk:
+        yield chunk, list(iter_column(chunk, column, sep))
+        chunk = list(islice(it, chunk_size))
+
+
+def _write(out, fmt: str, with_line: bool, lines: list, ips: list, regions: list) -> None:
+    if fmt == "tsv":
+        out.write(
+            b"".join(
+                line + b"\t" + (region or "").encode("utf-8") + b"\n"
+                for line, region in zip(lines, regions)
+            )
+        )
+        return
+    rows = []
+    for line, ip, region in zip(lines, ips, regions):
+        row = {"ip": ip.decode("utf-8", "replace"), "region": region}
+        if with_line:
+            row["line"] = line.decode("utf-8", "replace")
+        rows.append(json.dumps(row, ensure_ascii=False))
+    out.write(("\n".join(rows) + "\n").encode("utf-8"))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ip2region",
+        description="Bulk ip lookup: reads ips (or log lines) from files or stdin and writes "
+        "enriched TSV or JSON lines to stdout.",
+    )
+    parser.add_argument("inputs", nargs="*", default=["-"], help="input files, - for stdin (default)")
+    parser.add_argument("-d", "--db", required=True, help="path of the xdb file")
+    parser.add_argument("-m", "--mode", choices=MODES, default="mmap", help="searcher mode (default: mmap)")
+    parser.add_argument("-f", "--format", choices=("tsv", "json"), default="tsv", help="output format (default: tsv)")
+    parser.add_argument("-c", "--column", type=int, default=None, help="take the ip from this field of each line")
+    parser.add_argument("-s", "--sep", default=None, help="field separator for --column (default: whitespace)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="lines per batch (default: 4096)")
+    parser.add_argument("--stats", action="store_true", help="report lookups/sec and io counts to stderr")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.workers < 1:
+        raise SystemExit(f"--workers must be at least 1, got {args.workers}")
+    if args.chunk_size < 1:
+        raise SystemExit(f"--chunk-size must be at least 1, got {args.chunk_size}")
+    sep = args.sep.encode() if args.sep is not None else None
+    out = sys.stdout.buffer
+    with_line = args.column is not None
+    chunks = _chunks(_read_lines(args.inputs), args.column, sep, args.chunk_size)
+    lookups = failed = io_count = 0
+    start = time.perf_counter()
+
+    def emit(lines, ips, result):
+        nonlocal lookups, failed, io_count
+        regions, io = result
+        lookups += len(regions)
+        failed += regions.count(None)
+        io_count += io
+        _write(out, args.format, with_line, lines, ips, regions)
+
+    if args.workers == 1:
+        _init_worker(args.db, args.mode)
+        for lines, ips in chunks:
+            emit(lines, ips, _resolve(ips))
+    else:
+        # every worker opens its own searcher, in mmap mode they all share the page cache of one mapping.
+        # at most 2 chunks per worker are in flight so huge inputs are never read ahead into memory
+        from multiprocessing import Pool
+
+        with Pool(args.workers, _init_worker, (args.db, args.mode)) as pool:
+            pending = deque()
+            for lines, ips in chunks:
+                pending.append((lines, ips, pool.apply_async(_resolve, (ips,))))
+                if len(pending) >= 2 * args.workers:
+                    lines, ips, result = pending.popleft()
+                    emit(lines, ips, result.get())
+            while pending:
+                lines, ips, result = pending.popleft()
+                emit(lines, ips, result.get())
+    out.flush()
+
+    if args.stats:
+        seconds = time.perf_counter() - start
+        print(
+            f"lookups={lookups} failed={failed} seconds={seconds:.3f} "
+            f"lookups/s={lookups / seconds if seconds > 0 else 0:.0f} io_count={io_count} "
+            f"mode={args.mode} workers={args.workers}",
+            file=sys.stderr,
+        )
+    return 0
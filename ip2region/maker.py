@@ -0,0 +1,248 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import ipaddress
+import os
+import struct
+import tempfile
+import time
+from array import array
+
+HEADER_LENGTH = 256
+VECTOR_INDEX_LENGTH = 256 * 256 * 8
+_header_struct = struct.Struct("<HHIIIHH")
+_v4_segment_struct = struct.Struct("<IIHI")
+_segment_tail_struct = struct.Struct("<HI")
+
+
+def ip_to_int(ip) -> int:
+    """int value of an ip given as int, str, ipaddress object or packed big-endian bytes"""
+    if isinstance(ip, int):
+        return ip
+    if isinstance(ip, (bytes, bytearray, memoryview)):
+        return int.from_bytes(ip, "big")
+    return int(ipaddress.ip_address(ip))
+
+
+def iter_source(path, encoding: str = "utf-8"):
+    """
+    Ranges of an ip2region source file, one ``start|end|region`` line per range,
+    e.g. ``1.0.0.0|1.0.0.255|澳大利亚|0|0|0``.
+    """
+    with open(path, "r", encoding=encoding) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line:
+                start, end, region = line.split("|", 2)
+                yield start, end, region
+
+
+def overlay(base, overrides):
+    """
+    Merge two sorted, non-overlapping range streams, ``overrides`` win where they overlap ``base``.
+    Both are consumed lazily, ips come out as ints.
+    """
+    overrides = ((ip_to_int(s), ip_to_int(e), r) for s, e, r in overrides)
+    override = next(overrides, None)
+    covered = -1  # last address of the overrides already yielded
+    for start, end, region in base:
+        start = max(ip_to_int(start), covered + 1)
+        end = ip_to_int(end)
+        while start <= end:
+            if override is not None and override[0] <= end:
+                if override[0] > start:
+                    yield start, override[0] - 1, region
+                yield override
+                covered = override[1]
+                # an override in the gap before this range leaves start alone
+                start = max(start, covered + 1)
+                override = next(overrides, None)
+            else:
+                yield start, end, region
+                break
+    if override is not None:
+        yield override
+        yield from overrides
+
+
+class XdbMaker:
+    """
+    Streaming xdb v3 writer. Feed sorted, non-overlapping ``(start, end, region)`` ranges with
+    ``add``/``add_many`` and ``finish`` the file. Region strings are deduplicated and adjacent
+    ranges of the same region merged, gaps become ranges without region when ``fill_gaps``
+    is set, so every address resolves. Memory stays bounded by the distinct regions: region data
+    is written as it comes, segment records are spooled to a temporary file, and the file only
+    replaces ``path`` once it is complete.
+    """
+
+    def __init__(self, path, ip_version: int = 4, created_at: int = None, fill_gaps: bool = True):
+        if ip_version not in (4, 6):
+            raise ValueError(f"ip_version must be 4 or 6, got {ip_version}")
+        self.path = os.fspath(path)
+        self.ip_version = ip_version
+        self.created_at = int(time.time()) if created_at is None else created_at
+        self.fill_gaps = fill_gaps
+        self.segments = 0
+        self._nbytes = 4 if ip_version == 4 else 16
+        self._seg_size = 14 if ip_version == 4 else 38
+        self._shift = self._nbytes * 8 - 16  # segments never cross a vector index cell (the first two bytes)
+        self._max = (1 << (self._nbytes * 8)) - 1
+        self._regions = {b"": 0}  # region bytes -> data ptr
+        self._first = array("q", [-1]) * 65536  # first/last segment number of every vector index cell
+        self._last = array("q", [0]) * 65536
+        self._next = 0  # lowest address the next range may start at
+        self._pending = None  # [start, end, region bytes] not written yet, merged with what follows
+        self._records = bytearray()
+        self._tmp_path = self.path + ".tmp"
+        self._out = open(self._tmp_path, "wb")
+        self._out.write(bytes(HEADER_LENGTH + VECTOR_INDEX_LENGTH))
+        self._spool = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+
+    @property
+    def regions(self) -> int:
+        return len(self._regions) - 1
+
+    def _to_int(self, ip) -> int:
+        if isinstance(ip, str):
+            ip = ipaddress.ip_address(ip)
+            if ip.version != self.ip_version:
+                raise ValueError(f"{ip} is not an IPv{self.ip_version} address")
+        value = ip_to_int(ip)
+        if not 0 <= value <= self._max:
+            raise ValueError(f"{value} is out of the IPv{self.ip_version} address range")
+        return value
+
+    def add(self, start, end, region) -> None:
+        """Add the range start..end (inclusive), start must be past the end of the previous range."""
+        start = self._to_int(start)
+        end = self._to_int(end)
+        if end < start:
+            raise ValueError(f"range end {end} is before its start {start}")
+        if start < self._next:
+            raise ValueError(f"ranges must be sorted and non-overlapping, {start} is before {self._next}")
+        data = region.encode("utf-8") if isinstance(region, str) else bytes(region)
+        if len(data) > 0xFFFF:
+            raise ValueError(f"region is {len(data)} bytes, at most 65535 fit in a segment")
+        if start > self._next and self.fill_gaps:
+            self._push(self._next, start - 1, b"")
+        self._push(start, end, data)
+        self._next = end + 1
+
+    def add_many(self, ranges) -> None:
+        for start, end, region in ranges:
+            self.add(start, end, region)
+
+    def _push(self, start: int, end: int, data: bytes) -> None:
+        pending = self._pending
+        if pending is not None:
+            if pending[2] == data and pending[1] + 1 == start:
+                pending[1] = end
+                return
+            self._write_range(*pending)
+        self._pending = [start, end, data]
+
+    def _write_range(self, start: int, end: int, data: bytes) -> None:
+        data_ptr = self._regions.get(data)
+        if data_ptr is None:
+            data_ptr = self._regions[data] = self._out.tell()
+            self._out.write(data)
+        mask = (1 << self._shift) - 1
+        while True:
+            cell_end = start | mask
+            segment_end = end if end < cell_end else cell_end
+            self._write_segment(start, segment_end, len(data), data_ptr)
+            if segment_end == end:
+                return
+            start = segment_end + 1
+
+    def _write_segment(self, start: int, end: int, data_len: int, data_ptr: int) -> None:
+        cell = start >> self._shift
+        if self._first[cell] < 0:
+            self._first[cell] = self.segments
+        self._last[cell] = self.segments
+        self.segments += 1
+        if self._nbytes == 4:
+            self._records += _v4_segment_struct.pack(start, end, data_len, data_ptr)
+        else:
+            self._records += start.to_bytes(16, "big") + end.to_bytes(16, "big")
+            self._records += _segment_tail_struct.pack(data_len, data_ptr)
+        if len(self._records) >= 1 << 16:
+            self._spool.write(self._records)
+            self._records = bytearray()
+
+    def finish(self) -> dict:
+        """Write the segment index, vector index and header, then move the file into place."""
+        try:
+            if self.fill_gaps and self._next <= self._max:
+                self._push(self._next, self._max, b"")
+                self._next = self._max + 1
+            if self._pending is not None:
+                self._write_range(*self._pending)
+                self._pending = None
+            if self.segments == 0:
+                raise ValueError("no ranges were added")
+            self._spool.write(self._records)
+            self._records = bytearray()
+            index_base = self._out.tell()
+            size = index_base + self.segments * self._seg_size
+            if size > 0xFFFFFFFF:
+                raise ValueError(f"xdb would be {size} bytes, more than 4 byte pointers can address")
+            self._spool.seek(0)
+            while True:
+                chunk = self._spool.read(1 << 20)
+                if not chunk:
+                    break
+                self._out.write(chunk)
+            vector = bytearray(VECTOR_INDEX_LENGTH)
+            seg_size = self._seg_size
+            for cell in range(65536):
+                first = self._first[cell]
+                if first >= 0:
+                    struct.pack_into(
+                        "<II", vector, cell * 8,
+                        index_base + first * seg_size, index_base + self._last[cell] * seg_size + seg_size,
+                    )
+            self._out.seek(0)
+            self._out.write(
+                _header_struct.pack(
+                    3, 1, self.created_at, index_base, index_base + (self.segments - 1) * seg_size, self.ip_version, 4
+                )
+            )
+            self._out.seek(HEADER_LENGTH)
+            self._out.write(vector)
+            self._out.close()
+            self._spool.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        return {"segments": self.segments, "regions": self.regions, "bytes": size}
+
+    def abort(self) -> None:
+        """Drop the partial file, path is left untouched."""
+        self._out.close()
+        self._spool.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+
+def make_xdb(path, ranges, ip_version: int = 4, fill_gaps: bool = True) -> dict:
+    """Write the ranges to a xdb at path in one go, returns the ``finish`` stats."""
+    maker = XdbMaker(path, ip_version, fill_gaps=fill_gaps)
+    try:
+        maker.add_many(ranges)
+    except BaseException:
+        maker.abort()
+        raise
+    return maker.finish()
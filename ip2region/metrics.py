@@ -0,0 +1,105 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+_COUNTERS = (
+    ("lookups", "lookups_total", "Lookups served, failed ones included."),
+    ("errors", "errors_total", "Lookups that failed."),
+    ("io", "io_total", "Reads from the xdb file."),
+    ("bsearch_steps", "bsearch_steps_total", "Segment index binary search steps."),
+)
+
+
+def merge_stats(stats_list) -> dict:
+    """Sum the ``stats()`` dicts of several searchers, e.g. the searchers of one pool."""
+    merged = None
+    for stats in stats_list:
+        if merged is None:
+            merged = {
+                key: list(value) if isinstance(value, list) else value for key, value in stats.items()
+            }
+            continue
+        merged["enabled"] = merged["enabled"] or stats["enabled"]
+        for key, value in stats.items():
+            if key == "enabled":
+                continue
+            if isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+    if merged is None:
+        raise ValueError("no stats to merge")
+    return merged
+
+
+def latency_quantile(stats: dict, q: float) -> int:
+    """
+    Upper bound in ns of the latency histogram bucket the q quantile falls into, 0 without lookups.
+    The buckets are powers of two, so the bound is within 2x of the real value.
+    """
+    histogram = stats["latency_histogram"]
+    total = sum(histogram)
+    if total == 0:
+        return 0
+    rank = q * total
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= rank and count:
+            return 1 << bucket
+    return 1 << (len(histogram) - 1)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text(searchers, prefix: str = "ip2region") -> str:
+    """
+    Render searcher stats in the Prometheus text exposition format. ``searchers`` is a searcher,
+    or a mapping of name to searcher (or to a ``stats()`` dict), the name becomes the
+    ``searcher`` label. Latency is exported as a ``<prefix>_lookup_duration_seconds`` histogram,
+    index reads per lookup as ``<prefix>_lookup_io``.
+    """
+    if not isinstance(searchers, dict):
+        searchers = {"default": searchers}
+    rows = [
+        (_label(str(name)), searcher if isinstance(searcher, dict) else searcher.stats())
+        for name, searcher in searchers.items()
+    ]
+    lines = []
+    for key, suffix, help_text in _COUNTERS:
+        name = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for label, stats in rows:
+            lines.append(f'{name}{{searcher="{label}"}} {stats[key]}')
+
+    name = f"{prefix}_lookup_duration_seconds"
+    lines.append(f"# HELP {name} Index walk time of a lookup.")
+    lines.append(f"# TYPE {name} histogram")
+    for label, stats in rows:
+        histogram = stats["latency_histogram"]
+        cumulative = 0
+        for bucket, count in enumerate(histogram[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{searcher="{label}",le="{(1 << bucket) / 1e9!r}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{searcher="{label}",le="+Inf"}} {cumulative + histogram[-1]}')
+        lines.append(f'{name}_sum{{searcher="{label}"}} {stats["latency_ns"] / 1e9!r}')
+        lines.append(f'{name}_count{{searcher="{label}"}} {cumulative + histogram[-1]}')
+
+    name = f"{prefix}_lookup_io"
+    lines.append(f"# HELP {name} Index reads per lookup.")
+    lines.append(f"# TYPE {name} histogram")
+    for label, stats in rows:
+        histogram = stats["lookup_io"]
+        cumulative = total = 0
+        for reads, count in enumerate(histogram[:-1]):
+            cumulative += count
+            total += reads * count
+            lines.append(f'{name}_bucket{{searcher="{label}",le="{reads}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{searcher="{label}",le="+Inf"}} {cumulative + histogram[-1]}')
+        # reads of the overflow bucket are only known to be at least its bound
+        total += (len(histogram) - 1) * histogram[-1]
+        lines.append(f'{name}_sum{{searcher="{label}"}} {total}')
+        lines.append(f'{name}_count{{searcher="{label}"}} {cumulative + histogram[-1]}')
+    return "\n".join(lines) + "\n"
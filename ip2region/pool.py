@@ -0,0 +1,135 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ip2region.backends import Header, Searcher, VectorIndex, Version
+
+
+class _Slot:
+    __slots__ = ("searcher", "lookups", "io_count")
+
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.lookups = 0
+        self.io_count = 0
+
+
+class SearcherPool:
+    """
+    A bounded pool of file backed searchers over one xdb.
+    All searchers share one Header/Version and, in ``index`` mode, one VectorIndex.
+    ``search*`` check a searcher out, so they are safe to call from any thread;
+    callers block while every searcher is busy, up to ``timeout`` seconds.
+    """
+
+    def __init__(self, db_path, mode: str = "index", size: int = None, timeout: float = None):
+        if mode not in ("file", "index"):
+            raise ValueError(f"mode must be 'file' or 'index', got {mode!r}")
+        if size is None:
+            size = os.cpu_count() or 4
+        if size < 1:
+            raise ValueError(f"size must be at least 1, got {size}")
+        self.db_path = db_path
+        self.mode = mode
+        self.timeout = timeout
+        self.header = Header.from_file(db_path)
+        self.version = Version.from_header(self.header)
+        self.index = VectorIndex.from_file(db_path) if mode == "index" else None
+        self._slots = [_Slot(self._new_searcher()) for _ in range(size)]
+        self._idle = list(self._slots)
+        self._cond = threading.Condition(threading.Lock())
+        self._checkouts = 0
+        self._contended = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def _new_searcher(self):
+        if self.mode == "index":
+            return Searcher.from_index(self.version, self.db_path, self.index)
+        return Searcher.from_file(self.version, self.db_path)
+
+    def _acquire(self) -> _Slot:
+        with self._cond:
+            if self._idle:
+                self._checkouts += 1
+                return self._idle.pop()
+            self._contended += 1
+            start = time.perf_counter()
+            if not self._cond.wait_for(lambda: self._idle, self.timeout):
+                self._timeouts += 1
+                raise TimeoutError(f"no idle searcher after {self.timeout}s")
+            self._checkouts += 1
+            waited = time.perf_counter() - start
+            self._wait_seconds += waited
+            if waited > self._max_wait_seconds:
+                self._max_wait_seconds = waited
+            return self._idle.pop()
+
+    def _release(self, slot: _Slot) -> None:
+        with self._cond:
+            self._idle.append(slot)
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self):
+        """Borrow a searcher for exclusive use by the calling thread."""
+        slot = self._acquire()
+        try:
+            yield slot.searcher
+        finally:
+            self._release(slot)
+
+    def _call(self, name: str, *args, lookups: int = 1):
+        slot = self._acquire()
+        try:
+            return getattr(slot.searcher, name)(*args)
+        finally:
+            slot.lookups += lookups
+            slot.io_count += slot.searcher.get_io_count()
+            self._release(slot)
+
+    def search_by_string(self, ip) -> str:
+        return self._call("search_by_string", ip)
+
+    def search(self, ip) -> str:
+        return self._call("search", ip)
+
+    def search_by_string_many(self, ips) -> list:
+        ips = list(ips)
+        return self._call("search_by_string_many", ips, lookups=len(ips))
+
+    def search_many(self, ips) -> list:
+        ips = list(ips)
+        return self._call("search_many", ips, lookups=len(ips))
+
+    def search_int(self, ip) -> str:
+        return self._call("search_int", ip)
+
+    def search_int_many(self, ips) -> list:
+        ips = list(ips)
+        return self._call("search_int_many", ips, lookups=len(ips))
+
+    def stats(self) -> dict:
+        """Contention, wait time and per-searcher lookups/io counts, to help sizing the pool."""
+        with self._cond:
+            return {
+                "size": len(self._slots),
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "contended": self._contended,
+                "timeouts": self._timeouts,
+                "wait_seconds": self._wait_seconds,
+                "max_wait_seconds": self._max_wait_seconds,
+                "searchers": [
+                    {"lookups": slot.lookups, "io_count": slot.io_count}
+                    for slot in self._slots
+                ],
+            }
+
+    def __len__(self):
+        return len(self._slots)
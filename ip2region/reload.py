@@ -0,0 +1,176 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import os
+import threading
+import time
+
+from ip2region.backends import Content, Header, Searcher, VectorIndex, Version, verify_from_header
+
+
+def _signature(db_path) -> tuple:
+    st = os.stat(db_path)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ReloadableSearcher:
+    """
+    A thread-safe searcher whose xdb can be swapped without restarting.
+    ``reload()`` (or the watcher thread, when ``interval`` is given) verifies and loads the new
+    file off the hot path, then swaps a single reference. Lookups never take a lock: each one
+    runs on whichever searcher it picked up, so in-flight lookups finish on the old one, which is
+    freed once its last user drops it.
+    Replace the file by renaming a new one over it, mmap mode reads the file in place.
+    """
+
+    def __init__(self, db_path, mode: str = "buffer", interval: float = None, preload: bool = False):
+        if mode not in ("file", "index", "buffer", "mmap"):
+            raise ValueError(f"mode must be one of 'file', 'index', 'buffer', 'mmap', got {mode!r}")
+        self.db_path = db_path
+        self.mode = mode
+        self.preload = preload
+        self._reload_lock = threading.Lock()
+        self._generation = 0
+        self._reloads = 0
+        self._failures = 0
+        self._last_reload_seconds = 0.0
+        self._last_reload_at = 0.0
+        self._last_error = None
+        self._signature = None
+        self._searcher = None
+        self.reload()
+        self._stop = threading.Event()
+        self._watcher = None
+        if interval is not None:
+            self._watcher = threading.Thread(
+                target=self._watch, args=(interval,), name="ip2region-reload", daemon=True
+            )
+            self._watcher.start()
+
+    def _load(self) -> tuple:
+        signature = _signature(self.db_path)
+        header = Header.from_file(self.db_path)
+        verify_from_header(self.db_path, header)
+        version = Version.from_header(header)
+        if self.mode == "buffer":
+            searcher = Searcher.from_buffer(version, Content.from_file(self.db_path))
+        elif self.mode == "mmap":
+            searcher = Searcher.from_mmap(version, self.db_path)
+        elif self.mode == "index":
+            searcher = Searcher.from_index(version, self.db_path, VectorIndex.from_file(self.db_path), pread=True)
+        else:
+            searcher = Searcher.from_file(version, self.db_path, pread=True)
+        if self.preload:
+            searcher.preload_regions()
+        if _signature(self.db_path) != signature:
+            raise RuntimeError(f"{self.db_path} changed while it was being loaded")
+        return searcher, signature
+
+    def reload(self) -> int:
+        """
+        Verify and load the xdb again and swap it in, returns the new generation.
+        On failure the current searcher stays in place and the error is raised.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                searcher, signature = self._load()
+            except Exception as e:
+                self._failures += 1
+                self._last_error = repr(e)
+                raise
+            self._searcher = searcher  # the swap, a single reference store
+            self._signature = signature
+            self._generation += 1
+            if self._generation > 1:
+                self._reloads += 1
+            self._last_reload_seconds = time.perf_counter() - start
+            self._last_reload_at = time.time()
+            self._last_error = None
+            return self._generation
+
+    def _watch(self, interval: float) -> None:
+        # reload once a changed file has kept the same size and mtime for a whole interval,
+        # a file that failed to load is only retried after it changes again
+        pending = failed = None
+        while not self._stop.wait(interval):
+            try:
+                signature = _signature(self.db_path)
+            except OSError:
+                continue
+            if signature == self._signature or signature == failed:
+                pending = None
+            elif signature != pending:
+                pending = signature
+            else:
+                pending = None
+                try:
+                    self.reload()
+                except Exception:  # counted in stats(), keep serving the current generation
+                    failed = signature
+
+    @property
+    def searcher(self) -> Searcher:
+        """The searcher of the current generation"""
+        return self._searcher
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def search_by_string(self, ip) -> str:
+        return self._searcher.search_by_string(ip)
+
+    def search(self, ip) -> str:
+        return self._searcher.search(ip)
+
+    def search_by_string_many(self, ips, errors=None) -> list:
+        return self._searcher.search_by_string_many(ips, errors=errors)
+
+    def search_many(self, ips, errors=None) -> list:
+        return self._searcher.search_many(ips, errors=errors)
+
+    def search_int(self, ip) -> str:
+        return self._searcher.search_int(ip)
+
+    def search_int_many(self, ips, errors=None) -> list:
+        return self._searcher.search_int_many(ips, errors=errors)
+
+    def search_region(self, ip, fields=None):
+        return self._searcher.search_region(ip, fields)
+
+    def search_iter(self, iterable, chunk_size: int = 4096, packed: bool = False):
+        # the whole iteration stays on the generation it started with
+        return self._searcher.search_iter(iterable, chunk_size, packed)
+
+    @property
+    def in_memory(self):
+        return self.mode in ("buffer", "mmap")
+
+    @property
+    def thread_safe(self):
+        return True
+
+    def stats(self) -> dict:
+        """Generation, reload counters and the timing of the last reload."""
+        return {
+            "generation": self._generation,
+            "reloads": self._reloads,
+            "failures": self._failures,
+            "last_reload_seconds": self._last_reload_seconds,
+            "last_reload_at": self._last_reload_at,
+            "last_error": self._last_error,
+        }
+
+    def close(self) -> None:
+        """Stop the watcher thread, the current searcher lives on until its last user drops it."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,59 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+from itertools import islice
+
+
+def iter_column(lines, column: int = None, sep=None):
+    """
+    Yield the ip of every line: the stripped line itself, or its ``column`` field split by ``sep``
+    (whitespace by default, same type as the lines). Lines without that column yield an empty ip,
+    which fails to resolve, so results stay aligned with the input.
+    """
+    if column is None:
+        for line in lines:
+            yield line.strip()
+        return
+    for line in lines:
+        parts = line.split(sep)
+        if -len(parts) <= column < len(parts):
+            yield parts[column].strip()
+        else:
+            yield line[:0]
+
+
+def search_lines(searcher, lines, column: int = None, sep=None, chunk_size: int = 4096):
+    """
+    Yield ``(line, region)`` for an iterable of str or bytes lines, region is None when the ip
+    could not be resolved. Only ``chunk_size`` lines are held at a time, each chunk is resolved
+    with one ``search_by_string_many`` call, so any searcher, CompiledSearcher, CachedSearcher
+    or SearcherPool works.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    it = iter(lines)
+    chunk = list(islice(it, chunk_size))
+    while chunk:
+        regions = searcher.search_by_string_many(list(iter_column(chunk, column, sep)))
+        yield from zip(chunk, regions)
+        chunk = list(islice(it, chunk_size))
+
+
+def search_file(searcher, path, column: int = None, sep=None, chunk_size: int = 4096, encoding: str = None):
+    """
+    Stream a file of ips, or of log lines with the ip in ``column``, through ``search_lines``.
+    Lines are read as bytes (no decoding cost) unless ``encoding`` is given, line endings are
+    stripped from the yielded lines.
+    """
+    if encoding is None:
+        newline = b"\r\n"
+        if isinstance(sep, str):
+            sep = sep.encode()
+        f = open(path, "rb")
+    else:
+        newline = "\r\n"
+        f = open(path, "r", encoding=encoding, newline="")
+    with f:
+        yield from search_lines(
+            searcher, (line.rstrip(newline) for line in f), column, sep, chunk_size
+        )
@@ -147,6 +147,7 @@ def main():
         include_package_data=True,
         zip_safe=False,
         cmdclass={"build_ext": build_ext_compiler_check},
+        entry_points={"console_scripts": ["ip2region = ip2region.cli:main"]},
         **setup_kw,
     )
 
@@ -0,0 +1,40 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import random
+
+import pytest
+
+from ip2region import make_xdb, overlay
+
+REGIONS = ("中国|福建省|福州市|电信", "美国|0|0|0", "日本|0|东京|0", "0|0|内网IP|内网IP")
+KNOWN = {
+    4: [("1.1.1.0", "1.1.1.255", "澳大利亚|0|0|0")],
+    6: [("2001::", "2001:0:ffff:ffff:ffff:ffff:ffff:ffff", "美国|加利福尼亚州|洛杉矶|专线用户")],
+}
+
+
+def _ranges(ip_version: int):
+    # a few thousand random ranges with the addresses the tests look up laid over them
+    rnd = random.Random(ip_version)
+    starts = sorted({rnd.getrandbits(32 if ip_version == 4 else 128) for _ in range(2000)})
+    base = [(start, end - 1, rnd.choice(REGIONS)) for start, end in zip(starts, starts[1:])]
+    return overlay(base, KNOWN[ip_version])
+
+
+@pytest.fixture(scope="session")
+def xdb_paths(tmp_path_factory):
+    """small v4 and v6 xdb built once per session, keyed by ip version"""
+    root = tmp_path_factory.mktemp("xdb")
+    paths = {}
+    for ip_version in (4, 6):
+        paths[ip_version] = str(root / f"ip2region_v{ip_version}.xdb")
+        make_xdb(paths[ip_version], _ranges(ip_version), ip_version=ip_version)
+    return paths
+
+
+@pytest.fixture(scope="class")
+def xdb(request, xdb_paths):
+    """hands the paths of xdb_paths to unittest classes as v4_path / v6_path"""
+    request.cls.v4_path = xdb_paths[4]
+    request.cls.v6_path = xdb_paths[6]
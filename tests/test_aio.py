@@ -0,0 +1,64 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import asyncio
+import threading
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from ip2region import AsyncSearcher, Header, Searcher, Version, init_winsock, clean_winsock
+
+
+@pytest.mark.usefixtures("xdb")
+class TestAsyncSearcher(IsolatedAsyncioTestCase):
+    def setUp(self):
+        init_winsock()
+        header = Header.from_file(self.v4_path)
+        self.version = Version.from_header(header)
+
+    def tearDown(self):
+        clean_winsock()
+
+    async def test_coalesce(self):
+        searcher = Searcher.from_file(self.version, self.v4_path)
+        async with AsyncSearcher(searcher) as asearcher:
+            self.assertTrue(asearcher.offload)
+            results = await asyncio.gather(*[asearcher.search_by_string("1.1.1.1") for _ in range(1000)])
+            self.assertEqual(results, ['澳大利亚|0|0|0'] * 1000)
+            with self.assertRaises(RuntimeError):
+                await asearcher.search_by_string("not an ip")
+
+    async def test_search_many(self):
+        with open(self.v4_path, "rb") as f:
+            data = f.read()
+        searcher = Searcher.from_buffer(self.version, data)
+        async with AsyncSearcher(searcher) as asearcher:
+            self.assertFalse(asearcher.offload)
+            results = await asearcher.search_by_string_many(["1.1.1.1", "not an ip"])
+            self.assertEqual(results, ['澳大利亚|0|0|0', None])
+
+    def test_event_loops(self):
+        with open(self.v4_path, "rb") as f:
+            data = f.read()
+        asearcher = AsyncSearcher(Searcher.from_buffer(self.version, data))
+        results = {}
+
+        async def lookups(name):
+            results[name] = []
+            for _ in range(50):
+                results[name] += await asyncio.gather(*[asearcher.search_by_string("1.1.1.1") for _ in range(100)])
+
+        # one searcher shared by threads that each run their own event loop
+        threads = [threading.Thread(target=asyncio.run, args=(lookups(name),), daemon=True) for name in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(results, {name: ['澳大利亚|0|0|0'] * 5000 for name in range(4)})
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
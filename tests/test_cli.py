@@ -0,0 +1,51 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+import pytest
+
+from ip2region.cli import main
+
+
+@pytest.mark.usefixtures("xdb")
+class TestCli(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"GET 1.1.1.1\nGET bad\n")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def run_main(self, *argv) -> bytes:
+        stdout = sys.stdout
+        sys.stdout = io.TextIOWrapper(io.BytesIO())
+        try:
+            main(["-d", self.v4_path, self.path, *argv])
+            return sys.stdout.buffer.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def test_tsv(self):
+        for mode in ("file", "index", "buffer", "mmap"):
+            self.assertEqual(
+                self.run_main("-c", "1", "-m", mode),
+                "GET 1.1.1.1\t澳大利亚|0|0|0\nGET bad\t\n".encode(),
+            )
+
+    def test_json_workers(self):
+        rows = [json.loads(line) for line in self.run_main("-c", "1", "-f", "json", "-w", "2").splitlines()]
+        self.assertEqual(rows[0], {"ip": "1.1.1.1", "region": "澳大利亚|0|0|0", "line": "GET 1.1.1.1"})
+        self.assertIsNone(rows[1]["region"])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
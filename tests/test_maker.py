@@ -0,0 +1,65 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from ip2region import Searcher, XdbMaker, init_winsock, clean_winsock, make_xdb, overlay, verify
+
+
+class TestXdbMaker(TestCase):
+    def setUp(self):
+        init_winsock()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        clean_winsock()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_v4(self):
+        path = os.path.join(self.dir, "v4.xdb")
+        with XdbMaker(path) as maker:
+            maker.add("1.0.0.0", "1.0.0.255", "澳大利亚|0|0|0")
+            maker.add("1.0.1.0", "1.0.3.255", "中国|福建省|福州市|电信")
+            maker.add("10.0.0.0", "10.255.255.255", "0|0|内网IP|内网IP")
+        self.assertEqual(maker.regions, 3)
+        verify(path)
+        for mode in ("file", "index", "buffer"):
+            searcher = Searcher.from_path(path, mode)
+            self.assertEqual(searcher.search_by_string("1.0.0.1"), "澳大利亚|0|0|0")
+            self.assertEqual(searcher.search_by_string("1.0.2.9"), "中国|福建省|福州市|电信")
+            self.assertEqual(searcher.search_by_string("10.1.2.3"), "0|0|内网IP|内网IP")
+            self.assertEqual(searcher.search_by_string("8.8.8.8"), "")  # gap
+
+    def test_v6_overlay(self):
+        path = os.path.join(self.dir, "v6.xdb")
+        base = [("::", "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff", "公网")]
+        internal = [("2001:db8::", "2001:db8::ffff", "机房")]
+        stats = make_xdb(path, overlay(base, internal), ip_version=6)
+        self.assertEqual(stats["regions"], 2)
+        verify(path)
+        searcher = Searcher.from_path(path)
+        self.assertEqual(searcher.search_by_string("2001:db8::1"), "机房")
+        self.assertEqual(searcher.search_by_string("2001:db8::1:0"), "公网")
+
+    def test_overlay_gaps(self):
+        # overrides before the first range and between ranges never widen a base range
+        self.assertEqual(list(overlay([(10, 20, "a")], [(0, 5, "x")])), [(0, 5, "x"), (10, 20, "a")])
+        self.assertEqual(list(overlay([(10, 20, "a"), (30, 40, "b")], [(22, 25, "x")])),
+                         [(10, 20, "a"), (22, 25, "x"), (30, 40, "b")])
+        self.assertEqual(list(overlay([(10, 20, "a"), (30, 40, "b")], [(15, 35, "x")])),
+                         [(10, 14, "a"), (15, 35, "x"), (36, 40, "b")])
+
+    def test_unsorted(self):
+        path = os.path.join(self.dir, "bad.xdb")
+        with self.assertRaises(ValueError):
+            make_xdb(path, [("1.0.0.0", "1.0.0.255", "a"), ("0.0.0.0", "0.0.0.1", "b")])
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
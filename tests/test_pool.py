@@ -0,0 +1,46 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ip2region import SearcherPool, init_winsock, clean_winsock
+
+
+@pytest.mark.usefixtures("xdb")
+class TestSearcherPool(TestCase):
+    def setUp(self):
+        init_winsock()
+
+    def tearDown(self):
+        clean_winsock()
+
+    def test_search(self):
+        for mode in ("file", "index"):
+            pool = SearcherPool(self.v4_path, mode=mode, size=4)
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(pool.search_by_string, ["1.1.1.1"] * 1000))
+            self.assertEqual(results, ['澳大利亚|0|0|0'] * 1000)
+            stats = pool.stats()
+            self.assertEqual(stats["checkouts"], 1000)
+            self.assertEqual(sum(s["lookups"] for s in stats["searchers"]), 1000)
+            self.assertGreater(sum(s["io_count"] for s in stats["searchers"]), 0)
+
+    def test_checkout(self):
+        pool = SearcherPool(self.v4_path, size=1, timeout=0.01)
+        with pool.checkout() as searcher:
+            self.assertEqual(searcher.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+            with self.assertRaises(TimeoutError):
+                pool.search_by_string("1.1.1.1")
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 1)  # the timed out one is not a checkout
+        self.assertEqual(stats["contended"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import random
+from unittest import TestCase
+
+import pytest
+
+from ip2region.backends import python as pure
+
+
+@pytest.mark.usefixtures("xdb")
+class TestPythonBackend(TestCase):
+    def test_search_by_string(self):
+        for path, ip, region in (
+            (self.v4_path, "1.1.1.1", '澳大利亚|0|0|0'),
+            (self.v6_path, "2001:0:2851:b9f0:3866:13a2:846f:c23b", '美国|加利福尼亚州|洛杉矶|专线用户'),
+        ):
+            for mode in ("file", "index", "buffer", "mmap"):
+                searcher = pure.Searcher.from_path(path, mode)
+                self.assertEqual(searcher.search_by_string(ip), region)
+                self.assertEqual(searcher.search_by_string_many([ip, "bad"]), [region, None])
+
+    def test_matches_compiled(self):
+        for path, nbytes in (
+            (self.v4_path, 4),
+            (self.v6_path, 16),
+        ):
+            compiled = pure.Searcher.from_path(path).compile()
+            rnd = random.Random(42)
+            ips = [rnd.getrandbits(nbytes * 8).to_bytes(nbytes, "big") for _ in range(1000)]
+            ips += [b"\x00" * nbytes, b"\xff" * nbytes]
+            expected = [compiled.search(ip) for ip in ips]
+            for mode in ("file", "index", "buffer"):
+                searcher = pure.Searcher.from_path(path, mode, True)
+                self.assertEqual([searcher.search(ip) for ip in ips], expected)
+                self.assertEqual(searcher.search_many(ips), expected)
+
+    def test_parse_ip(self):
+        version, ip = pure.parse_ip("1.2.3.4")
+        self.assertTrue(version.is_ipv4())
+        self.assertEqual(ip, b"\x01\x02\x03\x04")
+        self.assertEqual(pure.ip_to_string(ip), "1.2.3.4")
+        self.assertTrue(pure.parse_ip("::1")[0].is_ipv6())
+        with self.assertRaises(RuntimeError):
+            pure.parse_ip("bad")
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
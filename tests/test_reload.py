@@ -0,0 +1,68 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+import pytest
+
+from ip2region import ReloadableSearcher, init_winsock, clean_winsock
+
+
+@pytest.mark.usefixtures("xdb")
+class TestReloadableSearcher(TestCase):
+    def setUp(self):
+        init_winsock()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "ip2region.xdb")
+        shutil.copyfile(self.v4_path, self.path)
+
+    def tearDown(self):
+        clean_winsock()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def replace(self, data: bytes):
+        tmp = self.path + ".new"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def test_reload(self):
+        for mode in ("file", "index", "buffer", "mmap"):
+            searcher = ReloadableSearcher(self.path, mode=mode)
+            old = searcher.searcher
+            self.assertEqual(searcher.reload(), 2)
+            self.assertIsNot(searcher.searcher, old)
+            self.assertEqual(old.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')  # still usable
+            self.assertEqual(searcher.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+            self.assertEqual(searcher.stats()["reloads"], 1)
+
+    def test_failed_reload(self):
+        searcher = ReloadableSearcher(self.path)
+        current = searcher.searcher
+        self.replace(b"broken")
+        with self.assertRaises(Exception):
+            searcher.reload()
+        self.assertIs(searcher.searcher, current)
+        stats = searcher.stats()
+        self.assertEqual((stats["generation"], stats["failures"]), (1, 1))
+
+    def test_watch(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with ReloadableSearcher(self.path, interval=0.05) as searcher:
+            self.replace(data)
+            deadline = time.monotonic() + 5
+            while searcher.generation == 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(searcher.generation, 2)
+            self.assertEqual(searcher.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
+"""
+import os
+import tempfile
+from unittest import TestCase
+
+import pytest
+
+from ip2region import Header, Searcher, Version, init_winsock, clean_winsock, search_file, search_lines
+
+
+@pytest.mark.usefixtures("xdb")
+class TestStream(TestCase):
+    def setUp(self):
+        init_winsock()
+        header = Header.from_file(self.v4_path)
+        self.searcher = Searcher.from_file(Version.from_header(header), self.v4_path)
+
+    def tearDown(self):
+        clean_winsock()
+
+    def test_search_iter(self):
+        ips = ("1.1.1.1" if i % 3 else "bad ip" for i in range(10000))
+        results = list(self.searcher.search_iter(ips, chunk_size=100))
+        self.assertEqual(len(results), 10000)
+        self.assertIsNone(results[0])
+        self.assertEqual(results[1], '澳大利亚|0|0|0')
+
+    def test_search_lines(self):
+        lines = ["GET / 1.1.1.1 200", "broken", "GET / x 200"]
+        self.assertEqual(
+            list(search_lines(self.searcher, lines, column=2, chunk_size=2)),
+            [(lines[0], '澳大利亚|0|0|0'), (lines[1], None), (lines[2], None)],
+        )
+
+    def test_search_file(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"1.1.1.1\r\n\n1.1.1.1\n")
+        try:
+            self.assertEqual(
+                list(search_file(self.searcher, path)),
+                [(b"1.1.1.1", '澳大利亚|0|0|0'), (b"", None), (b"1.1.1.1", '澳大利亚|0|0|0')],
+            )
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
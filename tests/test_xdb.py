@@ -1,14 +1,22 @@
 """
 Copyright (c) 2008-2022 synodriver <synodriver@gmail.com>
 """
+import ipaddress
+import os
+import pickle
+import random
+from array import array
 from unittest import TestCase
 from concurrent.futures import ThreadPoolExecutor, wait
 # import os
 # os.environ["IP_USE_CFFI"] = "1"
 
-from ip2region import Searcher, VectorIndex, init_winsock, clean_winsock, Header, Version, parse_ip
+import pytest
 
+from ip2region import prometheus_text, Searcher, CompiledSearcher, CachedSearcher, DualStackSearcher, Region, Content, VectorIndex, init_winsock, clean_winsock, Header, Version, parse_ip, parse_ip_many
 
+
+@pytest.mark.usefixtures("xdb")
 class TestXdb(TestCase):
     def setUp(self):
         init_winsock()
@@ -17,63 +25,412 @@ class TestXdb(TestCase):
         clean_winsock()
 
     def test_search_by_string_v6(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v6.xdb")
+        header = Header.from_file(self.v6_path)
         version = Version.from_header(header)
 
-        searcher = Searcher.from_file(version, r"E:\pyproject\pyip2region\tests\ip2region_v6.xdb")
+        searcher = Searcher.from_file(version, self.v6_path)
         result = searcher.search_by_string("2001:0:2851:b9f0:3866:13a2:846f:c23b")
         version, buf = parse_ip("2001:0:2851:b9f0:3866:13a2:846f:c23b")
         ret = searcher.search(buf)
         self.assertEqual(result, '美国|加利福尼亚州|洛杉矶|专线用户')
         
     def test_search_by_string_v6_into(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v6.xdb")
+        header = Header.from_file(self.v6_path)
         version = Version.from_header(header)
 
-        searcher = Searcher.from_file(version, r"E:\pyproject\pyip2region\tests\ip2region_v6.xdb")
+        searcher = Searcher.from_file(version, self.v6_path)
         result = searcher.search_by_string("2001:0:2851:b9f0:3866:13a2:846f:c23b")
         version, buf = parse_ip("2001:0:2851:b9f0:3866:13a2:846f:c23b")
         region_buf = bytearray(100)
         ret = searcher.search_into(buf, region_buf)
-        self.assertEqual(region_buf.decode()[:18], '美国|加利福尼亚州|洛杉矶|专线用户')
+        self.assertEqual(region_buf[:ret].decode(), '美国|加利福尼亚州|洛杉矶|专线用户')
+        self.assertEqual(region_buf[ret], 0)
     
     def test_search_by_string(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        header = Header.from_file(self.v4_path)
         version = Version.from_header(header)
         
-        searcher = Searcher.from_file(version, r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        searcher = Searcher.from_file(version, self.v4_path)
         result = searcher.search_by_string("1.1.1.1")
         self.assertEqual(result, '澳大利亚|0|0|0')
 
     def test_search_by_string_into(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        header = Header.from_file(self.v4_path)
         version = Version.from_header(header)
-        searcher = Searcher.from_file( version, r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        searcher = Searcher.from_file( version, self.v4_path)
         buffer = bytearray(100)
-        searcher.search_by_string_into("1.1.1.1", buffer)
-        self.assertEqual(buffer.decode()[:10], '澳大利亚|0|0|0')
+        length = searcher.search_by_string_into("1.1.1.1", buffer)
+        self.assertEqual(buffer[:length].decode(), '澳大利亚|0|0|0')
+        with self.assertRaises(ValueError):
+            searcher.search_by_string_into("1.1.1.1", bytearray(length - 1))
 
     def test_index(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        header = Header.from_file(self.v4_path)
         version = Version.from_header(header)
-        index = VectorIndex.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
-        searcher = Searcher.from_index(version, r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb", index)
+        index = VectorIndex.from_file(self.v4_path)
+        searcher = Searcher.from_index(version, self.v4_path, index)
         result = searcher.search_by_string("1.1.1.1")
         self.assertEqual(result, '澳大利亚|0|0|0')
 
     def test_buffer(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        header = Header.from_file(self.v4_path)
         version = Version.from_header(header)
-        with open(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb", "rb") as f:
+        with open(self.v4_path, "rb") as f:
             data = f.read()
         searcher = Searcher.from_buffer(version, data)
         result = searcher.search_by_string("1.1.1.1")
         self.assertEqual(result, '澳大利亚|0|0|0')
         
+    def test_size_deprecated(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        with self.assertWarns(DeprecationWarning):
+            self.assertEqual(searcher.search_by_string("1.1.1.1", 4), '澳大利亚|0|0|0')  # no longer cut to size
+        with self.assertWarns(DeprecationWarning):
+            searcher.search_many([parse_ip("1.1.1.1")[1]], 4)
+
+    def test_truncated_buffer(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        with open(self.v4_path, "rb") as f:
+            data = f.read()
+        searcher = Searcher.from_buffer(version, data[:256 + 65536 * 8])  # header and vector index only
+        with self.assertRaisesRegex(RuntimeError, "errno=21"):
+            searcher.search_by_string("1.1.1.1")
+        errors = array("i", [0])
+        self.assertEqual(searcher.search_by_string_many(["1.1.1.1"], errors=errors), [None])
+        self.assertEqual(errors[0], 21)
+
+    def test_search_view(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        content = Content.from_file(self.v4_path)
+        searcher = Searcher.from_buffer(version, content)
+        view = searcher.search_view_by_string("1.1.1.1")
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(bytes(view).decode(), '澳大利亚|0|0|0')
+        _, buf = parse_ip("1.1.1.1")
+        self.assertEqual(searcher.search_view(buf), view)
+        self.assertEqual(searcher.search_view(buf).obj, view.obj)  # both point into the same buffer
+        file_searcher = Searcher.from_file(version, self.v4_path)
+        with self.assertRaises(ValueError):
+            file_searcher.search_view(buf)
+
+    def test_search_many(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        errors = array("i", [0] * 3)
+        result = searcher.search_by_string_many(["1.1.1.1", "not an ip", "1.1.1.1"], errors=errors)
+        self.assertEqual(result, ['澳大利亚|0|0|0', None, '澳大利亚|0|0|0'])
+        self.assertEqual(errors[0], 0)
+        self.assertNotEqual(errors[1], 0)
+        _, buf = parse_ip("1.1.1.1")
+        self.assertEqual(searcher.search_many([buf, buf]), ['澳大利亚|0|0|0'] * 2)
+
+    def test_search_array(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        with open(self.v4_path, "rb") as f:
+            data = f.read()
+        searcher = Searcher.from_buffer(version, data)
+        ids = searcher.search_array(array("I", [0x01010101, 0x01010102]))
+        self.assertEqual(ids[0], ids[1])
+        self.assertEqual(searcher.regions_for_ids(ids), ['澳大利亚|0|0|0'] * 2)
+        self.assertEqual(searcher.region_table()[ids[0]], '澳大利亚|0|0|0')
+
+    def test_region_cache(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        first = searcher.search_by_string("1.1.1.1")
+        second = searcher.search_by_string("1.1.1.2")
+        self.assertIs(first, second)
+        info = searcher.region_cache_info()
+        self.assertEqual(info["misses"], 1)
+        self.assertEqual(info["hits"], 1)
+        searcher.clear_region_cache()
+        self.assertEqual(searcher.region_cache_info()["size"], 0)
+
+    def test_compiled(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        with open(self.v4_path, "rb") as f:
+            data = f.read()
+        searcher = Searcher.from_buffer(version, data)
+        compiled = CompiledSearcher.from_buffer(version, data)
+        for ip in ("0.0.0.0", "1.1.1.1", "8.8.8.8", "114.114.114.114", "255.255.255.255"):
+            self.assertEqual(compiled.search_by_string(ip), searcher.search_by_string(ip))
+        _, buf = parse_ip("1.1.1.1")
+        self.assertEqual(compiled.search(buf), '澳大利亚|0|0|0')
+
+    def test_direct_table(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        with open(self.v4_path, "rb") as f:
+            data = f.read()
+        searcher = Searcher.from_buffer(version, data)
+        compiled = searcher.compile(direct_table=True)
+        info = compiled.direct_table_info()
+        self.assertTrue(info["enabled"])
+        self.assertEqual(info["memory_bytes"], 4 << 24)
+        for ip in ("0.0.0.0", "1.1.1.1", "8.8.8.8", "114.114.114.114", "255.255.255.255"):
+            self.assertEqual(compiled.search_by_string(ip), searcher.search_by_string(ip))
+        self.assertGreater(compiled.benchmark_direct_table(10000)["speedup"], 0)
+
+    def test_mmap(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_mmap(version, self.v4_path, advice=("random", "willneed"))
+        result = searcher.search_by_string("1.1.1.1")
+        self.assertEqual(result, '澳大利亚|0|0|0')
+        with self.assertRaises(ValueError):
+            Searcher.from_mmap(version, self.v4_path, advice="fast")
+
+    def test_pread_thread(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        index = VectorIndex.from_file(self.v4_path)
+        for searcher in (Searcher.from_file(version, self.v4_path, pread=True),
+                         Searcher.from_index(version, self.v4_path, index, pread=True)):
+            self.assertTrue(searcher.thread_safe)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(searcher.search_by_string, ["1.1.1.1"] * 1000))
+            self.assertEqual(results, ['澳大利亚|0|0|0'] * 1000)
+            self.assertGreater(searcher.get_io_count(), 0)
+
+    def test_cached_searcher(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        cached = CachedSearcher(searcher, capacity=2)
+        for _ in range(3):
+            self.assertEqual(cached.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+        self.assertEqual(searcher.get_io_count(), 0)  # hits never touch the file
+        cached.search_by_string("1.1.1.2")
+        cached.search_by_string("1.1.1.3")
+        info = cached.cache_info()
+        self.assertEqual(info["hits"], 2)
+        self.assertEqual(info["misses"], 3)
+        self.assertEqual(info["evictions"], 1)
+        self.assertEqual(info["size"], 2)
+        cached.search_by_string("1.1.1.1")  # CLOCK spared the referenced entry
+        self.assertEqual(cached.cache_info()["hits"], 3)
+        self.assertFalse(cached.in_memory)
+        self.assertFalse(cached.thread_safe)
+
+    def test_cached_searcher_many(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        cached = CachedSearcher(searcher)
+        errors = array("i", [0]) * 4
+        self.assertEqual(cached.search_by_string_many(["1.1.1.1", "bad", "1.1.1.2", "::1"], errors=errors),
+                         ['澳大利亚|0|0|0', None, '澳大利亚|0|0|0', None])
+        self.assertEqual(list(errors), [0, 1, 0, 10])
+        self.assertEqual(cached.cache_info()["misses"], 2)
+        self.assertEqual(cached.search_many([b"\x01\x01\x01\x01", b"\x01\x01\x01\x03"]), ['澳大利亚|0|0|0'] * 2)
+        info = cached.cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["size"]), (1, 3, 3))
+
+    def test_cached_searcher_threads(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        self.assertFalse(searcher.thread_safe)
+        ips = [f"{random.randrange(1, 224)}.{random.randrange(256)}.0.1" for _ in range(2000)]
+        expected = Searcher.from_path(self.v4_path, mode="buffer").search_by_string_many(ips)
+        cached = CachedSearcher(searcher, capacity=256)  # misses keep going to the shared file
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(cached.search_by_string, ips))
+        self.assertEqual(results, expected)
+
+    def test_search_region(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_buffer(version, Content.from_file(self.v4_path))
+        region = searcher.search_region("1.1.1.1")
+        self.assertEqual(region, Region('澳大利亚', '0', '0', '0'))
+        self.assertIs(searcher.search_region(parse_ip("1.1.1.1")[1][:4]), region)
+        self.assertEqual(str(region), searcher.search_by_string("1.1.1.1"))
+        self.assertEqual(searcher.search_region("1.1.1.1", fields="country"), '澳大利亚')
+        self.assertEqual(searcher.search_region("1.1.1.1", fields=("isp", "country")), ('0', '澳大利亚'))
+        with self.assertRaises(ValueError):
+            searcher.search_region("1.1.1.1", fields=("street",))
+
+    def test_shared_memory(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        shm = Content.from_file(self.v4_path).to_shared_memory()
+        try:
+            searcher = Searcher.from_shared_memory(version, shm.name)
+            self.assertEqual(searcher.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+            self.assertTrue(searcher.in_memory)
+            del searcher
+            # detaching never unlinks the segment
+            self.assertEqual(Searcher.from_shared_memory(version, shm.name).search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_dual_stack(self):
+        searcher = DualStackSearcher(self.v4_path,
+                                     self.v6_path, mode="buffer")
+        v4 = '澳大利亚|0|0|0'
+        v6 = '美国|加利福尼亚州|洛杉矶|专线用户'
+        ip6 = "2001:0:2851:b9f0:3866:13a2:846f:c23b"
+        self.assertEqual(searcher.search_by_string("1.1.1.1"), v4)
+        self.assertEqual(searcher.search_by_string("::ffff:1.1.1.1"), v4)
+        self.assertEqual(searcher.search_by_string(ip6), v6)
+        self.assertEqual(searcher.search(parse_ip(ip6)[1]), v6)
+        errors = array("i", [0]) * 4
+        self.assertEqual(searcher.search_by_string_many(["1.1.1.1", ip6, "bad", "::ffff:1.1.1.1"], errors=errors),
+                         [v4, v6, None, v4])
+        self.assertEqual(list(errors), [0, 0, 1, 0])
+        rows = bytearray(parse_ip("::ffff:1.1.1.1")[1] + parse_ip(ip6)[1])
+        ids = searcher.search_array(memoryview(rows).cast("B", (2, 16)))
+        self.assertEqual(searcher.regions_for_ids(ids), [v4, v6])
+        only_v4 = DualStackSearcher(self.v4_path)
+        with self.assertRaises(RuntimeError):
+            only_v4.search_by_string(ip6)
+
+    def test_search_int(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_buffer(version, Content.from_file(self.v4_path))
+        self.assertEqual(searcher.search_int(0x01010101), '澳大利亚|0|0|0')
+        self.assertEqual(searcher.search_int(ipaddress.IPv4Address("1.1.1.1")), '澳大利亚|0|0|0')
+        self.assertEqual(searcher.compile().search_int(0x01010101), '澳大利亚|0|0|0')
+        errors = array("i", [0]) * 2
+        self.assertEqual(searcher.search_int_many([0x01010101, ipaddress.IPv6Address("::1")], errors),
+                         ['澳大利亚|0|0|0', None])
+        self.assertEqual(list(errors), [0, 10])
+        for ip in (1 << 32, -1):
+            with self.assertRaises(OverflowError):
+                searcher.search_int(ip)
+            with self.assertRaises(OverflowError):
+                searcher.search_int_many([0x01010101, ip])
+        for ip in ("1.1.1.1", True):
+            with self.assertRaises(TypeError):
+                searcher.search_int(ip)
+        with self.assertRaises(TypeError):
+            searcher.search_int_many([False])
+        dual = DualStackSearcher(self.v4_path,
+                                 self.v6_path)
+        ip6 = ipaddress.IPv6Address("2001:0:2851:b9f0:3866:13a2:846f:c23b")
+        self.assertEqual(dual.search_int_many([0x01010101, int(ip6), ip6]),
+                         ['澳大利亚|0|0|0', '美国|加利福尼亚州|洛杉矶|专线用户', '美国|加利福尼亚州|洛杉矶|专线用户'])
+        with self.assertRaises(OverflowError):
+            dual.search_int(1 << 128)
+
+    def test_parse_ip_many(self):
+        ip6 = "2001:0:2851:b9f0:3866:13a2:846f:c23b"
+        rows, versions = parse_ip_many(["1.1.1.1", ip6, "bad", b"1.1.1.2"])
+        self.assertEqual(list(versions), [4, 6, 0, 4])
+        self.assertEqual(rows.tobytes()[:16], parse_ip("1.1.1.1")[1] + bytes(12))
+        self.assertEqual(rows.tobytes()[16:32], parse_ip(ip6)[1])
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_buffer(version, Content.from_file(self.v4_path))
+        ids = searcher.search_array(rows, versions=versions)
+        self.assertEqual(searcher.regions_for_ids(ids), ['澳大利亚|0|0|0', None, None, '澳大利亚|0|0|0'])
+        dual = DualStackSearcher(self.v4_path,
+                                 self.v6_path)
+        ids = dual.search_array(rows, versions=versions)
+        self.assertEqual(dual.regions_for_ids(ids),
+                         ['澳大利亚|0|0|0', '美国|加利福尼亚州|洛杉矶|专线用户', None, '澳大利亚|0|0|0'])
+
+    def test_coalesce(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        ips = ["1.1.1.%d" % i for i in range(200, 0, -1)] + ["not an ip", "8.8.8.8", "1.1.1.1"]
+        errors = array("i", [0]) * len(ips)
+        plain = searcher.search_by_string_many(ips, coalesce=False)
+        plain_io = searcher.get_io_count()
+        self.assertEqual(searcher.search_by_string_many(ips, errors=errors, coalesce=True), plain)
+        self.assertLess(searcher.get_io_count(), plain_io)
+        self.assertEqual(plain[-1], '澳大利亚|0|0|0')
+        self.assertIsNone(plain[-3])
+        self.assertEqual(list(errors).count(0), len(ips) - 1)
+        self.assertEqual(searcher.search_int_many([0x01010101, 0x08080808]), [plain[-1], plain[-2]])
+
+    def test_pickle(self):
+        path = self.v4_path
+        header = Header.from_file(path)
+        version = Version.from_header(header)
+        searchers = [Searcher.from_path(path, mode) for mode in ("file", "index", "buffer", "mmap")]
+        searchers.append(Searcher.from_file(version, path, pread=True))
+        with open(path, "rb") as f:
+            searchers.append(Searcher.from_buffer(version, f.read()))  # unknown origin, travels as a copy
+        searchers.append(Searcher.from_index(version, path, pickle.loads(pickle.dumps(VectorIndex.from_file(path)))))
+        searchers.append(Searcher.from_buffer(version, pickle.loads(pickle.dumps(Content.from_file(path)))))
+        for searcher in searchers:
+            clone = pickle.loads(pickle.dumps(searcher))
+            self.assertEqual(clone.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+            self.assertEqual(clone.in_memory, searcher.in_memory)
+            self.assertEqual(clone.thread_safe, searcher.thread_safe)
+        self.assertTrue(pickle.loads(pickle.dumps(version)).is_ipv4())
+        self.assertEqual(pickle.loads(pickle.dumps(header)).ip_version, header.ip_version)
+        shm = Content.from_file(path).to_shared_memory()
+        try:
+            clone = pickle.loads(pickle.dumps(Searcher.from_shared_memory(version, shm.name)))
+            self.assertEqual(clone.search_by_string("1.1.1.1"), '澳大利亚|0|0|0')
+            del clone
+        finally:
+            shm.close()
+            shm.unlink()
+        dual = pickle.loads(pickle.dumps(DualStackSearcher(path, self.v6_path)))
+        self.assertEqual(dual.search_by_string_many(["1.1.1.1", "2001:0:2851:b9f0:3866:13a2:846f:c23b"]),
+                         ['澳大利亚|0|0|0', '美国|加利福尼亚州|洛杉矶|专线用户'])
+
+    def test_fork(self):
+        if not hasattr(os, "fork"):
+            self.skipTest("needs fork")
+        path = self.v4_path
+        rnd = random.Random(42)
+        ips = [str(ipaddress.IPv4Address(rnd.getrandbits(32))) for _ in range(20000)]
+        expected = Searcher.from_path(path).search_by_string_many(ips)
+        for mode in ("file", "index"):
+            searcher = Searcher.from_path(path, mode)
+            searcher.search_by_string("1.1.1.1")
+            pid = os.fork()
+            if pid == 0:
+                # parent and child seek and read the same file at once
+                os._exit(0 if searcher.search_by_string_many(ips, coalesce=False) == expected else 1)
+            results = searcher.search_by_string_many(ips, coalesce=False)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(results, expected)
+            self.assertEqual(status, 0)
+
+    def test_stats(self):
+        header = Header.from_file(self.v4_path)
+        version = Version.from_header(header)
+        searcher = Searcher.from_file(version, self.v4_path)
+        searcher.search_by_string("1.1.1.1")
+        self.assertEqual(searcher.stats()["lookups"], 0)  # off by default
+        searcher.enable_stats()
+        searcher.search_by_string("1.1.1.1")
+        searcher.search_by_string_many(["1.1.1.2", "bad"])
+        stats = searcher.stats()
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(stats["lookups"], 3)
+        self.assertEqual(stats["errors"], 1)
+        self.assertGreater(stats["io"], 0)
+        self.assertGreater(stats["bsearch_steps"], 0)
+        self.assertEqual(sum(stats["latency_histogram"]), 3)
+        self.assertEqual(sum(stats["lookup_io"]), 3)
+        text = prometheus_text({"v4": searcher})
+        self.assertIn('ip2region_lookups_total{searcher="v4"} 3', text)
+        self.assertIn('ip2region_lookup_duration_seconds_count{searcher="v4"} 3', text)
+        searcher.reset_stats()
+        self.assertEqual(searcher.stats()["lookups"], 0)
+
     def test_thread(self):
-        header = Header.from_file(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb")
+        header = Header.from_file(self.v4_path)
         version = Version.from_header(header)
-        with open(r"E:\pyproject\pyip2region\tests\ip2region_v4.xdb", "rb") as f:
+        with open(self.v4_path, "rb") as f:
             data = f.read()
         searcher = Searcher.from_buffer(version, data)
         def worker():